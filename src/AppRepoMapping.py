@@ -4,7 +4,15 @@ import shutil
 import logging
 import configparser
 import sys
+import errno
+import threading
 from datetime import datetime
+from src.TreeDeleter import deleter
+try:
+    import fcntl
+except ImportError:
+    # Windows: no reflinks, hard links are used
+    fcntl = None
 
 def setup_logger(log_file):
     try:
@@ -64,98 +72,193 @@ def clean_folder_name(name):
     except Exception as e:
         print(f"Error while executing clean_folder_name() function: {e}")
 
-def move_and_delete_folders(root_dir, logger):
-    try:
-        processed_dirs = set()  # To keep track of processed directories
-        # Iterate over directories in root_dir
-        for dirpath, dirnames, filenames in os.walk(root_dir):
-            for dirname in dirnames[:]:  # Iterate over a copy of dirnames to allow modification
-                source_dir = os.path.join(dirpath, dirname)
-                destination_dir = os.path.dirname(source_dir)
-                try:
-                    # Check if the directory has already been processed
-                    if source_dir in processed_dirs:
-                        continue
-                    # Check if the destination directory exists
-                    if os.path.exists(destination_dir):
-                        # Check if the directory already exists at the destination
-                        if not os.path.exists(os.path.join(destination_dir, dirname)):
-                            # Move the entire directory to its parent directory
-                            if source_dir != root_dir:  # Skip root_dir itself
-                                shutil.move(source_dir, destination_dir)
-                                # logger.info(f"Directory '{source_dir}' moved to '{destination_dir}'.")
-                                processed_dirs.add(source_dir)  # Add the directory to processed_dirs
-                                # Delete the directory after successful move
-                                os.rmdir(source_dir)
-                        else:
-                            pass
-                        # Remove the directory from dirnames to prevent further iteration
-                        dirnames.remove(dirname)
-                    else:
-                        logger.error(f"Destination path '{destination_dir}' does not exist.")
-                except Exception as e:
-                    logger.error(f"Failed to move directory '{source_dir}': {e}")
-    except Exception as e:
-        print(f"Error while executing move_and_delete_folders() function: {e}")
+# ioctl request cloning the extents of one file into another (Linux, on btrfs, XFS and other copy-on-write file systems)
+FICLONE = 0x40049409
 
-def create_application_folders(mapping_sheet, repo_folder, output_folder, logger, summary_logger):
-    try:
-        # Read the mapping sheet
-        mapping_df = pd.read_excel(mapping_sheet)
-        
-        # Loop through each row in the mapping sheet
-        for index, row in mapping_df.iterrows():
-            repo_name = str(row['Repository']).strip()
-            app_name = str(row['Application']).strip()
-            action = str(row['Action']).strip()
-
-            # Check if app_name is NaN
-            if pd.isna(app_name):
-                logger.warning(f"Skipping row {index + 1}: Application Name is missing.")
-                continue
-
-            # Convert app_name to string to handle NaN
-            app_name = str(app_name)
-
-            # Clean up the application name for folder creation
-            app_folder_name = clean_folder_name(app_name)
-            
-            # Create application folder if it doesn't exist
-            app_folder_path = os.path.join(output_folder, app_folder_name)
-            if not os.path.exists(app_folder_path):
-                os.makedirs(app_folder_path)
-                logger.info(f"Application folder '{app_name}' created.\n")
-
-            if action.lower() == "deleted":
-                if os.path.exists(app_folder_path+'\\'+repo_name): 
-                    dir_to_delete = app_folder_path+'\\'+repo_name
-                    command = f'rmdir /s /q "{dir_to_delete}"'
-                    os.system(command)
-                    logger.info(f"Repository '{repo_name}' is deleted from application folder '{app_name}'.\n")
-
-            if action.lower() == "skipped":
-                logger.info(f"Repository '{repo_name}' is skipped.\n")
-
-            if action.lower() == "replaced":
-                # Move entire directory from repo to application folder
-                repo_folder_path = os.path.join(repo_folder, repo_name)
-                
-                if os.path.exists(repo_folder_path) and os.path.isdir(repo_folder_path):
+class PlacementEngine:
+    """
+    Places extracted repositories into application folders for one run of the mapping step.
+
+    The first application of a repository gets the extracted tree itself, renamed into place, which is
+    atomic and instant on the same volume; across volumes it is moved. Each further application of the
+    same repository gets a tree of links to the first one, so it takes no extra space: reflinks
+    (copy-on-write clones) where the file system supports them, hard links otherwise, and copies only on
+    a file system that has neither. A hard-linked file is the same file in every application folder, so
+    files are not to be edited in place. summary() counts the trees and files.
 
-                    dir_to_delete = app_folder_path+'\\'+repo_name
-                    if os.path.exists(dir_to_delete):
-                        command = f'rmdir /s /q "{dir_to_delete}"'
-                        os.system(command)
+    With keep_extracted, every application gets a tree of links and the extracted tree stays in unzip_dir,
+    where the incremental unzip step (extraction manifests) and the git engine (index in the mirror) update
+    it on the next run instead of extracting or checking it out again. Both replace a changed file with a
+    new one rather than writing into it, so the linked copies are not changed under the applications.
+    """
 
-                    shutil.move(repo_folder_path, app_folder_path)
-                    logger.info(f"Repository '{repo_name}' is replaced with its contents.\n")
+    def __init__(self, keep_extracted=False):
+        self.lock = threading.Lock()
+        self.keep_extracted = keep_extracted
+        self.placed = {}
+        self.link_method = 'reflink' if fcntl and sys.platform.startswith('linux') else 'hardlink'
+        self.trees = {'renamed': 0, 'moved': 0, 'linked': 0}
+        self.files = {'reflink': 0, 'hardlink': 0, 'copy': 0}
 
-                    summary_logger.info(f"{app_name};{repo_name};Passed")
-                    # Call the function to move and delete folders in the app folder
-                    move_and_delete_folders(app_folder_path, logger)
+    def link_file(self, source_path, target_path):
+        method = self.link_method
+        if method == 'reflink':
+            try:
+                with open(source_path, 'rb') as source, open(target_path, 'wb') as target:
+                    fcntl.ioctl(target.fileno(), FICLONE, source.fileno())
+                shutil.copystat(source_path, target_path)
+                return method
+            except OSError:
+                # Not a copy-on-write file system: hard links for the rest of the run
+                if os.path.exists(target_path):
+                    os.remove(target_path)
+                method = self.link_method = 'hardlink'
+        if method == 'hardlink':
+            try:
+                os.link(source_path, target_path)
+                return method
+            except OSError:
+                # FAT/exFAT volumes, or too many links to one file
+                pass
+        shutil.copy2(source_path, target_path)
+        return 'copy'
+
+    def link_tree(self, source_dir, target_dir):
+        counts = {'reflink': 0, 'hardlink': 0, 'copy': 0}
+        for dirpath, dirnames, filenames in os.walk(source_dir):
+            target_dirpath = os.path.join(target_dir, os.path.relpath(dirpath, source_dir))
+            os.makedirs(target_dirpath, exist_ok=True)
+            for dirname in dirnames:
+                if os.path.islink(os.path.join(dirpath, dirname)):
+                    # os.walk does not follow links to folders; they are recreated as links
+                    filenames.append(dirname)
+            for filename in filenames:
+                source_path = os.path.join(dirpath, filename)
+                target_path = os.path.join(target_dirpath, filename)
+                if os.path.islink(source_path):
+                    os.symlink(os.readlink(source_path), target_path)
                 else:
-                    logger.warning(f"Repository '{repo_name}' does not exist for application '{app_name}'.\n")
-                    summary_logger.info(f"{app_name};{repo_name};Failed")
+                    counts[self.link_file(source_path, target_path)] += 1
+        with self.lock:
+            for method, count in counts.items():
+                self.files[method] += count
+
+    def place(self, repo_name, repo_folder_path, target_path, root_dir):
+        """
+        Puts repository repo_name at target_path, replacing what is there.
+        Parameters:
+            repo_folder_path (str): The extracted tree (unzip_dir/<repo>).
+            root_dir (str): The output folder; a replaced tree goes through its trash.
+        Returns:
+            str: How it was placed ('renamed', 'moved', 'linked' or 'already in place'), or None when the
+            repository is neither extracted nor placed earlier in the run.
+        """
+        with self.lock:
+            first_target = self.placed.get(repo_name)
+        if os.path.isdir(repo_folder_path):
+            source_dir, method = repo_folder_path, 'linked' if self.keep_extracted else 'renamed'
+        elif first_target and os.path.isdir(first_target):
+            source_dir, method = first_target, 'linked'
+        else:
+            return None
+        if os.path.normcase(os.path.abspath(source_dir)) == os.path.normcase(os.path.abspath(target_path)):
+            return 'already in place'
+        if os.path.lexists(target_path):
+            # Renamed into the trash at once and deleted in the background
+            deleter.delete(target_path, root_dir)
+        if method == 'linked':
+            self.link_tree(source_dir, target_path)
+        else:
+            try:
+                os.rename(source_dir, target_path)
+            except OSError as e:
+                if e.errno != errno.EXDEV and getattr(e, 'winerror', None) != 17:
+                    raise
+                # unzip_dir and the output folder are on different volumes
+                shutil.move(source_dir, target_path)
+                method = 'moved'
+        with self.lock:
+            self.trees[method] += 1
+            self.placed[repo_name] = first_target if method == 'linked' and first_target else target_path
+        return method
+
+    def summary(self):
+        with self.lock:
+            return (f"Placed {sum(self.trees.values())} repositories: {self.trees['renamed']} renamed, {self.trees['moved']} moved across volumes, "
+                    f"{self.trees['linked']} linked ({self.files['reflink']} files reflinked, "
+                    f"{self.files['hardlink']} hard-linked, {self.files['copy']} copied).")
+
+def read_mapping_rows(mapping_sheet, logger):
+    """
+    Reads the mapping sheet.
+    Returns:
+        list: (row number, repo_name, app_name, action) of each row with an application name.
+    """
+    rows = []
+    # Read the mapping sheet
+    mapping_df = pd.read_excel(mapping_sheet)
+
+    # Loop through each row in the mapping sheet
+    for index, row in mapping_df.iterrows():
+        repo_name = str(row['Repository']).strip()
+        app_name = str(row['Application']).strip()
+        action = str(row['Action']).strip()
+
+        # Check if app_name is NaN
+        if pd.isna(app_name):
+            logger.warning(f"Skipping row {index + 1}: Application Name is missing.")
+            continue
+        rows.append((index + 1, repo_name, app_name, action))
+    return rows
+
+def apply_mapping_row(repo_name, app_name, action, repo_folder, output_folder, logger, summary_logger, ledger=None, placement=None):
+    """
+    Applies one row of the mapping sheet: creates the application folder, then deletes, skips or
+    places the repository as its Action says.
+    Parameters:
+        placement (PlacementEngine): The placement engine of the run, which knows the repositories already
+            placed, so a repository mapped to several applications is linked into the next ones.
+    """
+    placement = placement or PlacementEngine()
+    # Clean up the application name for folder creation
+    app_folder_name = clean_folder_name(app_name)
+
+    # Create application folder if it doesn't exist
+    app_folder_path = os.path.join(output_folder, app_folder_name)
+    if not os.path.exists(app_folder_path):
+        os.makedirs(app_folder_path, exist_ok=True)
+        logger.info(f"Application folder '{app_name}' created.\n")
+
+    if action.lower() == "deleted":
+        if os.path.exists(os.path.join(app_folder_path, repo_name)):
+            deleter.delete(os.path.join(app_folder_path, repo_name), output_folder)
+            logger.info(f"Repository '{repo_name}' is deleted from application folder '{app_name}'.\n")
+
+    if action.lower() == "skipped":
+        logger.info(f"Repository '{repo_name}' is skipped.\n")
+
+    if action.lower() == "replaced":
+        # Move entire directory from repo to application folder
+        repo_folder_path = os.path.join(repo_folder, repo_name)
+        method = placement.place(repo_name, repo_folder_path, os.path.join(app_folder_path, repo_name), output_folder)
+
+        if method:
+            logger.info(f"Repository '{repo_name}' is replaced with its contents ({method}).\n")
+
+            summary_logger.info(f"{app_name};{repo_name};Passed")
+            if ledger:
+                ledger.add_target_application(repo_name, app_folder_name)
+        else:
+            logger.warning(f"Repository '{repo_name}' does not exist for application '{app_name}'.\n")
+            summary_logger.info(f"{app_name};{repo_name};Failed")
+
+def create_application_folders(mapping_sheet, repo_folder, output_folder, logger, summary_logger, ledger=None, keep_extracted=False):
+    try:
+        # keep_extracted: link the repositories into place and leave them in repo_folder for incremental updates
+        placement = PlacementEngine(keep_extracted)
+        for row_number, repo_name, app_name, action in read_mapping_rows(mapping_sheet, logger):
+            apply_mapping_row(repo_name, app_name, action, repo_folder, output_folder, logger, summary_logger, ledger, placement)
+        logger.info(placement.summary())
                 
     except Exception as e:
         print(f"Error while executing create_application_folders() function: {e}")
@@ -0,0 +1,192 @@
+import asyncio
+import datetime
+import os
+from urllib.parse import urljoin, urlparse
+
+from src import RepoDownloader
+from src.RateLimitGovernor import governor
+
+REDIRECT_STATUSES = (301, 302, 303, 307, 308)
+MAX_REDIRECTS = 5
+
+
+def load_aiohttp():
+    # aiohttp is only needed by download_engine=asyncio, so it is imported when that engine runs
+    try:
+        import aiohttp
+    except ImportError as e:
+        raise ImportError("download_engine=asyncio needs the aiohttp package: pip install aiohttp") from e
+    return aiohttp
+
+
+def parse_host_limits(value):
+    """
+    Parses "api.github.com:20, codeload.github.com:100" into {'api.github.com': 20, 'codeload.github.com': 100}.
+    """
+    host_limits = {}
+    for item in (value or '').split(','):
+        if ':' in item:
+            host, limit = item.rsplit(':', 1)
+            host_limits[host.strip().lower()] = int(limit)
+    return host_limits
+
+
+class HostLimiter:
+    """
+    One semaphore per host, so the API host and the archive host each have their own cap on open requests.
+    Hosts missing from host_limits get default_limit.
+    """
+
+    def __init__(self, host_limits, default_limit):
+        self.host_limits = host_limits
+        self.default_limit = default_limit
+        self.semaphores = {}
+
+    def semaphore(self, url):
+        host = (urlparse(url).hostname or '').lower()
+        if host not in self.semaphores:
+            self.semaphores[host] = asyncio.Semaphore(self.host_limits.get(host, self.default_limit))
+        return self.semaphores[host]
+
+
+async def stream_to_file(response, path, mode, chunk_size, write_buffer_size):
+    with open(path, mode, buffering=write_buffer_size) as f:
+        async for chunk in response.content.iter_chunked(chunk_size):
+            f.write(chunk)
+
+
+async def download_attempt(session, limiter, repository_url, headers, part_path, chunk_size, write_buffer_size, resume):
+    """
+    One attempt at completing part_path, following redirects one hop at a time under the limit of each host.
+    Returns:
+        str: None when part_path holds the complete archive, otherwise the reason of a failure that is not retried.
+    """
+    state = RepoDownloader.read_partial_state(part_path) if resume else {}
+    if state.get('url') != repository_url or state.get('segments'):
+        # Segmented partial downloads belong to the threads engine; start them over here
+        RepoDownloader.remove_partial_download(part_path)
+        state = {}
+
+    offset = os.path.getsize(part_path) if state and os.path.exists(part_path) else 0
+    request_headers = dict(headers)
+    if offset:
+        request_headers['Range'] = f"bytes={offset}-"
+        if state.get('etag'):
+            request_headers['If-Range'] = state['etag']
+
+    url = repository_url
+    for hop in range(MAX_REDIRECTS + 1):
+        if hop == 0:
+            # Only the API request counts against the rate limit; the redirect target does not
+            request_headers, token = await asyncio.to_thread(governor.authorize, request_headers)
+        async with limiter.semaphore(url):
+            async with session.get(url, headers=request_headers, allow_redirects=False) as response:
+                if governor.observe(response.status, response.headers, token):
+                    raise RepoDownloader.RateLimitedError(f"{response.status} {response.reason}")
+                if response.status in REDIRECT_STATUSES:
+                    next_url = urljoin(url, response.headers['Location'])
+                    if urlparse(next_url).hostname != urlparse(url).hostname:
+                        # The archive host gets a signed URL; the token is only sent to the API host
+                        request_headers.pop('Authorization', None)
+                    url = next_url
+                    continue
+                if response.status >= 500:
+                    raise RepoDownloader.TransientDownloadError(f"{response.status} {response.reason}")
+                if response.status == 416:
+                    RepoDownloader.remove_partial_download(part_path)
+                    raise RepoDownloader.TransientDownloadError(f"{response.status} {response.reason}")
+                if response.status not in (200, 206):
+                    RepoDownloader.remove_partial_download(part_path)
+                    return f"{response.status} {response.reason}"
+
+                if response.status == 206:
+                    total = RepoDownloader.parse_content_range(response.headers.get('Content-Range'))
+                else:
+                    total = response.content_length
+                RepoDownloader.write_partial_state(part_path, {'url': repository_url, 'etag': response.headers.get('ETag'), 'total': total})
+                await stream_to_file(response, part_path, 'ab' if response.status == 206 else 'wb', chunk_size, write_buffer_size)
+
+        if total and os.path.getsize(part_path) != total:
+            raise RepoDownloader.TransientDownloadError(f"connection closed after {os.path.getsize(part_path)} of {total} bytes")
+        return None
+    return "Too many redirects"
+
+
+async def download_archive(session, limiter, repository_url, repository_path, token, chunk_size, write_buffer_size, resume, retries, backoff_seconds):
+    """
+    Asynchronous counterpart of RepoDownloader.download_archive (without byte-range segments).
+    Returns:
+        tuple: (True, None) on success, (False, reason) otherwise.
+    """
+    aiohttp = load_aiohttp()
+    part_path = repository_path + '.part'
+    headers = {'Authorization': f'token {token}'}
+    reason = None
+    attempt = 0
+    rate_limited = 0
+    while attempt <= retries:
+        try:
+            reason = await download_attempt(session, limiter, repository_url, headers, part_path, chunk_size, write_buffer_size, resume)
+            if reason is not None:
+                return False, reason
+            os.replace(part_path, repository_path)
+            RepoDownloader.remove_partial_download(part_path)
+            return True, None
+        except RepoDownloader.RateLimitedError as e:
+            reason = str(e)
+            rate_limited += 1
+            if rate_limited > RepoDownloader.MAX_RATE_LIMITED_ATTEMPTS:
+                break
+        except (RepoDownloader.TransientDownloadError, aiohttp.ClientError, asyncio.TimeoutError) as e:
+            reason = str(e) or type(e).__name__
+            if attempt < retries:
+                wait = backoff_seconds * (2 ** attempt)
+                print(f"Download of {repository_url} failed ({reason}), retrying in {wait} seconds.")
+                await asyncio.sleep(wait)
+            attempt += 1
+    if not resume:
+        RepoDownloader.remove_partial_download(part_path)
+    return False, reason
+
+
+async def run_download(job, session, limiter, in_flight, token, options):
+    async with in_flight:
+        # Folder preparation and result logging touch the disk and the journal; they run in worker threads
+        archive_url = await asyncio.to_thread(job['prepare'])
+        if not archive_url:
+            return
+        start_time = datetime.datetime.now()
+        try:
+            download_flag, reason = await download_archive(session, limiter, archive_url, job['path'], token, **options)
+        except Exception as e:
+            download_flag, reason = False, str(e)
+        await asyncio.to_thread(job['finish'], download_flag, reason, start_time)
+
+
+async def run_downloads(jobs, token, max_in_flight, host_limits, default_host_limit, timeout, options):
+    aiohttp = load_aiohttp()
+    in_flight = asyncio.Semaphore(max_in_flight)
+    limiter = HostLimiter(host_limits, default_host_limit)
+    connector = aiohttp.TCPConnector(limit=max_in_flight, limit_per_host=0)
+    client_timeout = aiohttp.ClientTimeout(total=None, sock_connect=timeout, sock_read=timeout)
+    async with aiohttp.ClientSession(connector=connector, timeout=client_timeout) as session:
+        await asyncio.gather(*(run_download(job, session, limiter, in_flight, token, options) for job in jobs))
+
+
+def download_all(jobs, token, max_in_flight=100, host_limits=None, default_host_limit=50, chunk_size=1024 * 1024,
+                 write_buffer_size=1024 * 1024, resume=True, retries=3, backoff_seconds=2, timeout=60):
+    """
+    Downloads archives on one event loop with at most max_in_flight downloads in progress and at most
+    the limit of each host in open requests to that host.
+    Parameters:
+        jobs (list): Dicts with the 'path' of the archive and the callables 'prepare' (returns the URL to download,
+            or None to skip the download) and 'finish' (download_flag, reason, start_time), in download order.
+        token (str): The GitHub access token.
+        max_in_flight (int): Downloads in progress at the same time.
+        host_limits (dict): Open requests allowed per host name.
+        default_host_limit (int): Open requests allowed to any other host.
+        chunk_size, write_buffer_size, resume, retries, backoff_seconds, timeout: As in RepoDownloader.download_archive.
+    """
+    options = {'chunk_size': chunk_size, 'write_buffer_size': write_buffer_size, 'resume': resume, 'retries': retries,
+               'backoff_seconds': backoff_seconds}
+    asyncio.run(run_downloads(jobs, token, max_in_flight, host_limits or {}, default_host_limit, timeout, options))
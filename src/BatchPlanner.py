@@ -0,0 +1,72 @@
+import heapq
+import statistics
+
+
+def repository_cost(size_kb, download_seconds, throughput):
+    """
+    Predicted cost of downloading one repository, in bytes.
+    Parameters:
+        size_kb (int): Repository size reported by GitHub (KB).
+        download_seconds (float): Duration of the last download of this repository, if known.
+        throughput (float): Median download throughput (bytes/second) of past downloads, if known.
+    Returns:
+        float: Bytes to download, or bytes-equivalent of the last download time when history is available.
+    """
+    size_bytes = float(size_kb or 0) * 1024
+    if download_seconds and throughput:
+        return float(download_seconds) * throughput
+    return size_bytes
+
+
+def median_throughput(repositories):
+    # Bytes/second of the repositories downloaded in earlier runs
+    rates = [float(repo['size'] or 0) * 1024 / float(repo['Download_Seconds'])
+             for repo in repositories if repo['Download_Seconds'] and float(repo['Download_Seconds']) > 0 and repo['size']]
+    return statistics.median(rates) if rates else None
+
+
+def plan_batches(repositories, num_batches):
+    """
+    Splits repositories into num_batches batches of roughly equal predicted download volume.
+
+    Largest-first greedy bin packing (LPT): repositories are sorted by predicted cost, descending,
+    and each one goes to the batch with the smallest volume so far. Cost is the repository size,
+    or the last download time converted to bytes at the median throughput when history exists.
+    Parameters:
+        repositories (list): Rows with 'id', 'size' and 'Download_Seconds'.
+        num_batches (int): Number of batches to create.
+    Returns:
+        tuple: (dict repository id -> batch number, list of per-batch dicts with 'repos', 'bytes', 'seconds').
+    """
+    num_batches = max(1, min(num_batches, len(repositories)))
+    throughput = median_throughput(repositories)
+    costs = sorted(((repository_cost(repo['size'], repo['Download_Seconds'], throughput), repo['id']) for repo in repositories),
+                   key=lambda item: (-item[0], item[1]))
+
+    heap = [(0.0, batch_number) for batch_number in range(1, num_batches + 1)]
+    batches = {batch_number: {'repos': 0, 'bytes': 0.0} for batch_number in range(1, num_batches + 1)}
+    assignments = {}
+    for cost, repo_id in costs:
+        volume, batch_number = heapq.heappop(heap)
+        assignments[repo_id] = batch_number
+        batches[batch_number]['repos'] += 1
+        batches[batch_number]['bytes'] += cost
+        heapq.heappush(heap, (volume + cost, batch_number))
+
+    report = []
+    for batch_number in sorted(batches):
+        batch = batches[batch_number]
+        batch['batch_number'] = batch_number
+        batch['seconds'] = batch['bytes'] / throughput if throughput else None
+        report.append(batch)
+    return assignments, report
+
+
+def format_plan_report(report):
+    lines = []
+    for batch in report:
+        line = f"Batch {batch['batch_number']}: {batch['repos']} repositories, {batch['bytes'] / (1024 * 1024):.1f} MB predicted"
+        if batch['seconds'] is not None:
+            line += f", ~{batch['seconds'] / 60:.1f} min at past throughput"
+        lines.append(line)
+    return lines
@@ -1,5 +1,8 @@
 import shutil
 import threading
+import subprocess
+import functools
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
 import json
 import datetime
 import csv
@@ -7,6 +10,21 @@ import zipfile
 from src import UnzipFile
 from src import  AppRepoMapping
 from src import HLScanAndOnboard
+from src import GitHubApi
+from src.RepoLedger import RepoLedger, SUMMARY_HEADERS
+from src.DownloadJournal import DownloadJournal
+from src import BatchPlanner
+from src import ProcessStats
+from src import RepoDownloader
+from src import AsyncDownloader
+from src import DownloadCache
+from src import GitMirror
+from src import TarballStreamer
+from src.RepoPipeline import RepoPipeline, PipelineStage
+from src.RateLimitGovernor import governor, parse_tokens
+from src.TreeDeleter import deleter
+from src.IgnoreRules import IgnoreRules
+from src.ExtractionBudget import ExtractionBudget
 from pathlib import Path
 import requests
 from openpyxl.styles import PatternFill, Font, Alignment
@@ -17,43 +35,107 @@ import os
 import pandas as pd
 import logging
 import configparser
-def get_all_repo_metadata(org_name, access_token, output_file_path, log_file_path):
+def parse_last_refresh_date(last_refresh_date):
+    # Clean and parse last_refresh_date string ("YYYY-MM-DD", optionally quoted)
+    return datetime.datetime.strptime(last_refresh_date.strip().strip('"'), '%Y-%m-%d').replace(tzinfo=datetime.timezone.utc)
+
+def parse_github_timestamp(timestamp):
+    # GitHub timestamps look like 2024-01-31T12:00:00Z; empty repositories have none
+    if not timestamp:
+        return None
+    return datetime.datetime.fromisoformat(str(timestamp).replace('Z', '+00:00'))
+
+def build_summary_row(entry, position, refresh_cutoff):
+    """
+    Builds one summary CSV row from a repository entry, computing the
+    download URL, the Download flag and the batch number, as the page arrives.
+    Parameters:
+        entry (dict): Repository metadata (REST object or GraphQL equivalent).
+        position (int): 1-based position of the repository in the listing.
+        refresh_cutoff (datetime): Repositories pushed after this date are marked Download='Y'.
+    Returns:
+        dict: The summary row keyed by SUMMARY_HEADERS.
+    """
+    row_data = {key: entry.get(key, '') for key in SUMMARY_HEADERS[:9]}
+    # Fixed batches: the batch number is bumped on every 500th repository
+    row_data['batch_number'] = 1 + position // 500
+    archive_url = entry.get('archive_url') or ''
+    row_data['repo_archive_download_api'] = archive_url.replace('{archive_format}', 'zipball/').replace('{/ref}', entry.get('default_branch') or '')
+    pushed_at = parse_github_timestamp(entry.get('pushed_at'))
+    row_data['Download'] = 'Y' if pushed_at and refresh_cutoff and pushed_at > refresh_cutoff else 'N'
+    row_data['Download_Status'] = ''
+    return row_data
+
+def write_metadata_stream(pages, json_filename, csv_filename, last_refresh_date, ledger=None):
+    """
+    Writes the metadata JSON and the repository summary in a single pass over the API pages.
+    Only the page being written is held in memory.
+    Parameters:
+        pages (iterable): Pages (lists) of repository metadata, in listing order.
+        json_filename (str): Path of the metadata JSON file.
+        csv_filename (str): Path of the summary CSV file, or None.
+        last_refresh_date (str): Last refresh date (YYYY-MM-DD) used for the Download column.
+        ledger (RepoLedger): Optional ledger; when given the rows are stored in it and the CSV is exported from it.
+    Returns:
+        tuple: Number of pages and number of repositories written.
+    """
+    refresh_cutoff = parse_last_refresh_date(last_refresh_date) if last_refresh_date else None
+    counts = {'pages': 0, 'repos': 0}
+    with open(json_filename, 'w') as json_file:
+        json_file.write("[")
+
+        def summary_rows():
+            for page in pages:
+                counts['pages'] += 1
+                for entry in page:
+                    json_file.write(("," if counts['repos'] else "") + "\n" + json.dumps(entry))
+                    counts['repos'] += 1
+                    yield build_summary_row(entry, counts['repos'], refresh_cutoff)
+
+        if ledger:
+            ledger.sync_listing(summary_rows())
+        elif csv_filename:
+            with open(csv_filename, 'w', newline='', encoding='utf-8') as csv_file:
+                writer = csv.DictWriter(csv_file, fieldnames=SUMMARY_HEADERS)
+                writer.writeheader()
+                writer.writerows(summary_rows())
+        else:
+            for _ in summary_rows():
+                pass
+        json_file.write("\n]\n")
+    if ledger and csv_filename:
+        ledger.export_csv(csv_filename)
+    return counts['pages'], counts['repos']
+
+def get_all_repo_metadata(org_name, access_token, output_file_path, log_file_path, max_workers=1, cache_dir=None, backend="rest", graphql_url=GitHubApi.GITHUB_GRAPHQL_URL, output_csv_file_path=None, last_refresh_date=None, ledger=None):
     start_time = datetime.datetime.now()
     log_messages = []
+    cache = GitHubApi.HttpCache(cache_dir) if cache_dir else None
 
     try:
-        # Initialize an empty list to store all repositories
-        all_repos = []
-
-        # Fetch repositories from GitHub API with pagination
-        headers = {
-            "Authorization": f"Bearer {access_token}",
-            "Accept": "application/vnd.github+json",
-            "X-GitHub-Api-Version": "2022-11-28"
-        }
-        page_number = 1
-        while True:
-            repo_url = f"https://api.github.com/orgs/{org_name}/repos?per_page=200&page={page_number}"
-            response = requests.get(repo_url, headers=headers)
-            response.raise_for_status()  # Raise an exception for 4xx or 5xx status codes
-            # print (response.raise_for_status)
-            repos = response.json()
-            if not repos:  # No more repositories on this page
-                break
-            all_repos.extend(repos)
-            page_number += 1
-
-        # Save repository metadata to JSON file
-        with open(output_file_path, "w") as json_file:
-            json.dump(all_repos, json_file, indent=4)
+        if backend == "graphql":
+            # Fetch only the summary fields (SUMMARY_HEADERS) from the GraphQL API, 100 repositories per cursor page
+            pages = GitHubApi.fetch_repo_pages_graphql(org_name, access_token, graphql_url)
+        else:
+            # Fetch repositories from GitHub REST API with pagination, max_workers pages at a time
+            pages = GitHubApi.fetch_repo_pages(org_name, access_token, per_page=100, max_workers=max_workers, cache=cache)
+
+        # Save repository metadata to JSON file (and the summary CSV when requested) as the pages arrive
+        page_count, repo_count = write_metadata_stream(pages, output_file_path, output_csv_file_path, last_refresh_date, ledger)
+        log_messages.append(f"Fetched {page_count} pages ({repo_count} repositories) from the {backend} API.")
+        if cache and backend != "graphql":
+            log_messages.append(cache.summary())
+            print(cache.summary())
+        if output_csv_file_path:
+            print("Repo Summary CSV file generated successfully.")
 
         log_messages.append(f"Metadata for all repositories in organization {org_name} downloaded successfully.")
         print(f"Metadata for all repositories in organization {org_name} downloaded successfully.")
     except requests.exceptions.RequestException as e:
         log_messages.append(f"Error: {str(e)}")
-        if e.response.status_code==401:
+        if e.response is not None and e.response.status_code==401:
             print('Bad credentials! Please check your "github_token" in config.properties file.')
-        elif e.response.status_code==404:
+        elif e.response is not None and e.response.status_code==404:
             print('Bad Organization Name! Please check your "github_org_name" in config.properties file.')
         else:
             print(e)
@@ -71,75 +153,165 @@ def get_all_repo_metadata(org_name, access_token, output_file_path, log_file_pat
         for message in log_messages:
             log_file.write(message + "\n")
 
-def json_to_csv(json_filename, csv_filename):
-    try:
-        # Read JSON data from file
-        with open(json_filename, 'r') as json_file:
-            json_data = json.load(json_file)
-              
-        # Add additional headers
-        headers = ['id', 'name', 'default_branch', 'size', 'created_at', 'updated_at', 'pushed_at','clone_url','archive_url', 'batch_number']
-        #headers.extend(additional_headers)
-        
-        # Write to CSV
-        with open(csv_filename, 'w', newline='') as csv_file:
-            writer = csv.DictWriter(csv_file, fieldnames=headers)
-            writer.writeheader()
-            count = 0
-            batch_num = 1
-            for entry in json_data:
-                # Extract data from each entry
-                row_data = {key: entry.get(key, '') for key in headers}
-
-                count=count+1
-                if count % 500 == 0:
-                    batch_num = batch_num + 1
-                row_data['batch_number'] = batch_num
-                # print(row_data)
-
-                # Write row to CSV
-                writer.writerow(row_data)
-        print("Repo Summary CSV file generated successfully.")
-        
-    except FileNotFoundError:
-        print("File not found.")
-    except json.JSONDecodeError:
-        print("Invalid JSON format.")
-    except Exception as e:
-        print(f"An error occurred: {e}")
+def refresh_repo_metadata_incremental(org_name, access_token, ledger, output_csv_file_path, log_file_path, last_refresh_date, cache_dir=None, graphql_url=GitHubApi.GITHUB_GRAPHQL_URL):
+    """
+    Refreshes the repository ledger with only the repositories pushed since last_refresh_date.
+
+    Repositories are listed by 'pushed' descending and paging stops at the first repository pushed on or
+    before last_refresh_date. Changed repositories are merged into the ledger by id (keeping their batch
+    number), new ones are appended, and an id-only GraphQL sweep drops deleted repositories and renames
+    renamed ones. The summary CSV is then exported from the ledger.
+    Parameters:
+        org_name (str): GitHub organization name.
+        access_token (str): The GitHub access token.
+        ledger (RepoLedger): The repository ledger, already holding a previous refresh.
+        output_csv_file_path (str): Path of the {org}_Repositories_Summary.csv export.
+        log_file_path (str): Path of the metadata download log.
+        last_refresh_date (str): Last refresh date (YYYY-MM-DD).
+        cache_dir (str): Optional ETag cache directory.
+        graphql_url (str): GraphQL endpoint used for the id sweep.
+    """
+    start_time = datetime.datetime.now()
+    log_messages = []
+    cache = GitHubApi.HttpCache(cache_dir) if cache_dir else None
+    refresh_cutoff = parse_last_refresh_date(last_refresh_date)
 
-def modify_archive_urls(csv_file_path):
     try:
-        # Read the CSV file
-        df = pd.read_csv(csv_file_path, encoding='latin-1')
+        # 1. Repositories pushed after the cutoff, newest first
+        changed_repos = {}
+        page_count = 0
+        for page in GitHubApi.fetch_repo_pages(org_name, access_token, per_page=100, cache=cache, sort='pushed', direction='desc'):
+            page_count += 1
+            reached_cutoff = False
+            for entry in page:
+                pushed_at = parse_github_timestamp(entry.get('pushed_at'))
+                if not pushed_at or pushed_at <= refresh_cutoff:
+                    reached_cutoff = True
+                    break
+                changed_repos[str(entry['id'])] = entry
+            if reached_cutoff:
+                break
+        log_messages.append(f"Fetched {page_count} pages, {len(changed_repos)} repositories pushed after {refresh_cutoff.date()}.")
+
+        # 2. Id-only sweep of the organization to reconcile deleted and renamed repositories
+        current_names = GitHubApi.fetch_repo_ids_graphql(org_name, access_token, graphql_url)
+        log_messages.append(f"Id sweep listed {len(current_names)} repositories.")
+
+        known_names = ledger.ids_and_names()
+        deleted_ids = [repo_id for repo_id in known_names if repo_id not in current_names]
+        ledger.delete_repositories(deleted_ids)
+        renamed_count = 0
+        for repo_id, name in known_names.items():
+            if repo_id in current_names and current_names[repo_id] != name and repo_id not in changed_repos:
+                ledger.rename_repository(repo_id, org_name, name, current_names[repo_id])
+                renamed_count += 1
+
+        # 3. Merge by id: known repositories keep their batch number, new ones are appended
+        next_position = ledger.max_position()
+        merged_rows = []
+        for repo_id in current_names:
+            if repo_id in known_names and repo_id not in changed_repos:
+                continue
+            entry = changed_repos.get(repo_id) or GitHubApi.fetch_repo_by_id(repo_id, access_token, cache=cache)
+            if repo_id not in known_names:
+                next_position += 1
+            merged_rows.append((next_position, build_summary_row(entry, next_position, refresh_cutoff)))
+        ledger.upsert_repositories(merged_rows, keep_batch_number=True)
+        ledger.refresh_download_flags(refresh_cutoff)
+        ledger.export_csv(output_csv_file_path)
+
+        added_count = sum(1 for repo_id in current_names if repo_id not in known_names)
+        log_messages.append(f"Ledger merged: {len(merged_rows) - added_count} updated, {added_count} added, {renamed_count} renamed, {len(deleted_ids)} deleted.")
+        print(log_messages[-1])
+        print(f"Metadata for repositories of organization {org_name} pushed after {refresh_cutoff.date()} refreshed successfully.")
+    except requests.exceptions.RequestException as e:
+        log_messages.append(f"Error: {str(e)}")
+        if e.response is not None and e.response.status_code==401:
+            print('Bad credentials! Please check your "github_token" in config.properties file.')
+        elif e.response is not None and e.response.status_code==404:
+            print('Bad Organization Name! Please check your "github_org_name" in config.properties file.')
+        else:
+            print(e)
+        exit(0)
 
-        # Define a function to replace placeholders in archive_url and create a new column
-        def replace_url(row):
-            archive_format = 'zipball/'
-            ref = row['default_branch']
-            final_url = row['archive_url'].replace('{archive_format}', archive_format).replace('{/ref}', ref)
-            return final_url
+    end_time = datetime.datetime.now()
+    total_time = end_time - start_time
 
-        # Apply the function to create the new column 'archive_url_download'
-        df['repo_archive_download_api'] = df.apply(replace_url, axis=1)
+    # Log the start and end time, along with total time taken
+    with open(log_file_path, "a") as log_file:
+        log_file.write(f"Start Time: {start_time}\n")
+        log_file.write(f"End Time: {end_time}\n")
+        log_file.write(f"Total Time Taken: {total_time}\n")
+        for message in log_messages:
+            log_file.write(message + "\n")
 
-        # Write the modified DataFrame back to the original CSV file
-        df.to_csv(csv_file_path, index=False)
+def plan_download_batches(ledger, num_batches, log_file_path):
+    """
+    Reassigns batch_number of the repositories to download so each of the num_batches batches
+    carries roughly the same predicted volume (see BatchPlanner.plan_batches), and reports the plan.
+    """
+    try:
+        repositories = ledger.get_download_candidates()
+        if not repositories:
+            return
+        assignments, report = BatchPlanner.plan_batches(repositories, num_batches)
+        ledger.assign_batches(assignments)
+        report_lines = BatchPlanner.format_plan_report(report)
+        with open(log_file_path, "a") as log_file:
+            log_file.write(f"Download batch plan ({len(repositories)} repositories):\n")
+            for line in report_lines:
+                log_file.write(line + "\n")
+        print(f"Download batch plan ({len(repositories)} repositories):")
+        for line in report_lines:
+            print(line)
     except Exception as e:
-        print(f"Error while executing modify_archive_urls() function: {e}")
+        print(f"Error while executing plan_download_batches() function: {e}")
 
-def add_new_columns_to_csv(output_csv_file_path):
-    try:
-        df = pd.read_csv(output_csv_file_path, encoding='latin-1')
+def configure_rate_limit_governor(config):
+    """
+    Applies the [GitHub] rate_limit_* settings and the github_token pool to the governor shared by every
+    GitHub request of the process.
+    """
+    governor.configure(config.getfloat('GitHub', 'rate_limit_requests_per_second', fallback=0),
+                       config.getint('GitHub', 'rate_limit_burst', fallback=10),
+                       config.getint('GitHub', 'rate_limit_reserve', fallback=50),
+                       config.get('GitHub', 'rate_limit_state_file', fallback='').strip() or None,
+                       parse_tokens(config.get('GitHub', 'github_token', fallback='')))
 
-        # Add two new columns with some default values or calculations
-        df['Download'] = 'N'  # You can also use a calculation or other values
-        df['Download_Status'] = ''
+def log_rate_limit_summary(log_file_path):
+    try:
+        summary = governor.summary()
+        print(summary)
+        with open(log_file_path, "a") as log_file:
+            log_file.write(summary + "\n")
+    except Exception as e:
+        print(f"Error while executing log_rate_limit_summary() function: {e}")
 
-        # Path to save the updated CSV file
-        df.to_csv(output_csv_file_path, index=False)
+def open_repo_ledger(output_dir, org_name):
+    """
+    Opens the repository ledger of an organization ({output_dir}/{org}_Repositories.db).
+    A ledger created next to an existing {org}_Repositories_Summary.csv is seeded from that CSV.
+    """
+    ledger = RepoLedger(os.path.join(output_dir, f"{org_name}_Repositories.db"))
+    output_csv_file_path = os.path.join(output_dir, f"{org_name}_Repositories_Summary.csv")
+    if ledger.count() == 0 and os.path.exists(output_csv_file_path):
+        imported = ledger.import_csv(output_csv_file_path)
+        print(f"Repository ledger seeded with {imported} repositories from {output_csv_file_path}.")
+    return ledger
+
+def read_back_download_selection(ledger, output_csv_file_path):
+    """
+    Takes the Download and batch_number edits made to the summary CSV since it was exported into the ledger,
+    before repositories are selected for download.
+    """
+    try:
+        if os.path.exists(output_csv_file_path):
+            changed = ledger.import_selection(output_csv_file_path)
+            if changed:
+                print(f"Download selection of {changed} repositories read back from {output_csv_file_path}.")
     except Exception as e:
-        print(f"Error while executing add_new_columns_to_csv() function: {e}")   
+        print(f"Error while executing read_back_download_selection() function: {e}")
+
 def update_rescan_column(mapping_excel_path,output_csv_file_path,logger):
     try:
         logger.info("Starting update_rescan_column()...")
@@ -170,27 +342,6 @@ def update_rescan_column(mapping_excel_path,output_csv_file_path,logger):
         logger.info(f"Applications that need rescan ({len(rescan_apps)} found): {rescan_apps}")
     except Exception as e:
         logger.exception(f"Error while executing update_rescan_column(): {e}")
-def update_download_column(output_csv_file_path, last_refresh_date):
-    try:
-        # Load your CSV file
-        df = pd.read_csv(output_csv_file_path, encoding='latin-1')
-
-        # Convert pushed_at to datetime (handles ISO format with Z)
-        df['pushed_at'] = pd.to_datetime(df['pushed_at'], utc=True)
-
-        # Clean and parse last_refresh_date string
-        last_refresh_date = datetime.datetime.strptime(last_refresh_date.strip('"'), '%Y-%m-%d').replace(tzinfo=datetime.timezone.utc)
-
-        # Compare and update 'Download' column
-        df['Download'] = df['pushed_at'].apply(lambda x: 'Y' if x > last_refresh_date else 'N')
-
-        # Save updated CSV
-        df.to_csv(output_csv_file_path, index=False)
-
-        print("Download column updated based on pushed_at date.")
-    except Exception as e:
-        print(f"Error while executing update_download_column(): {e}")
-
 def add_action_column(mapping_excel_path, repo_summary_csv_path):
     try:
         # Load Excel and CSV files
@@ -243,26 +394,7 @@ def check_column_exists(file_path, column_name):
         print(f"An error occurred: {e}")
         return False
     
-def read_csv_data(file_path):
-    """
-    Reads data from a CSV file.
-    Parameters:
-        file_path (str): The path to the CSV file.
-    Returns:
-        list: A list containing tuples of data extracted from the CSV file.
-    """
-    data = []
-    try:
-        with open(file_path, mode='r', newline='', encoding='latin-1') as file:
-            reader = csv.reader(file)
-            next(reader)  # Skip the header row
-            for row in reader:
-                data.append((row[0], row[1], row[2], row[3], row[4], row[5], row[6], row[7], row[8], row[9], row[10], row[11], row[12]))  # Assuming 4 columns in the CSV
-    except Exception as e:
-        print(f"Error executing read_csv_data() function: {e}")
-    return data
-
-def log_start_end_time(repository_name, start_time, end_time, total_time, log_file):
+def log_start_end_time(repository_name, start_time, end_time, total_time, log_file, downloaded_bytes=None):
     """
     Logs start and end time of a process.
     Parameters:
@@ -271,9 +403,15 @@ def log_start_end_time(repository_name, start_time, end_time, total_time, log_fi
         end_time (datetime): The end time of the process.
         total_time (timedelta): The total time taken for the process.
         log_file (str): The path to the log file.
+        downloaded_bytes (int): Size of the downloaded file; adds the throughput and the peak RSS of the process.
     """
     try:
         log_message = f"{repository_name} | {start_time} | {end_time} | {total_time} |"
+        if downloaded_bytes is not None:
+            seconds = total_time.total_seconds()
+            bytes_per_second = downloaded_bytes / seconds if seconds > 0 else 0
+            log_message += (f" {downloaded_bytes} bytes | {ProcessStats.format_megabytes(bytes_per_second)}/s |"
+                            f" peak RSS {ProcessStats.format_megabytes(ProcessStats.peak_rss_bytes())} |")
         with open(log_file, "a") as f:
             f.write(log_message + "\n")
     except Exception as e:
@@ -294,81 +432,182 @@ def log_processing(repository_name, status, log_file):
     except Exception as e:
         print(f"Error while executing log_processing() function: {e}") 
 
-def download_zip_archive(repository_url, repository_path, token):
+def download_zip_archive(repository_url, repository_path, token, **download_options):
     """
     Downloads a ZIP archive from a given URL.
+    The response is streamed to repository_path + '.part' and the file is renamed to repository_path once
+    complete. Partial downloads are resumed, large archives can be fetched as parallel byte ranges and
+    transient errors are retried (see RepoDownloader.download_archive).
     Parameters:
         repository_url (str): The URL of the repository.
         repository_path (str): The path to save the ZIP archive.
         token (str): The GitHub access token.
+        download_options: Buffer sizes, resume, segment and retry settings, see read_download_options().
         
     Returns:
         bool: True if download is successful, False otherwise.
     """
     #print(f"Inside **download_zip_archive**'.")
     try:
-        headers = {'Authorization': f'token {token}'}
-        response = requests.get(repository_url, headers=headers)
-        reason = None
-        
-        if response.status_code == 200:
-            with open(repository_path, 'wb') as f:
-                f.write(response.content)
-            return True, reason
-        else:
-            reason = str(response.status_code) +' '+ str(response.reason)
-            return False, reason
+        return RepoDownloader.download_archive(repository_url, repository_path, token, **download_options)
     except Exception as e:
         print(f"Error while executing download_zip_archive() function: {e}")
-  
-def update_download_status(repo_id, download_status, output_csv_file_path_batch):
-    try:
-        # Read the CSV file
-        with open(output_csv_file_path_batch, 'r', newline='', encoding='latin-1') as file:
-            reader = csv.DictReader(file)
-            rows = list(reader)
-        
-        # Modify the data in the specified column
-        for row in rows:
-            if row['id']==repo_id:
-                row['Download_Status'] = download_status
-        
-        # Write the updated data back to the CSV file
-        with open(output_csv_file_path_batch, 'w', newline='', encoding='latin-1') as file:
-            writer = csv.DictWriter(file, fieldnames=reader.fieldnames)
-            writer.writeheader()
-            writer.writerows(rows)
-    except Exception as e:
-        print(f"Error while executing update_download_status() function: {e}")
-
-def split_csv_based_on_batch_num(batch_num, output_csv_file_path, output_csv_file_path_batch):
-    try:
+        return False, str(e)
 
-        df = pd.read_csv(output_csv_file_path)
+def read_download_options(config):
+    """
+    Reads the [Download] settings used by every download thread.
+    Parameters:
+        config (ConfigParser): The parsed config.properties.
+    Returns:
+        dict: Keyword arguments of RepoDownloader.download_archive().
+    """
+    return {
+        'chunk_size': config.getint('Download', 'download_chunk_size_kb', fallback=1024) * 1024,
+        'write_buffer_size': config.getint('Download', 'download_write_buffer_kb', fallback=1024) * 1024,
+        'resume': config.getboolean('Download', 'download_resume', fallback=True),
+        'segments': config.getint('Download', 'download_segments', fallback=1),
+        'segment_min_bytes': config.getint('Download', 'download_segment_min_mb', fallback=256) * 1024 * 1024,
+        'retries': config.getint('Download', 'download_retries', fallback=3),
+        'backoff_seconds': config.getfloat('Download', 'download_retry_backoff_seconds', fallback=2),
+        'timeout': config.getfloat('Download', 'download_timeout_seconds', fallback=60)
+    }
+
+def read_async_download_options(config):
+    """
+    Reads the asyncio engine limits, or returns None when [Download] download_engine is not asyncio.
+    """
+    if config.get('Download', 'download_engine', fallback='threads').strip().lower() != 'asyncio':
+        return None
+    return {
+        'max_in_flight': config.getint('Download', 'async_max_in_flight', fallback=100),
+        'host_limits': AsyncDownloader.parse_host_limits(config.get('Download', 'async_host_limits', fallback='')),
+        'default_host_limit': config.getint('Download', 'async_default_host_limit', fallback=50)
+    }
+
+def read_checkout_options(config):
+    """
+    Reads the settings of the engines that write repositories straight into unzip_dir,
+    or returns None when [Download] download_engine is neither git nor tarball.
+    """
+    engine = config.get('Download', 'download_engine', fallback='threads').strip().lower()
+    if engine not in ('git', 'tarball'):
+        return None
+    # The git engine applies IGNORED_DIR and IGNORED_FILES by sparse checkout, the tarball engine all the rules while extracting
+    sparse_checkout = (config.getboolean('Download', 'git_sparse_checkout', fallback=False)
+                       or config.getboolean('Unzip', 'unzip_apply_ignore_rules', fallback=False))
+    return {
+        'engine': engine,
+        'unzip_dir': config.get('Directories', 'unzip_dir'),
+        'ignored_dirs': config.get('HIGHLIGHT-ONBOARDING', 'IGNORED_DIR', fallback='') if sparse_checkout else None,
+        'ignored_files': config.get('HIGHLIGHT-ONBOARDING', 'IGNORED_FILES', fallback='') if sparse_checkout else None,
+        'ignore_rules': read_ignore_rules(config),
+        'budget': read_extraction_budget(config),
+        'timeout': config.getint('Download', 'git_timeout_seconds', fallback=3600) or None
+    }
+
+def read_ignore_rules(config):
+    """
+    Compiles the IGNORED_DIR/IGNORED_PATHS/IGNORED_FILES settings for the unzip step, or returns None
+    when [Unzip] unzip_apply_ignore_rules is off.
+    """
+    if not config.getboolean('Unzip', 'unzip_apply_ignore_rules', fallback=False):
+        return None
+    return IgnoreRules(config.get('HIGHLIGHT-ONBOARDING', 'IGNORED_DIR', fallback=''),
+                       config.get('HIGHLIGHT-ONBOARDING', 'IGNORED_PATHS', fallback=''),
+                       config.get('HIGHLIGHT-ONBOARDING', 'IGNORED_FILES', fallback=''))
 
-        batch_df = df[df['batch_number'] == batch_num]
-        batch_df.to_csv(output_csv_file_path_batch, index=False)
+def read_extraction_budget(config):
+    """
+    Reads the [Unzip] extraction limits, or returns None when none is set (all 0).
+    """
+    limits = (config.getfloat('Unzip', 'unzip_max_repo_mb', fallback=0),
+              config.getint('Unzip', 'unzip_max_repo_entries', fallback=0),
+              config.getfloat('Unzip', 'unzip_max_compression_ratio', fallback=0),
+              config.getfloat('Unzip', 'unzip_max_run_mb', fallback=0))
+    return ExtractionBudget(*limits) if any(limits) else None
 
-        print(f"{output_csv_file_path_batch} file created:")
+def keeps_extracted_trees(config):
+    """
+    Tells whether the mapping step leaves the trees in unzip_dir and links them into the application
+    folders, because the next run updates them in place: incremental unzip or the git engine.
+    """
+    checkout_options = read_checkout_options(config)
+    return (config.getboolean('Unzip', 'unzip_incremental', fallback=False)
+            or (checkout_options is not None and checkout_options['engine'] == 'git'))
 
+def read_pipeline_options(config):
+    """
+    Reads the [Pipeline] settings of option 12; worker counts of 0 fall back to download_workers and unzip_workers.
+    """
+    return {
+        'download_workers': config.getint('Pipeline', 'pipeline_download_workers', fallback=0) or config.getint('Download', 'download_workers', fallback=0),
+        'unzip_workers': config.getint('Pipeline', 'pipeline_unzip_workers', fallback=0) or config.getint('Unzip', 'unzip_workers', fallback=1),
+        'place_workers': config.getint('Pipeline', 'pipeline_place_workers', fallback=1),
+        'queue_size': config.getint('Pipeline', 'pipeline_queue_size', fallback=4),
+        'telemetry_seconds': config.getfloat('Pipeline', 'pipeline_telemetry_seconds', fallback=10)
+    }
+
+def update_download_status(repo_id, download_status, journal, download_seconds=None):
+    try:
+        # One appended journal line; the ledger is updated once at the end of the run
+        journal.record(repo_id, download_status, download_seconds)
     except Exception as e:
-        print(f"Error while executing split_csv_based_on_batch_num() function: {e}")
+        print(f"Error while executing update_download_status() function: {e}")
 
-def combine_all_batch_csv_files(output_csv_file_path_batch, output_csv_file_path):
-    try:
-        # List all CSV files in the input directory
-        csv_files = [os.path.join(output_csv_file_path_batch, file) for file in os.listdir(output_csv_file_path_batch) if file.endswith('.csv')]
-        # Combine all CSV files into one DataFrame
-        combined_df = pd.concat([pd.read_csv(f) for f in csv_files])
-        # Save the combined DataFrame to a CSV file
-        combined_df.to_csv(output_csv_file_path, index=False)
-        print(f"Combined CSV saved to {output_csv_file_path}")
 
-    except Exception as e:
-        print(f"Error while executing combine_all_batch_csv_files() function: {e}")
+def prepare_repository_directory(application_name_directory, repository_zip_path, resume=True):
+    """
+    Creates an empty folder for a repository download, keeping the partial download of an earlier run.
+    """
+    if not os.path.exists(application_name_directory):
+        os.makedirs(application_name_directory)
+    elif resume and RepoDownloader.has_partial_download(repository_zip_path):
+        # Keep the partial download of an earlier run so it continues where it stopped
+        pass
+    else:
+        # Renamed into the trash at once and deleted in the background
+        deleter.delete(application_name_directory)
+        os.makedirs(application_name_directory)
+
+def record_download_result(application_name, repo_id, repository_zip_path, download_flag, reason, start_time, start_end_log_file, processing_log_file, journal):
+    """
+    Checks a downloaded ZIP archive, then logs the outcome of the download and records its status in the journal.
+    """
+    try:
+        if download_flag:
+            with zipfile.ZipFile(repository_zip_path, 'r') as zip_ref:
+                file_list = zip_ref.namelist()
+                if not file_list:
+                    log_processing(application_name, "Repo is empty", processing_log_file)
+                    print(f"Repository '{application_name}' is empty.\n")
+                else:
+                    end_time = datetime.datetime.now()
+                    total_time = end_time - start_time
+                    log_start_end_time(application_name, start_time, end_time, total_time, start_end_log_file, os.path.getsize(repository_zip_path))
+                    log_processing(application_name, "Successful", processing_log_file)
+                    print(f"Repository '{application_name}' downloaded successfully as ZIP file to '{repository_zip_path}'.\n")
+                    download_status = 'Success'
+                    update_download_status(repo_id, download_status, journal, total_time.total_seconds())
 
+        else:
+            end_time = datetime.datetime.now()
+            total_time = end_time - start_time
+            log_start_end_time(application_name, start_time, end_time, total_time, start_end_log_file)
+            log_processing(application_name, "Failed - "+reason, processing_log_file)
+            print(f"Failed to download repository '{application_name}', Because of the reason - {reason}.\n")
+            download_status = f'Failed - {reason}'
+            update_download_status(repo_id, download_status, journal)
 
-def download_and_save_code(application_name, download_status, repository_url, server_location, token, start_end_log_file, processing_log_file, output_csv_file_path, repo_id, output_csv_file_path_batch):
+    except Exception as e:
+        end_time = datetime.datetime.now()
+        total_time = end_time - start_time
+        log_start_end_time(application_name, start_time, end_time, total_time, start_end_log_file)
+        log_processing(application_name, f"Failed: {e}", processing_log_file)
+        print(f"Error downloading repository: {e}")
+        update_download_status(repo_id, f'Failed - {e}', journal)
+
+def download_and_save_code(application_name, download_status, repository_url, server_location, token, start_end_log_file, processing_log_file, journal, repo_id, download_options=None):
     """
     Downloads and saves code from a repository.
     Parameters:
@@ -378,20 +617,17 @@ def download_and_save_code(application_name, download_status, repository_url, se
         token (str): The GitHub access token.
         start_end_log_file (str): The path to the log file for start and end times.
         processing_log_file (str): The path to the log file for processing status.
+        journal (DownloadJournal): The journal receiving the download status.
+        repo_id (int): The repository id.
+        download_options (dict): Download settings, see read_download_options().
     """
     try:
+        download_options = download_options or {}
         #print(f"Inside **Download-And-Save**'.")
         application_name_directory = os.path.join(server_location, application_name)
-            # Check if the 'Output' folder exists, if not, create it
-        if not os.path.exists(application_name_directory):
-            os.makedirs(application_name_directory)
-        else:
-            dir_to_delete = application_name_directory
-            command = f'rmdir /s /q "{dir_to_delete}"'
-            os.system(command)
-            os.makedirs(application_name_directory)
-        
         repository_zip_path = os.path.join(application_name_directory, application_name + '.zip')
+        prepare_repository_directory(application_name_directory, repository_zip_path, download_options.get('resume', True))
+        
         #print(f"repository_zip_path '{repository_zip_path}'.")
         if os.path.exists(repository_zip_path):
             log_processing(application_name, "Skipped: ZIP file already exists", processing_log_file)
@@ -400,66 +636,376 @@ def download_and_save_code(application_name, download_status, repository_url, se
         else:
             start_time = datetime.datetime.now()
             try:
-                download_flag, reason = download_zip_archive(repository_url, repository_zip_path, token)
-                if download_flag:
-                    with zipfile.ZipFile(repository_zip_path, 'r') as zip_ref:
-                        file_list = zip_ref.namelist()
-                        if not file_list:
-                            log_processing(application_name, "Repo is empty", processing_log_file)
-                            print(f"Repository '{application_name}' is empty.\n")
-                        else:
-                            end_time = datetime.datetime.now()
-                            total_time = end_time - start_time
-                            log_start_end_time(application_name, start_time, end_time, total_time, start_end_log_file)
-                            log_processing(application_name, "Successful", processing_log_file)
-                            print(f"Repository '{application_name}' downloaded successfully as ZIP file to '{repository_zip_path}'.\n")
-                            download_status = 'Success'
-                            update_download_status(repo_id, download_status, output_csv_file_path_batch)
-
-                else:
-                    end_time = datetime.datetime.now()
-                    total_time = end_time - start_time
-                    log_start_end_time(application_name, start_time, end_time, total_time, start_end_log_file)
-                    log_processing(application_name, "Failed - "+reason, processing_log_file)
-                    print(f"Failed to download repository '{application_name}', Because of the reason - {reason}.\n")
-                    download_status = f'Failed - {reason}'
-                    update_download_status(repo_id, download_status, output_csv_file_path_batch)
-
+                download_flag, reason = download_zip_archive(repository_url, repository_zip_path, token, **download_options)
             except Exception as e:
-                end_time = datetime.datetime.now()
-                total_time = end_time - start_time
-                log_start_end_time(application_name, start_time, end_time, total_time, start_end_log_file)
-                log_processing(application_name, f"Failed: {e}", processing_log_file)
-                print(f"Error downloading repository: {e}")
+                download_flag, reason = False, str(e)
+            record_download_result(application_name, repo_id, repository_zip_path, download_flag, reason, start_time, start_end_log_file, processing_log_file, journal)
     except Exception as e:
         print(f"Error while executing download_and_save_code() function: {e}")
 
-def download_in_batch(batch, thread_id, src_dir, token, start_end_log_file, processing_log_file, output_csv_file_path, output_csv_file_path_batch):
+def download_repositories_async(repositories, src_dir, token, log_files, journal, download_options, async_options, download_cache=None):
+    """
+    Downloads the repositories on one asyncio event loop (AsyncDownloader) instead of a thread pool.
+    Folders, logs, journal entries and the download cache are the same as with download_repository().
+    """
+    download_options = download_options or {}
+
+    def prepare(repository, application_name_directory, repository_zip_path, processing_log_file, head_shas):
+        archive_url, head_shas[repository['id']] = check_download_cache(repository, src_dir, token, processing_log_file, journal, download_cache)
+        if archive_url is None:
+            return None
+        prepare_repository_directory(application_name_directory, repository_zip_path, download_options.get('resume', True))
+        if os.path.exists(repository_zip_path):
+            log_processing(repository['name'], "Skipped: ZIP file already exists", processing_log_file)
+            print(f"Skipping repository '{repository['name']}'. ZIP file already exists.\n")
+            return None
+        return archive_url
+
+    def finish(repository, repository_zip_path, start_end_log_file, processing_log_file, head_shas, download_flag, reason, start_time):
+        record_download_result(repository['name'], repository['id'], repository_zip_path, download_flag, reason, start_time, start_end_log_file, processing_log_file, journal)
+        if download_flag:
+            store_in_download_cache(repository, src_dir, head_shas.get(repository['id']), download_cache)
+
+    head_shas = {}
+    jobs = []
+    for repository in repositories:
+        application_name = repository['name']
+        start_end_log_file, processing_log_file = log_files[repository['batch_number']]
+        application_name_directory = os.path.join(src_dir, application_name)
+        repository_zip_path = os.path.join(application_name_directory, application_name + '.zip')
+        jobs.append({
+            'path': repository_zip_path,
+            'prepare': functools.partial(prepare, repository, application_name_directory, repository_zip_path, processing_log_file, head_shas),
+            'finish': functools.partial(finish, repository, repository_zip_path, start_end_log_file, processing_log_file, head_shas)
+        })
+    options = {key: download_options[key] for key in ('chunk_size', 'write_buffer_size', 'resume', 'retries', 'backoff_seconds', 'timeout')
+               if key in download_options}
+    AsyncDownloader.download_all(jobs, token, **async_options, **options)
+
+def check_download_cache(repository, src_dir, token, processing_log_file, journal, download_cache):
+    """
+    Decides whether a repository has to be downloaded.
+    Without a download cache, every repository is downloaded. With one, repositories of size 0 are skipped
+    without any request, then the head SHA of the default branch is resolved and a repository already
+    downloaded at that SHA is skipped; its archive is moved to the folder of its current name if it was
+    renamed. Every skip is recorded with its reason.
+    Returns:
+        tuple: (archive URL to download, pinned to the head SHA when known, head SHA), or (None, None) to skip.
+    """
+    application_name = repository['name']
+    archive_url = repository['repo_archive_download_api']
+    reason = None
+    head_sha = None
+    if download_cache is not None and str(repository['size']).strip() in ('0', '0.0'):
+        # Opt-in only: GitHub also reports size 0 for newly pushed repositories it has not measured yet
+        reason = "Skipped - empty repository (size 0)"
+    elif download_cache is not None:
+        head_sha = DownloadCache.resolve_head_sha(archive_url, token)
+        cached_zip_path = download_cache.lookup(repository['id'], head_sha) if head_sha else None
+        if cached_zip_path:
+            repository_zip_path = os.path.join(src_dir, application_name, application_name + '.zip')
+            if os.path.normcase(os.path.abspath(cached_zip_path)) != os.path.normcase(os.path.abspath(repository_zip_path)):
+                os.makedirs(os.path.dirname(repository_zip_path), exist_ok=True)
+                os.replace(cached_zip_path, repository_zip_path)
+                if not os.listdir(os.path.dirname(cached_zip_path)):
+                    os.rmdir(os.path.dirname(cached_zip_path))
+                download_cache.store(repository['id'], head_sha, repository_zip_path)
+            reason = f"Skipped - unchanged since last download ({head_sha[:7]})"
+    if reason:
+        log_processing(application_name, reason, processing_log_file)
+        print(f"{reason}: '{application_name}'.\n")
+        update_download_status(repository['id'], reason, journal)
+        return None, None
+    if head_sha:
+        archive_url = DownloadCache.pin_archive_url(archive_url, head_sha)
+    return archive_url, head_sha
+
+def store_in_download_cache(repository, src_dir, head_sha, download_cache):
+    repository_zip_path = os.path.join(src_dir, repository['name'], repository['name'] + '.zip')
+    if download_cache is not None and head_sha and os.path.exists(repository_zip_path):
+        download_cache.store(repository['id'], head_sha, repository_zip_path)
+
+def download_repository(repository, src_dir, token, log_files, journal, download_options=None, download_cache=None):
     try:
-        # thread_log_file = f"Repos_download_thread_{thread_id}_{datetime.datetime.now().strftime('%Y-%m-%d_%H-%M-%S')}.log"
-        # logging.basicConfig(filename=thread_log_file, level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
-        # logging.info(f'Thread {thread_id} started.\n')
-        print(f'Thread {thread_id} started.\n')
-
-        start_time = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        # logging.info(f'Thread {thread_id} start time: {start_time}\n')
-        print(f'Thread {thread_id} start time: {start_time}\n')
-        # logging.info(f'Thread {thread_id} processing repos: {batch}\n')
-        # print(f'Thread {thread_id} processing repos: {batch}')
-
-        for repository in batch:
-            if repository[11] == 'Y':
-                download_and_save_code(repository[1], repository[12], repository[10], src_dir, token, start_end_log_file, processing_log_file, output_csv_file_path, repository[0], output_csv_file_path_batch)
-            else:
-                print(f"User Marked Download='N' Hence Skipping the Download of Repo -> '{repository[1]}'\n")
+        # Task of the download pool; batch_number only selects the log files the result goes to
+        start_end_log_file, processing_log_file = log_files[repository['batch_number']]
+        archive_url, head_sha = check_download_cache(repository, src_dir, token, processing_log_file, journal, download_cache)
+        if archive_url is None:
+            return
+        download_and_save_code(repository['name'], repository['Download_Status'], archive_url, src_dir, token, start_end_log_file, processing_log_file, journal, repository['id'], download_options)
+        store_in_download_cache(repository, src_dir, head_sha, download_cache)
+    except Exception as e:
+        print(f"Error while executing download_repository() function: {e}")
+
+def fetch_repository_with_git(repository, src_dir, token, log_files, journal, checkout_options, checked_out):
+    """
+    Git engine task: fetches the default branch of the repository into the shallow bare mirror
+    src_dir/<repo>/<repo>.git, then checks it out into unzip_dir/<repo>, so the repository needs no unzip step.
+    Names of the repositories checked out are appended to checked_out.
+    """
+    application_name = repository['name']
+    start_end_log_file, processing_log_file = log_files[repository['batch_number']]
+    try:
+        archive_url, _ = check_download_cache(repository, src_dir, token, processing_log_file, journal, None)
+        if archive_url is None:
+            return
+        mirror_path = os.path.join(src_dir, application_name, application_name + '.git')
+        work_tree = os.path.join(checkout_options['unzip_dir'], application_name)
+        start_time = datetime.datetime.now()
+        try:
+            commit_sha = GitMirror.fetch_shallow(mirror_path, repository['clone_url'], repository['default_branch'], token, checkout_options.get('timeout'))
+            changed = GitMirror.checkout(mirror_path, work_tree, commit_sha, checkout_options.get('ignored_dirs'), checkout_options.get('ignored_files'))
+        except (GitMirror.GitCommandError, subprocess.TimeoutExpired, OSError) as e:
+            end_time = datetime.datetime.now()
+            log_start_end_time(application_name, start_time, end_time, end_time - start_time, start_end_log_file)
+            log_processing(application_name, f"Failed - {e}", processing_log_file)
+            print(f"Failed to fetch repository '{application_name}', Because of the reason - {e}.\n")
+            update_download_status(repository['id'], f"Failed - {e}", journal)
+            return
+        end_time = datetime.datetime.now()
+        total_time = end_time - start_time
+        log_start_end_time(application_name, start_time, end_time, total_time, start_end_log_file)
+        checked_out.append(application_name)
+        if not changed:
+            reason = f"Skipped - unchanged since last download ({commit_sha[:7]})"
+            log_processing(application_name, reason, processing_log_file)
+            print(f"{reason}: '{application_name}'.\n")
+            update_download_status(repository['id'], reason, journal)
+            return
+        log_processing(application_name, "Successful", processing_log_file)
+        print(f"Repository '{application_name}' fetched at {commit_sha[:7]} and checked out to '{work_tree}'.\n")
+        update_download_status(repository['id'], 'Success', journal, total_time.total_seconds())
+    except Exception as e:
+        print(f"Error while executing fetch_repository_with_git() function: {e}")
 
-        end_time = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        # logging.info(f'Thread {thread_id} end time: {end_time}\n')
-        print(f'Thread {thread_id} end time: {end_time}\n')
-        # logging.info(f'Thread {thread_id} finished.\n')
-        print(f'Thread {thread_id} finished.\n')
+def stream_repository_tarball(repository, src_dir, token, log_files, journal, download_options, checkout_options, checked_out):
+    """
+    Tarball engine task: streams the tarball of the repository straight into unzip_dir/<repo>, so no
+    archive is written to disk and the repository needs no unzip step.
+    Names of the repositories extracted are appended to checked_out.
+    """
+    application_name = repository['name']
+    start_end_log_file, processing_log_file = log_files[repository['batch_number']]
+    try:
+        archive_url, _ = check_download_cache(repository, src_dir, token, processing_log_file, journal, None)
+        if archive_url is None:
+            return
+        extract_path = os.path.join(checkout_options['unzip_dir'], application_name)
+        options = {key: download_options[key] for key in ('retries', 'backoff_seconds', 'timeout') if key in (download_options or {})}
+        start_time = datetime.datetime.now()
+        download_flag, result = TarballStreamer.stream_tarball(archive_url, extract_path, token, **options,
+                                                               ignore_rules=checkout_options.get('ignore_rules'),
+                                                               budget=checkout_options.get('budget'))
+        end_time = datetime.datetime.now()
+        total_time = end_time - start_time
+        if download_flag:
+            log_start_end_time(application_name, start_time, end_time, total_time, start_end_log_file, result['bytes_read'])
+            status = "Successful"
+            if checkout_options.get('ignore_rules'):
+                status += f" | {result['skipped_members']} members, {result['skipped_bytes'] / (1024 * 1024):.1f} MB skipped by ignore rules"
+            log_processing(application_name, status, processing_log_file)
+            print(f"Repository '{application_name}' streamed and extracted to '{extract_path}'.\n")
+            update_download_status(repository['id'], 'Success', journal, total_time.total_seconds())
+            checked_out.append(application_name)
+        else:
+            log_start_end_time(application_name, start_time, end_time, total_time, start_end_log_file)
+            log_processing(application_name, f"Failed - {result}", processing_log_file)
+            print(f"Failed to download repository '{application_name}', Because of the reason - {result}.\n")
+            update_download_status(repository['id'], f"Failed - {result}", journal)
     except Exception as e:
-        print(f"Error while executing download_in_batch() function: {e}")
+        print(f"Error while executing stream_repository_tarball() function: {e}")
+
+def create_download_log_files(repositories, logs_dir, current_datetime):
+    """
+    Creates the empty RepoDownloadTime/RepoDownloadStatusLog files of the batches of the repositories.
+    Returns:
+        dict: batch_number -> (start_end_log_file, processing_log_file).
+    """
+    log_files = {}
+    for i in sorted({repository['batch_number'] for repository in repositories}):
+        start_end_log_file = os.path.join(logs_dir, f"RepoDownloadTime_batch_{i}_{current_datetime}.txt")
+        processing_log_file = os.path.join(logs_dir, f"RepoDownloadStatusLog_batch_{i}_{current_datetime}.txt")
+        open(start_end_log_file, 'w').close()
+        open(processing_log_file, 'w').close()
+        log_files[i] = (start_end_log_file, processing_log_file)
+    return log_files
+
+def download_source_code(src_dir, token, logs_dir, current_datetime, ledger, output_csv_file_path, download_options=None, journal_path=None, download_workers=None, async_options=None, use_download_cache=False, checkout_options=None):
+    """
+    Downloads the repositories marked Download='Y' in the ledger with a pool of download_workers threads,
+    then exports the ledger (with the download status of each repository) to the summary CSV.
+    The repositories are queued largest first, so the long downloads start early and idle workers take the
+    next repository whatever its batch; batch_number only labels the RepoDownloadTime/RepoDownloadStatusLog files.
+    The workers append their results to the download journal at journal_path, which is folded into the
+    ledger at the end. When a journal is left by an interrupted run, the repositories it records as
+    downloaded successfully are skipped.
+    Parameters:
+        download_workers (int): Number of concurrent downloads; defaults to the number of batches.
+        async_options (dict): When given, the downloads run on the asyncio engine with these limits
+            (max_in_flight, host_limits, default_host_limit) instead of the thread pool.
+        use_download_cache (bool): Skip repositories whose default branch is still at the SHA of their
+            last download (index under src_dir/.download_cache).
+        checkout_options (dict): When given, download_workers threads write the repositories straight into
+            checkout_options['unzip_dir'] instead of downloading ZIP archives: engine 'git' fetches them into
+            shallow git mirrors and checks them out, engine 'tarball' streams and extracts their tarballs.
+    """
+    download_cache = DownloadCache.DownloadCache(os.path.join(src_dir, ".download_cache")) if use_download_cache else None
+    journal = DownloadJournal(journal_path or os.path.splitext(output_csv_file_path)[0] + "_Download_Journal.jsonl")
+    completed_ids = set()
+    if journal.exists():
+        completed_ids = journal.completed_ids()
+        print(f"Resuming an interrupted download run: {len(completed_ids)} repositories already downloaded will be skipped.")
+
+    repositories = [repository for repository in ledger.get_download_candidates() if repository['id'] not in completed_ids]
+    if not repositories:
+        print("No repository left to download." if completed_ids else "No repository is marked Download='Y'. Nothing to download.")
+        if journal.exists():
+            journal.fold_into(ledger)
+            ledger.export_csv(output_csv_file_path)
+        return
+    journal.open()
+
+    log_files = create_download_log_files(repositories, logs_dir, current_datetime)
+
+    repositories.sort(key=lambda repository: repository['size'] or 0, reverse=True)
+    start_time = datetime.datetime.now()
+    checked_out = []
+    if checkout_options is not None:
+        download_workers = download_workers or len(log_files)
+        print(f"Fetching {len(repositories)} repositories with {checkout_options['engine']}, {download_workers} workers.\n")
+        with ThreadPoolExecutor(max_workers=download_workers) as executor:
+            for repository in repositories:
+                if checkout_options['engine'] == 'git':
+                    executor.submit(fetch_repository_with_git, repository, src_dir, token, log_files, journal, checkout_options, checked_out)
+                else:
+                    executor.submit(stream_repository_tarball, repository, src_dir, token, log_files, journal, download_options,
+                                    checkout_options, checked_out)
+    elif async_options is not None:
+        print(f"Downloading {len(repositories)} repositories with up to {async_options.get('max_in_flight')} downloads in flight.\n")
+        download_repositories_async(repositories, src_dir, token, log_files, journal, download_options, async_options, download_cache)
+    else:
+        download_workers = download_workers or len(log_files)
+        print(f"Downloading {len(repositories)} repositories with {download_workers} workers.\n")
+        with ThreadPoolExecutor(max_workers=download_workers) as executor:
+            for repository in repositories:
+                executor.submit(download_repository, repository, src_dir, token, log_files, journal, download_options, download_cache)
+    print(f"Downloads finished in {datetime.datetime.now() - start_time}.\n")
+    if checkout_options is not None and checkout_options['engine'] == 'tarball' and checkout_options.get('budget'):
+        print(checkout_options['budget'].summary() + "\n")
+
+    journal.fold_into(ledger)
+    for application_name in checked_out:
+        # The git and tarball engines write straight into unzip_dir
+        ledger.update_extraction_status(application_name, "Success")
+    ledger.export_csv(output_csv_file_path)
+    print(f"Download status saved to {output_csv_file_path}")
+
+def run_repository_pipeline(src_dir, unzip_dir, src_dir_analyze, token, logs_dir, current_datetime, ledger, output_csv_file_path, mapping_sheet,
+                            pipeline_options, download_options=None, journal_path=None, use_download_cache=False, checkout_options=None,
+                            ignore_rules=None, incremental=False, budget=None):
+    """
+    Options 6, 7 and 8 as one pipeline: each repository is downloaded, extracted into unzip_dir and placed
+    into its application folders as soon as the stage before is done with it, so downloads, extraction and
+    placement overlap instead of waiting for each other. The stages are connected by bounded queues of
+    pipeline_options['queue_size'] and have their own worker counts; their queue depths are written to
+    Pipeline_<timestamp>.log. Logs, journal, ledger and download cache are the same as with options 6, 7 and 8.
+    Archives of earlier runs left in src_dir go through extraction and placement too, and mapping rows of
+    repositories that did not go through the pipeline are applied at the end, as option 8 would.
+    Parameters:
+        pipeline_options (dict): download_workers, unzip_workers, place_workers, queue_size and
+            telemetry_seconds, see read_pipeline_options().
+        Other parameters: see download_source_code(), UnzipFile.unzip_code() and AppRepoMapping.create_application_folders().
+    """
+    try:
+        if checkout_options is not None:
+            # One run budget for the whole pipeline: the git/tarball engines draw from the one the unzip stage checks
+            checkout_options = dict(checkout_options, budget=budget)
+        download_cache = DownloadCache.DownloadCache(os.path.join(src_dir, ".download_cache")) if use_download_cache else None
+        journal = DownloadJournal(journal_path or os.path.splitext(output_csv_file_path)[0] + "_Download_Journal.jsonl")
+        completed_ids = journal.completed_ids() if journal.exists() else set()
+        if completed_ids:
+            print(f"Resuming an interrupted download run: {len(completed_ids)} repositories already downloaded will not be downloaded again.")
+        journal.open()
+        repositories = ledger.get_download_candidates()
+        repositories.sort(key=lambda repository: repository['size'] or 0, reverse=True)
+        log_files = create_download_log_files(repositories, logs_dir, current_datetime)
+        items = [{'name': repository['name'], 'repository': None if repository['id'] in completed_ids else repository} for repository in repositories]
+        names = {repository['name'] for repository in repositories}
+        items += [{'name': repo_name, 'repository': None} for repo_path, repo_name in UnzipFile.find_repository_zips(src_dir) if repo_name not in names]
+
+        logger = AppRepoMapping.setup_logger(os.path.join(logs_dir, f"AppRepoMapping_{current_datetime}.log"))
+        summary_logger = AppRepoMapping.create_summary_logger(os.path.join(logs_dir, f"AppRepoMappingSummary_log_{current_datetime}.txt"))
+        mapping_rows = AppRepoMapping.read_mapping_rows(mapping_sheet, logger)
+        # Trees updated in place by the next run stay in unzip_dir and are linked into the application folders
+        placement = AppRepoMapping.PlacementEngine(incremental or (checkout_options is not None and checkout_options['engine'] == 'git'))
+        rows_by_repo = {}
+        for row in mapping_rows:
+            rows_by_repo.setdefault(row[1], []).append(row)
+
+        unzip_run = UnzipFile.UnzipRun(unzip_dir, os.path.join(logs_dir, f"Unzip_Execution_{current_datetime}.log"),
+                                       os.path.join(logs_dir, f"Unzip_Time_{current_datetime}.log"), ledger, ignore_rules, incremental, budget)
+        unzip_workers = pipeline_options['unzip_workers'] or os.cpu_count() or 1
+        # Extraction threads hand the archives to worker processes, as option 7 does
+        unzip_executor = ProcessPoolExecutor(max_workers=unzip_workers) if unzip_workers > 1 else None
+        if unzip_executor:
+            # Start the worker processes now, before the stage threads
+            unzip_executor.submit(os.getpid).result()
+
+        def download(item):
+            repository = item['repository']
+            if checkout_options is not None:
+                if repository is not None:
+                    checked_out = []
+                    if checkout_options['engine'] == 'git':
+                        fetch_repository_with_git(repository, src_dir, token, log_files, journal, checkout_options, checked_out)
+                    else:
+                        stream_repository_tarball(repository, src_dir, token, log_files, journal, download_options, checkout_options, checked_out)
+                    if checked_out:
+                        ledger.update_extraction_status(item['name'], "Success")
+                # Already in unzip_dir: nothing to extract
+                item['checked_out'] = True
+                return item if os.path.isdir(os.path.join(unzip_dir, item['name'])) else None
+            if repository is not None:
+                download_repository(repository, src_dir, token, log_files, journal, download_options, download_cache)
+            return item if os.path.exists(os.path.join(src_dir, item['name'], item['name'] + '.zip')) else None
+
+        def extract(item):
+            if not item.get('checked_out'):
+                task = unzip_run.plan(os.path.join(src_dir, item['name'], item['name'] + '.zip'), item['name'])
+                if task:
+                    unzip_run.record_result(unzip_executor.submit(UnzipFile.extract_repository, *task).result() if unzip_executor
+                                            else UnzipFile.extract_repository(*task))
+            return item if os.path.isdir(os.path.join(unzip_dir, item['name'])) else None
+
+        def place(item):
+            for row_number, repo_name, app_name, action in rows_by_repo.pop(item['name'], []):
+                AppRepoMapping.apply_mapping_row(repo_name, app_name, action, unzip_dir, src_dir_analyze, logger, summary_logger, ledger, placement)
+            return None
+
+        download_workers = pipeline_options['download_workers'] or len(log_files) or 1
+        queue_size = pipeline_options['queue_size']
+        pipeline = RepoPipeline([PipelineStage("download", download, download_workers, queue_size),
+                                 PipelineStage("extract", extract, unzip_workers, queue_size),
+                                 PipelineStage("place", place, pipeline_options['place_workers'], queue_size)],
+                                os.path.join(logs_dir, f"Pipeline_{current_datetime}.log"), pipeline_options['telemetry_seconds'])
+        print(f"Running {len(items)} repositories through the pipeline: {download_workers} download, {unzip_workers} extract and "
+              f"{pipeline_options['place_workers']} place workers.\n")
+        try:
+            summary = pipeline.run(items)
+        finally:
+            if unzip_executor:
+                unzip_executor.shutdown()
+            unzip_run.close()
+            journal.fold_into(ledger)
+        remaining = set(rows_by_repo)
+        for row_number, repo_name, app_name, action in mapping_rows:
+            if repo_name in remaining:
+                AppRepoMapping.apply_mapping_row(repo_name, app_name, action, unzip_dir, src_dir_analyze, logger, summary_logger, ledger, placement)
+        logger.info(placement.summary())
+        ledger.export_csv(output_csv_file_path)
+        print(summary + "\n")
+    except Exception as e:
+        print(f"Error while executing run_repository_pipeline() function: {e}")
 
 def mainframeCopyAppend_to_analyzed_from_csv(csv_file_path, log_file_path):
     log_messages = []
@@ -938,7 +1484,8 @@ def main():
 
         # Get values from the config file
         org_name = config.get('GitHub', 'github_org_name')
-        token = config.get('GitHub', 'github_token')
+        # github_token can list several tokens; requests pick from the pool, the first one is the default
+        token = next(iter(parse_tokens(config.get('GitHub', 'github_token'))), '')
         config_dir = config.get('Directories', 'config_dir')
         src_dir = config.get('Directories', 'src_dir')
         unzip_dir = config.get('Directories', 'unzip_dir')
@@ -986,111 +1533,93 @@ def main():
             print("9. Copy Mainframe folder from src to dest")
             print("10. Prepare Application.txtt")
             print("11. Trigger CAST Highlight onboarding for the source code")
-            choice = input("Enter your choice (1/2/3/4/5/6/7/8/9/10/11): ")
+            print("12. Download, unzip and move repositories as one pipeline (6, 7 and 8 together)")
+            choice = input("Enter your choice (1/2/3/4/5/6/7/8/9/10/11/12): ")
 
-            if choice not in ['1', '2', '3', '4', '5', '6', '7', '8','9','10','11']:
-                print("Invalid choice. Please enter 1, 2, 3, 4, 5, 6, 7, 8,9,10,11")
+            if choice not in ['1', '2', '3', '4', '5', '6', '7', '8','9','10','11','12']:
+                print("Invalid choice. Please enter 1, 2, 3, 4, 5, 6, 7, 8,9,10,11,12")
                 continue
 
             output_type = int(choice)
-            main_operations(output_type, current_datetime, org_name, token, config_dir, src_dir, unzip_dir, logs_dir, output_dir, App_Repo_Mapping, csv_file_path, src_dir_analyze, last_refresh_date,highlight_base_url,highlight_company_id,highlight_token,highlight_application_mapping)
+            main_operations(output_type, current_datetime, org_name, token, config_dir, src_dir, unzip_dir, logs_dir, output_dir, App_Repo_Mapping, csv_file_path, src_dir_analyze, last_refresh_date,highlight_base_url,highlight_company_id,highlight_token,highlight_application_mapping,config)
 
             # Ask user if they want to continue
             continue_option = input("Do you want to run another query? (yes/no): ")
             if continue_option.lower() != 'yes':
+                # Folders replaced during the run are still being deleted in the background
+                print(deleter.wait())
                 exit(0)
 
-def main_operations(output_type, current_datetime, org_name, token, config_dir, src_dir, unzip_dir, logs_dir, output_dir, App_Repo_Mapping, csv_file_path, src_dir_analyze, last_refresh_date,highlight_base_url,highlight_company_id,highlight_token,highlight_application_mapping):
+def main_operations(output_type, current_datetime, org_name, token, config_dir, src_dir, unzip_dir, logs_dir, output_dir, App_Repo_Mapping, csv_file_path, src_dir_analyze, last_refresh_date,highlight_base_url,highlight_company_id,highlight_token,highlight_application_mapping,config):
+    configure_rate_limit_governor(config)
     if output_type == 1:
         output_file_path = os.path.join(output_dir, f"{org_name}_Repositories_Metadata.json")
         log_file_path = os.path.join(logs_dir, f"{org_name}_Metadatadownload_{current_datetime}.log")
         output_csv_file_path = os.path.join(output_dir, f"{org_name}_Repositories_Summary.csv")
-        get_all_repo_metadata(org_name, token, output_file_path, log_file_path)
-        json_to_csv(output_file_path, output_csv_file_path)
-        modify_archive_urls(output_csv_file_path)
-        add_new_columns_to_csv(output_csv_file_path)
-        update_download_column(output_csv_file_path, last_refresh_date)
+        metadata_fetch_workers = config.getint('GitHub', 'metadata_fetch_workers', fallback=1)
+        http_cache_dir = os.path.join(output_dir, "http_cache") if config.getboolean('GitHub', 'metadata_http_cache', fallback=False) else None
+        metadata_backend = config.get('GitHub', 'metadata_backend', fallback='rest').strip().lower()
+        metadata_refresh_mode = config.get('GitHub', 'metadata_refresh_mode', fallback='full').strip().lower()
+        ledger = open_repo_ledger(output_dir, org_name)
+        if metadata_refresh_mode == 'incremental' and ledger.count() > 0:
+            # Only the repositories pushed since last_refresh_date are listed and merged into the ledger
+            refresh_repo_metadata_incremental(org_name, token, ledger, output_csv_file_path, log_file_path, last_refresh_date, http_cache_dir)
+        else:
+            # Single pass: the ledger is filled as the pages arrive, with the download API URL,
+            # Download flag and batch number computed per row, then exported to the summary CSV
+            get_all_repo_metadata(org_name, token, output_file_path, log_file_path, metadata_fetch_workers, http_cache_dir, metadata_backend,
+                                  output_csv_file_path=output_csv_file_path, last_refresh_date=last_refresh_date, ledger=ledger)
+        download_batches = config.getint('Download', 'download_batches', fallback=0)
+        if download_batches > 0:
+            # Size-aware batches instead of one batch per 500 repositories
+            plan_download_batches(ledger, download_batches, log_file_path)
+            ledger.export_csv(output_csv_file_path)
+        log_rate_limit_summary(log_file_path)
         print(f"Refer Log file {log_file_path} for download log and time to download Metadata.")
         print(f"CSV file generated {output_csv_file_path} with summary of repositories which can be used for downloading source code(Task-2).\n")
 
     elif output_type == 6:
         output_csv_file_path = os.path.join(output_dir, f"{org_name}_Repositories_Summary.csv")
-        if not os.path.exists(output_csv_file_path):
+        ledger = open_repo_ledger(output_dir, org_name)
+        if ledger.count() == 0:
             print("Please run option 1 to download metadata first.")
             return
-        if not check_column_exists(output_csv_file_path, 'batch_number'):
-            print(f"Column 'batch_number' does not exist in file {output_csv_file_path}. Create a new column with the name 'batch_number' and enter the number of the batch you want to run for download.")
-            return
-        if not check_column_exists(output_csv_file_path, 'repo_archive_download_api'):
-            print(f"Column 'repo_archive_download_api' does not exist in file {output_csv_file_path}. Review the CSV file and rerun option 1.")
-            return
-        if not check_column_exists(output_csv_file_path, 'name'):
-            print(f"Column 'name' does not exist in file {output_csv_file_path}. Review the CSV file and rerun option 1.")
-            return
-        output_csv_file_path = os.path.join(output_dir, f"{org_name}_Repositories_Summary.csv")
-        data = read_csv_data(output_csv_file_path) 
-        # print(data[0])
-        batches = []
-        num_of_batches = int(data[-1][9])
-        for i in range(num_of_batches):
-            batch = []
-            for repository in data:
-                if int(repository[9]) == i+1:
-                    batch.append(repository)
-            batches.append(batch)
-        # Process batches using multi-threading
-        threads = []
-        # Define the directory name
-        directory = Path(output_dir+"\csv_for_each_batch")
-        # Create the directory
-        directory.mkdir(parents=True, exist_ok=True)
-        print(f"Directory '{directory}' created successfully.")
-
-        if os.path.exists(directory):
-            # List all files in the directory
-            files_in_directory = os.listdir(directory)
-            # Loop through the files and delete each one
-            for file in files_in_directory:
-                file_path = os.path.join(directory, file)
-                # Check if it's a file and delete it
-                if os.path.isfile(file_path):
-                    os.remove(file_path)
-                    print(f"Deleted file: {file_path}")
-        
-        for i, batch in enumerate(batches, start=1):
-            start_end_log_file = os.path.join(logs_dir, f"RepoDownloadTime_batch_{i}_{current_datetime}.txt")
-            processing_log_file = os.path.join(logs_dir, f"RepoDownloadStatusLog_batch_{i}_{current_datetime}.txt")
-            output_csv_file_path_batch = os.path.join(directory, f"{org_name}_Repositories_Summary_batch_{i}.csv")
-            split_csv_based_on_batch_num(i, output_csv_file_path, output_csv_file_path_batch)
-
-            if not os.path.exists(start_end_log_file):
-                with open(start_end_log_file, "w") as start_end_log:
-                    start_end_log.write("Start Time\tEnd Time\tTotal Time Taken\n")            
-            if not os.path.exists(processing_log_file):
-                with open(processing_log_file, "w") as processing_log:
-                    processing_log.write("Timestamp\tMessage\n")
-            open(start_end_log_file, 'w').close()
-            open(processing_log_file, 'w').close()
-            thread = threading.Thread(target=download_in_batch, args=(batch, i, src_dir, token, start_end_log_file, processing_log_file, output_csv_file_path, output_csv_file_path_batch))
-            threads.append(thread)
-        # Start threads
-        for t in threads:
-            t.start()
-        # Join threads to the main thread
-        for t in threads:
-            t.join()
-
-        combine_all_batch_csv_files(directory, output_csv_file_path)       
+        read_back_download_selection(ledger, output_csv_file_path)
+        download_source_code(src_dir, token, logs_dir, current_datetime, ledger, output_csv_file_path, read_download_options(config),
+                             os.path.join(output_dir, f"{org_name}_Download_Journal.jsonl"), config.getint('Download', 'download_workers', fallback=0),
+                             read_async_download_options(config), config.getboolean('Download', 'download_cache', fallback=False),
+                             read_checkout_options(config))
+        log_rate_limit_summary(os.path.join(logs_dir, f"RateLimit_{current_datetime}.log"))
     elif output_type==2:
         rescan_logger = LoggerManager.get_logger("Applications_rescan", log_dir=logs_dir)
         output_csv_file_path = os.path.join(output_dir, f"{org_name}_Repositories_Summary.csv")
         output_file=os.path.join(output_dir, f"Rescan_applications_summary.xlsx")
         match_applications(output_csv_file_path,App_Repo_Mapping,output_file,rescan_logger)
     elif output_type == 7:
+        ledger = open_repo_ledger(output_dir, org_name)
         try:
-            UnzipFile.unzip_code(src_dir, unzip_dir, os.path.join(logs_dir, f"Unzip_Execution_{current_datetime}.log"), os.path.join(logs_dir, f"Unzip_Time_{current_datetime}.log"))
+            UnzipFile.unzip_code(src_dir, unzip_dir, os.path.join(logs_dir, f"Unzip_Execution_{current_datetime}.log"), os.path.join(logs_dir, f"Unzip_Time_{current_datetime}.log"), ledger,
+                                 config.getint('Unzip', 'unzip_workers', fallback=1), read_ignore_rules(config),
+                                 config.getboolean('Unzip', 'unzip_incremental', fallback=False), read_extraction_budget(config))
         except Exception as e:
             print(f"Error occurred during extraction: {e}")
+        ledger.export_csv(os.path.join(output_dir, f"{org_name}_Repositories_Summary.csv"))
+    elif output_type == 12:
+        output_csv_file_path = os.path.join(output_dir, f"{org_name}_Repositories_Summary.csv")
+        ledger = open_repo_ledger(output_dir, org_name)
+        if ledger.count() == 0:
+            print("Please run option 1 to download metadata first.")
+            return
+        read_back_download_selection(ledger, output_csv_file_path)
+        if not os.path.exists(App_Repo_Mapping):
+            print("Application to repository mapping information is missing, please refer README.md to create the mapping spreadsheet.")
+            return
+        add_action_column(App_Repo_Mapping, output_csv_file_path)
+        run_repository_pipeline(src_dir, unzip_dir, src_dir_analyze, token, logs_dir, current_datetime, ledger, output_csv_file_path, App_Repo_Mapping,
+                                read_pipeline_options(config), read_download_options(config), os.path.join(output_dir, f"{org_name}_Download_Journal.jsonl"),
+                                config.getboolean('Download', 'download_cache', fallback=False), read_checkout_options(config),
+                                read_ignore_rules(config), config.getboolean('Unzip', 'unzip_incremental', fallback=False), read_extraction_budget(config))
+        log_rate_limit_summary(os.path.join(logs_dir, f"RateLimit_{current_datetime}.log"))
     elif output_type==3:
         rescan_logger = LoggerManager.get_logger("Export_HL_existing_data", log_dir=logs_dir)
         url = "{}/WS2/domains/{}/applications".format(highlight_base_url,highlight_company_id)
@@ -1108,8 +1637,11 @@ def main_operations(output_type, current_datetime, org_name, token, config_dir,
             print("Application to repository mapping information is missing, please refer README.md to create the mapping spreadsheet.")
             return
         mapping_excel_path = os.path.join(config_dir, f"App-Repo-Mapping.xlsx")
+        ledger = open_repo_ledger(output_dir, org_name)
         add_action_column(App_Repo_Mapping, output_csv_file_path)
-        AppRepoMapping.create_application_folders(App_Repo_Mapping, unzip_dir, src_dir_analyze, logger, summary_logger)
+        AppRepoMapping.create_application_folders(App_Repo_Mapping, unzip_dir, src_dir_analyze, logger, summary_logger, ledger,
+                                                 keeps_extracted_trees(config))
+        ledger.export_csv(output_csv_file_path)
         # update_rescan_column(mapping_excel_path,output_csv_file_path,log_file)
     elif output_type==4:
         log_file = LoggerManager.get_logger("Fetch_New_Applications_", log_dir=logs_dir)
@@ -1158,86 +1690,24 @@ def main_operations(output_type, current_datetime, org_name, token, config_dir,
         log_file_path = os.path.join(logs_dir, f"{org_name}_Metadatadownload_{current_datetime}.log")
         output_csv_file_path = os.path.join(output_dir, f"{org_name}_Repositories_Summary.csv")
         mapping_excel_path = os.path.join(config_dir, f"App-Repo-Mapping.xlsx")
-        get_all_repo_metadata(org_name, token, output_file_path, log_file_path)
-        json_to_csv(output_file_path, output_csv_file_path)
-        modify_archive_urls(output_csv_file_path)
-        add_new_columns_to_csv(output_csv_file_path)
-        update_download_column(output_csv_file_path, last_refresh_date)
+        ledger = open_repo_ledger(output_dir, org_name)
+        get_all_repo_metadata(org_name, token, output_file_path, log_file_path, output_csv_file_path=output_csv_file_path, last_refresh_date=last_refresh_date, ledger=ledger)
         add_action_column(mapping_excel_path, output_csv_file_path)
         print(f"Refer Log file {log_file_path} for download log and time to download Metadata.")
         print(f"CSV file generated {output_csv_file_path} with summary of repositories which can be used for downloading source code(Task-2).\n")
 
         # 2. Download source code for all repositories in the organization in batches
-        output_csv_file_path = os.path.join(output_dir, f"{org_name}_Repositories_Summary.csv")
-        if not os.path.exists(output_csv_file_path):
-            print("Please run option 1 to download metadata first.")
-            return
-        if not check_column_exists(output_csv_file_path, 'batch_number'):
-            print(f"Column 'batch_number' does not exist in file {output_csv_file_path}. Create a new column with the name 'batch_number' and enter the number of the batch you want to run for download.")
-            return
-        if not check_column_exists(output_csv_file_path, 'repo_archive_download_api'):
-            print(f"Column 'repo_archive_download_api' does not exist in file {output_csv_file_path}. Review the CSV file and rerun option 1.")
-            return
-        if not check_column_exists(output_csv_file_path, 'name'):
-            print(f"Column 'name' does not exist in file {output_csv_file_path}. Review the CSV file and rerun option 1.")
-            return
-        output_csv_file_path = os.path.join(output_dir, f"{org_name}_Repositories_Summary.csv")
-        data = read_csv_data(output_csv_file_path) 
-        batches = []
-        num_of_batches = int(data[-1][9])
-        for i in range(num_of_batches):
-            batch = []
-            for repository in data:
-                if int(repository[9]) == i+1:
-                    batch.append(repository)
-            batches.append(batch)
-        # Process batches using multi-threading
-        threads = []
-        # Define the directory name
-        directory = Path(output_dir+"\csv_for_each_batch")
-        # Create the directory
-        directory.mkdir(parents=True, exist_ok=True)
-        print(f"Directory '{directory}' created successfully.")
-
-        if os.path.exists(directory):
-            # List all files in the directory
-            files_in_directory = os.listdir(directory)
-            # Loop through the files and delete each one
-            for file in files_in_directory:
-                file_path = os.path.join(directory, file)
-                # Check if it's a file and delete it
-                if os.path.isfile(file_path):
-                    os.remove(file_path)
-                    print(f"Deleted file: {file_path}")
-        
-        for i, batch in enumerate(batches, start=1):
-            start_end_log_file = os.path.join(logs_dir, f"RepoDownloadTime_batch_{i}_{current_datetime}.txt")
-            processing_log_file = os.path.join(logs_dir, f"RepoDownloadStatusLog_batch_{i}_{current_datetime}.txt")
-            output_csv_file_path_batch = os.path.join(directory, f"{org_name}_Repositories_Summary_batch_{i}.csv")
-            split_csv_based_on_batch_num(i, output_csv_file_path, output_csv_file_path_batch)
-
-            if not os.path.exists(start_end_log_file):
-                with open(start_end_log_file, "w") as start_end_log:
-                    start_end_log.write("Start Time\tEnd Time\tTotal Time Taken\n")            
-            if not os.path.exists(processing_log_file):
-                with open(processing_log_file, "w") as processing_log:
-                    processing_log.write("Timestamp\tMessage\n")
-            open(start_end_log_file, 'w').close()
-            open(processing_log_file, 'w').close()
-            thread = threading.Thread(target=download_in_batch, args=(batch, i, src_dir, token, start_end_log_file, processing_log_file, output_csv_file_path, output_csv_file_path_batch))
-            threads.append(thread)
-        # Start threads
-        for t in threads:
-            t.start()
-        # Join threads to the main thread
-        for t in threads:
-            t.join()
-
-        combine_all_batch_csv_files(directory, output_csv_file_path)   
+        download_source_code(src_dir, token, logs_dir, current_datetime, ledger, output_csv_file_path, read_download_options(config),
+                             os.path.join(output_dir, f"{org_name}_Download_Journal.jsonl"), config.getint('Download', 'download_workers', fallback=0),
+                             read_async_download_options(config), config.getboolean('Download', 'download_cache', fallback=False),
+                             read_checkout_options(config))
+        log_rate_limit_summary(os.path.join(logs_dir, f"RateLimit_{current_datetime}.log"))
 
         # 3. Unzip the downloaded source code
         try:
-            UnzipFile.unzip_code(src_dir, unzip_dir, os.path.join(logs_dir, f"Unzip_Execution_{current_datetime}.log"), os.path.join(logs_dir, f"Unzip_Time_{current_datetime}.log"))
+            UnzipFile.unzip_code(src_dir, unzip_dir, os.path.join(logs_dir, f"Unzip_Execution_{current_datetime}.log"), os.path.join(logs_dir, f"Unzip_Time_{current_datetime}.log"), ledger,
+                                 config.getint('Unzip', 'unzip_workers', fallback=1), read_ignore_rules(config),
+                                 config.getboolean('Unzip', 'unzip_incremental', fallback=False), read_extraction_budget(config))
         except Exception as e:
             print(f"Error occurred during extraction: {e}")
 
@@ -1251,7 +1721,9 @@ def main_operations(output_type, current_datetime, org_name, token, config_dir,
             return
         mapping_excel_path = os.path.join(config_dir, f"App-Repo-Mapping.xlsx")
         add_action_column(mapping_excel_path, output_csv_file_path)
-        AppRepoMapping.create_application_folders(App_Repo_Mapping, unzip_dir, src_dir_analyze, logger, summary_logger)
+        AppRepoMapping.create_application_folders(App_Repo_Mapping, unzip_dir, src_dir_analyze, logger, summary_logger, ledger,
+                                                 keeps_extracted_trees(config))
+        ledger.export_csv(output_csv_file_path)
 
         # 5. Copy or Append Mainframe folder to analyzed directory
         mainframeCopyAppend_to_analyzed_from_csv(csv_file_path, os.path.join(logs_dir, f"mainframe_copy_append_log_{current_datetime}.log"))
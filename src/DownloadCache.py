@@ -0,0 +1,66 @@
+import json
+import os
+
+from src import GitHubApi
+
+
+def resolve_head_sha(repository_archive_url, token):
+    """
+    Returns the commit SHA the archive URL (.../repos/{org}/{repo}/zipball/{branch}) points to, or None.
+    The 'sha' media type makes GitHub answer with the 40 characters of the SHA only.
+    """
+    commits_url = repository_archive_url.replace('/zipball/', '/commits/', 1)
+    if commits_url == repository_archive_url:
+        return None
+    headers = dict(GitHubApi.github_headers(token), Accept='application/vnd.github.sha')
+    response = GitHubApi.send_request(None, 'GET', commits_url, headers=headers, timeout=60)
+    if response.status_code != 200:
+        return None
+    head_sha = response.text.strip()
+    return head_sha if len(head_sha) == 40 else None
+
+
+def pin_archive_url(repository_archive_url, head_sha):
+    # Download the commit that was checked against the cache, even if the branch moves meanwhile
+    prefix, separator, _ = repository_archive_url.rpartition('/zipball/')
+    return f"{prefix}/zipball/{head_sha}" if separator else repository_archive_url
+
+
+class DownloadCache:
+    """
+    Index of the archive downloaded for each repository, kept under src_dir/.download_cache.
+
+    Each repository id has one small JSON entry holding the head SHA of the default branch the
+    archive was downloaded at and the archive path. A repository whose branch still points to that
+    SHA is not downloaded again; after a rename, its archive is moved to the folder of the new name.
+    """
+
+    def __init__(self, cache_dir):
+        self.cache_dir = cache_dir
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def entry_path(self, repo_id):
+        return os.path.join(self.cache_dir, f"{repo_id}.json")
+
+    def lookup(self, repo_id, head_sha):
+        """
+        Returns the path of the archive of repo_id downloaded at head_sha, or None.
+        """
+        try:
+            with open(self.entry_path(repo_id), 'r') as entry_file:
+                entry = json.load(entry_file)
+        except (OSError, ValueError):
+            return None
+        if entry.get('head_sha') == head_sha and os.path.exists(entry.get('path', '')):
+            return entry['path']
+        return None
+
+    def store(self, repo_id, head_sha, archive_path):
+        temp_path = self.entry_path(repo_id) + '.tmp'
+        with open(temp_path, 'w') as entry_file:
+            json.dump({'id': repo_id, 'head_sha': head_sha, 'path': archive_path}, entry_file)
+        os.replace(temp_path, self.entry_path(repo_id))
+
+    def forget(self, repo_id):
+        if os.path.exists(self.entry_path(repo_id)):
+            os.remove(self.entry_path(repo_id))
@@ -0,0 +1,80 @@
+import datetime
+import json
+import os
+import threading
+
+
+class DownloadJournal:
+    """
+    Append-only JSON Lines file of the download results of one option-6 run.
+
+    Download threads append one line per repository; nothing is read back or rewritten while the run
+    is in progress. At the end of the run the journal is folded into the ledger in one transaction and
+    deleted, so a journal found at the start of a run belongs to a run that was interrupted.
+    """
+
+    def __init__(self, journal_path):
+        self.journal_path = journal_path
+        self.lock = threading.Lock()
+        self.journal_file = None
+
+    def exists(self):
+        return os.path.exists(self.journal_path)
+
+    def open(self):
+        ends_with_newline = True
+        if self.exists() and os.path.getsize(self.journal_path) > 0:
+            with open(self.journal_path, 'rb') as journal_file:
+                journal_file.seek(-1, os.SEEK_END)
+                ends_with_newline = journal_file.read(1) == b'\n'
+        self.journal_file = open(self.journal_path, 'a', encoding='utf-8')
+        if not ends_with_newline:
+            # Terminate a line cut short by an interruption so the next record starts on its own line
+            self.journal_file.write('\n')
+
+    def close(self):
+        if self.journal_file is not None:
+            self.journal_file.close()
+            self.journal_file = None
+
+    def record(self, repo_id, download_status, download_seconds=None):
+        line = json.dumps({'id': repo_id, 'Download_Status': download_status, 'Download_Seconds': download_seconds,
+                           'time': datetime.datetime.now().isoformat(timespec='seconds')})
+        with self.lock:
+            self.journal_file.write(line + '\n')
+            self.journal_file.flush()
+
+    def latest_results(self):
+        """
+        Returns the last recorded result of each repository (dict id -> journal entry).
+        A line cut short by an interruption is ignored.
+        """
+        results = {}
+        if not self.exists():
+            return results
+        with open(self.journal_path, 'r', encoding='utf-8') as journal_file:
+            for line in journal_file:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue
+                results[entry['id']] = entry
+        return results
+
+    def completed_ids(self):
+        # Downloaded, or skipped with a reason (empty repository, unchanged since the last download)
+        return {repo_id for repo_id, entry in self.latest_results().items()
+                if entry['Download_Status'] == 'Success' or entry['Download_Status'].startswith('Skipped')}
+
+    def fold_into(self, ledger):
+        """
+        Writes the journal results into the ledger and deletes the journal.
+        Returns:
+            int: Number of repositories updated.
+        """
+        results = self.latest_results()
+        ledger.apply_download_results(results.values())
+        self.close()
+        if self.exists():
+            os.remove(self.journal_path)
+        return len(results)
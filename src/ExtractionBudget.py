@@ -0,0 +1,81 @@
+import threading
+
+# Members smaller than this are not checked against the compression ratio; tiny files of repeated text compress
+# far beyond any sensible limit without being a threat
+RATIO_CHECK_MIN_BYTES = 1024 * 1024
+
+
+class ExtractionBudget:
+    """
+    Limits what the unzip step may write, checked from the central directory of each archive before
+    anything is extracted.
+
+    Per repository: uncompressed bytes, number of entries and compression ratio of any member of at least
+    RATIO_CHECK_MIN_BYTES (a zip bomb). Per run: uncompressed bytes of all repositories, so one run cannot
+    fill the disk. A limit of 0 is not checked. zipfile stops reading a member at the size declared in the
+    central directory, so the declared sizes checked here are also the most that can be written.
+
+    The tarball engine has no central directory: check_stream checks its members one at a time, from their
+    headers, before each is written. The checks and the run budget are shared by the threads of one run.
+    """
+
+    def __init__(self, max_repo_mb=0, max_repo_entries=0, max_compression_ratio=0, max_run_mb=0):
+        self.max_repo_bytes = int(max_repo_mb * 1024 * 1024)
+        self.max_repo_entries = max_repo_entries
+        self.max_compression_ratio = max_compression_ratio
+        self.max_run_bytes = int(max_run_mb * 1024 * 1024)
+        self.run_bytes = 0
+        self.rejected = 0
+        self.lock = threading.Lock()
+
+    def check(self, plan):
+        """
+        Checks the plan of one extraction (entries, bytes, worst_ratio, from UnzipFile.plan_extraction) and
+        takes its bytes from the run budget.
+        Returns:
+            str: None when the extraction may go ahead, otherwise why it may not.
+        """
+        with self.lock:
+            reason = None
+            if self.max_repo_entries and plan['entries'] > self.max_repo_entries:
+                reason = f"{plan['entries']} entries, more than the {self.max_repo_entries} allowed per repository"
+            elif self.max_repo_bytes and plan['bytes'] > self.max_repo_bytes:
+                reason = f"{plan['bytes'] / (1024 * 1024):.1f} MB uncompressed, more than the {self.max_repo_bytes / (1024 * 1024):.0f} MB allowed per repository"
+            elif self.max_compression_ratio and plan['worst_ratio'] > self.max_compression_ratio:
+                reason = (f"{plan['worst_member']} has a compression ratio of {plan['worst_ratio']:.0f}, "
+                          f"more than the {self.max_compression_ratio} allowed")
+            elif self.max_run_bytes and self.run_bytes + plan['write_bytes'] > self.max_run_bytes:
+                reason = (f"{plan['write_bytes'] / (1024 * 1024):.1f} MB to write, but only "
+                          f"{max(0, self.max_run_bytes - self.run_bytes) / (1024 * 1024):.1f} MB of the run budget are left")
+            if reason:
+                self.rejected += 1
+                return f"Extraction budget exceeded: {reason}"
+            self.run_bytes += plan['write_bytes']
+            return None
+
+    def check_stream(self, progress, member_bytes=None):
+        """
+        Checks one member of a tar stream before it is written, and takes its bytes from the run budget.
+        progress holds the entries and bytes written so far, read_bytes (uncompressed, of the members read so
+        far, ignored ones included) and compressed_bytes read from the stream. A tar stream has no ratio per
+        member, so the ratio checked is the one of the whole stream so far, once read_bytes reaches
+        RATIO_CHECK_MIN_BYTES; member_bytes None checks it alone, at the end of the stream.
+        Returns:
+            str: None when the member may be written, otherwise why the repository may not be extracted.
+        """
+        ratio = progress['read_bytes'] / max(progress['compressed_bytes'], 1) if progress['read_bytes'] >= RATIO_CHECK_MIN_BYTES else 0
+        return self.check({'entries': progress['entries'] + (member_bytes is not None), 'bytes': progress['bytes'] + (member_bytes or 0),
+                           'write_bytes': member_bytes or 0, 'worst_ratio': ratio, 'worst_member': 'the stream'})
+
+    def release(self, write_bytes):
+        """
+        Gives back to the run budget the bytes taken for a tree that was not kept (a failed stream).
+        """
+        with self.lock:
+            self.run_bytes -= write_bytes
+
+    def summary(self):
+        line = f"Extraction budget: {self.run_bytes / (1024 * 1024):.1f} MB planned"
+        if self.max_run_bytes:
+            line += f" of the {self.max_run_bytes / (1024 * 1024):.1f} MB run budget"
+        return line + f", {self.rejected} archives rejected."
@@ -0,0 +1,61 @@
+import hashlib
+import json
+import os
+
+# Changed whenever extraction writes trees differently, so trees extracted by an older version are extracted again
+MANIFEST_VERSION = 1
+
+
+def manifest_path(extract_path, repo_name):
+    # Next to the tree rather than in it, so the trees linked into application folders stay clean
+    return os.path.join(extract_path, f"{repo_name}.unzip_manifest.json")
+
+
+def extraction_options(ignore_rules=None):
+    """
+    Returns what, besides the archive, decides the content of an extracted tree.
+    """
+    return {'version': MANIFEST_VERSION, 'ignore_rules': ignore_rules.describe() if ignore_rules else None}
+
+
+def central_directory_hash(zip_ref):
+    """
+    Returns a SHA-1 of the central directory (name, CRC, size, time and attributes of every member, and the
+    archive comment, which holds the commit SHA in GitHub archives). Reading it does not touch member data.
+    """
+    digest = hashlib.sha1(zip_ref.comment)
+    for info in zip_ref.infolist():
+        digest.update(f"{info.filename}\0{info.CRC}\0{info.file_size}\0{info.date_time}\0{info.external_attr}\n".encode('utf-8'))
+    return digest.hexdigest()
+
+
+def read_manifest(path):
+    try:
+        with open(path, 'r', encoding='utf-8') as manifest_file:
+            return json.load(manifest_file)
+    except (OSError, ValueError):
+        return None
+
+
+def write_manifest(path, zip_path, central_directory_sha1, options, members):
+    """
+    Records the archive a tree was extracted from and the files it holds (relative name -> [CRC, size]).
+    """
+    archive_stat = os.stat(zip_path)
+    manifest = {'archive_size': archive_stat.st_size, 'archive_mtime': archive_stat.st_mtime,
+                'central_directory_sha1': central_directory_sha1, 'options': options, 'members': members}
+    temp_path = path + '.tmp'
+    with open(temp_path, 'w', encoding='utf-8') as manifest_file:
+        json.dump(manifest, manifest_file)
+    os.replace(temp_path, path)
+
+
+def remove_manifest(path):
+    if os.path.exists(path):
+        os.remove(path)
+
+
+def archive_unchanged(manifest, zip_path):
+    # Same size and modification time: the archive is the one extracted, without reading it
+    archive_stat = os.stat(zip_path)
+    return manifest.get('archive_size') == archive_stat.st_size and manifest.get('archive_mtime') == archive_stat.st_mtime
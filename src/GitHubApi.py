@@ -0,0 +1,386 @@
+import hashlib
+import json
+import os
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse, parse_qs
+
+import requests
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+
+from src.RateLimitGovernor import governor
+
+GITHUB_API_URL = "https://api.github.com"
+GITHUB_GRAPHQL_URL = "https://api.github.com/graphql"
+
+# Only the fields of the repository summary, plus the head commit of the default branch.
+# Ordered like the REST listing (created, newest first) so batch numbering matches.
+REPOSITORIES_QUERY = """
+query($org: String!, $cursor: String) {
+  organization(login: $org) {
+    repositories(first: 100, after: $cursor, orderBy: {field: CREATED_AT, direction: DESC}) {
+      pageInfo { hasNextPage endCursor }
+      nodes {
+        databaseId
+        name
+        nameWithOwner
+        diskUsage
+        createdAt
+        updatedAt
+        pushedAt
+        url
+        defaultBranchRef { name target { oid } }
+      }
+    }
+  }
+}
+"""
+
+# Id-only sweep used to reconcile deleted and renamed repositories
+REPOSITORY_IDS_QUERY = """
+query($org: String!, $cursor: String) {
+  organization(login: $org) {
+    repositories(first: 100, after: $cursor) {
+      pageInfo { hasNextPage endCursor }
+      nodes { databaseId name }
+    }
+  }
+}
+"""
+
+
+def github_headers(access_token):
+    """
+    Builds the standard headers used for GitHub REST API calls.
+    Parameters:
+        access_token (str): The GitHub access token.
+    Returns:
+        dict: Request headers.
+    """
+    return {
+        "Authorization": f"Bearer {access_token}",
+        "Accept": "application/vnd.github+json",
+        "X-GitHub-Api-Version": "2022-11-28"
+    }
+
+
+def send_request(session, method, url, max_rate_limit_retries=5, **kwargs):
+    """
+    Sends a GitHub request through the process-wide rate-limit governor.
+    A request refused by a rate limit is sent again once the governor's pause is over, and a request
+    refused because its token was revoked is sent again with another token of the pool.
+    Parameters:
+        session (requests.Session): Session to send the request with (None for a plain request).
+        method (str): HTTP method.
+        url (str): The URL.
+        max_rate_limit_retries (int): Times a rate-limited request is sent again.
+        kwargs: Passed to requests.
+    Returns:
+        requests.Response: The response.
+    """
+    headers = kwargs.pop("headers", None)
+    for attempt in range(max_rate_limit_retries + 1):
+        # With a token pool, the governor picks the token with the most remaining quota for each request
+        request_headers, token = governor.authorize(headers)
+        response = (session or requests).request(method, url, headers=request_headers, **kwargs)
+        if not governor.observe_response(response, token) or attempt == max_rate_limit_retries:
+            return response
+        response.close()
+
+
+def create_session(pool_size=10):
+    """
+    Creates a requests Session whose connection pool can serve pool_size concurrent requests.
+    Parameters:
+        pool_size (int): Number of pooled connections per host.
+    Returns:
+        requests.Session: The pooled session.
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+class HttpCache:
+    """
+    On-disk cache of GitHub GET responses keyed by URL and validated with ETags.
+
+    Each cached page is stored as one JSON file holding its ETag, the headers needed to
+    paginate and the response body. Later requests send If-None-Match and the cached body is
+    reused when GitHub answers 304 Not Modified, which does not count against the rate limit.
+    """
+
+    # Response headers kept with a cached page so a 304 can be served like the original 200
+    kept_headers = ("ETag", "Last-Modified", "Link", "Content-Type")
+
+    def __init__(self, cache_dir):
+        self.cache_dir = cache_dir
+        os.makedirs(cache_dir, exist_ok=True)
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def entry_path(self, url, headers):
+        key = hashlib.sha1(f"{url}|{(headers or {}).get('Accept', '')}".encode("utf-8")).hexdigest()
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def load(self, path):
+        try:
+            with open(path, "r", encoding="utf-8") as cache_file:
+                return json.load(cache_file)
+        except (OSError, ValueError):
+            return None
+
+    def store(self, path, url, response):
+        entry = {
+            "url": url,
+            "headers": {name: response.headers[name] for name in self.kept_headers if name in response.headers},
+            "body": response.text
+        }
+        temp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as cache_file:
+            json.dump(entry, cache_file)
+        os.replace(temp_path, path)
+
+    def get(self, url, headers=None, session=None):
+        """
+        Performs a conditional GET, answering from the cache on 304 Not Modified.
+        Parameters:
+            url (str): The URL to fetch.
+            headers (dict): Request headers.
+            session (requests.Session): Optional session to send the request with.
+        Returns:
+            requests.Response: The live response, or one rebuilt from the cache (from_cache=True).
+        """
+        path = self.entry_path(url, headers)
+        entry = self.load(path)
+        request_headers = dict(headers or {})
+        if entry and entry["headers"].get("ETag"):
+            request_headers["If-None-Match"] = entry["headers"]["ETag"]
+
+        response = send_request(session, "GET", url, headers=request_headers)
+        if response.status_code == 304 and entry:
+            with self.lock:
+                self.hits += 1
+            cached = requests.Response()
+            cached.status_code = 200
+            cached.url = url
+            cached.headers = CaseInsensitiveDict(entry["headers"])
+            cached._content = entry["body"].encode("utf-8")
+            cached.encoding = "utf-8"
+            cached.from_cache = True
+            return cached
+
+        with self.lock:
+            self.misses += 1
+        response.from_cache = False
+        if response.status_code == 200 and response.headers.get("ETag"):
+            self.store(path, url, response)
+        return response
+
+    def summary(self):
+        return f"HTTP cache: {self.hits} page(s) reused (304 Not Modified), {self.misses} page(s) downloaded."
+
+
+def parse_link_header(link_header):
+    """
+    Parses a GitHub 'Link' header into a dictionary of rel -> url.
+    Parameters:
+        link_header (str): Value of the Link response header.
+    Returns:
+        dict: Mapping of relation names ('next', 'last', ...) to URLs.
+    """
+    links = {}
+    if not link_header:
+        return links
+    for part in link_header.split(","):
+        match = re.search(r'<([^>]+)>\s*;\s*rel="([^"]+)"', part)
+        if match:
+            links[match.group(2)] = match.group(1)
+    return links
+
+
+def get_last_page_number(response):
+    """
+    Reads the page number of the rel="last" link of a paginated response.
+    Parameters:
+        response (requests.Response): Response of the first page.
+    Returns:
+        int: The last page number, or None when the response is not paginated.
+    """
+    last_url = parse_link_header(response.headers.get("Link")).get("last")
+    if not last_url:
+        return None
+    page = parse_qs(urlparse(last_url).query).get("page")
+    return int(page[0]) if page else None
+
+
+def page_url(base_url, page_number, per_page, sort=None, direction=None):
+    url = f"{base_url}?per_page={per_page}&page={page_number}"
+    if sort:
+        url += f"&sort={sort}&direction={direction or 'desc'}"
+    return url
+
+
+def fetch_page(session, url, headers, cache=None):
+    if cache:
+        response = cache.get(url, headers, session)
+    else:
+        response = send_request(session, "GET", url, headers=headers)
+    response.raise_for_status()  # Raise an exception for 4xx or 5xx status codes
+    return response
+
+
+def fetch_repo_pages(org_name, access_token, per_page=100, max_workers=1, session=None, cache=None, sort=None, direction=None):
+    """
+    Yields the pages of /orgs/{org}/repos in page order.
+
+    With max_workers > 1 the first page is fetched alone, the rel="last" link is read from it and
+    the remaining pages are fetched concurrently over a pooled session. Pages are always yielded
+    in page order, so callers see the same sequence as a sequential walk. At most 2 * max_workers
+    pages are held in memory at any time.
+    Parameters:
+        org_name (str): GitHub organization name.
+        access_token (str): The GitHub access token.
+        per_page (int): Repositories per page (GitHub caps this at 100).
+        max_workers (int): Number of pages fetched at the same time.
+        session (requests.Session): Optional session to reuse.
+        cache (HttpCache): Optional ETag cache used for every page request.
+        sort (str): Optional sort field ('created', 'updated', 'pushed', 'full_name').
+        direction (str): Sort direction used with sort ('asc' or 'desc').
+    Yields:
+        list: The repositories of each page.
+    """
+    base_url = f"{GITHUB_API_URL}/orgs/{org_name}/repos"
+    headers = github_headers(access_token)
+    session = session or create_session(max(max_workers, 1))
+
+    first_response = fetch_page(session, page_url(base_url, 1, per_page, sort, direction), headers, cache)
+    first_page = first_response.json()
+    if not first_page:
+        return
+    yield first_page
+
+    last_page = get_last_page_number(first_response)
+    page_number = 2
+    if last_page and max_workers > 1:
+        last_page_size = len(first_page)
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            pending = {}
+            next_to_submit = 2
+            while page_number <= last_page:
+                # Keep a bounded window of pages in flight ahead of the page being yielded
+                while next_to_submit <= last_page and next_to_submit < page_number + 2 * max_workers:
+                    pending[next_to_submit] = executor.submit(fetch_page, session, page_url(base_url, next_to_submit, per_page, sort, direction), headers, cache)
+                    next_to_submit += 1
+                page = pending.pop(page_number).result().json()
+                last_page_size = len(page)
+                if page:
+                    yield page
+                page_number += 1
+        if last_page_size < per_page:
+            return
+
+    # Sequential walk until an empty page: the whole listing when no fan-out is requested,
+    # otherwise only the pages added to the organization after the first page was read.
+    while True:
+        page = fetch_page(session, page_url(base_url, page_number, per_page, sort, direction), headers, cache).json()
+        if not page:
+            break
+        yield page
+        page_number += 1
+
+
+def graphql_repo_to_rest(node):
+    """
+    Converts a GraphQL repository node to the subset of the REST repository object used by the repository summary.
+    Parameters:
+        node (dict): Repository node returned by REPOSITORIES_QUERY.
+    Returns:
+        dict: Repository fields named and formatted like the REST API, plus 'head_sha'.
+    """
+    default_branch_ref = node.get("defaultBranchRef") or {}
+    return {
+        "id": node.get("databaseId"),
+        "name": node.get("name"),
+        "default_branch": default_branch_ref.get("name"),
+        "size": node.get("diskUsage"),
+        "created_at": node.get("createdAt"),
+        "updated_at": node.get("updatedAt"),
+        "pushed_at": node.get("pushedAt"),
+        "clone_url": f"{node.get('url')}.git",
+        "archive_url": f"{GITHUB_API_URL}/repos/{node.get('nameWithOwner')}/{{archive_format}}{{/ref}}",
+        "head_sha": (default_branch_ref.get("target") or {}).get("oid")
+    }
+
+
+def run_graphql_query(session, graphql_url, headers, query, variables):
+    """
+    Posts a GraphQL query and returns its 'data' member.
+    Raises requests.exceptions.HTTPError for transport errors and for GraphQL errors reported with a 200.
+    """
+    response = send_request(session, "POST", graphql_url, headers=headers, json={"query": query, "variables": variables})
+    response.raise_for_status()
+    result = response.json()
+    if result.get("errors"):
+        messages = "; ".join(error.get("message", str(error)) for error in result["errors"])
+        raise requests.exceptions.HTTPError(f"GraphQL error: {messages}", response=response)
+    return result["data"]
+
+
+def fetch_repo_by_id(repo_id, access_token, session=None, cache=None):
+    """
+    Fetches the REST object of a single repository by its numeric id.
+    """
+    url = f"{GITHUB_API_URL}/repositories/{repo_id}"
+    return fetch_page(session or requests, url, github_headers(access_token), cache).json()
+
+
+def iter_graphql_repositories(org_name, access_token, query, graphql_url, session):
+    headers = {"Authorization": f"Bearer {access_token}"}
+    cursor = None
+    while True:
+        data = run_graphql_query(session, graphql_url, headers, query, {"org": org_name, "cursor": cursor})
+        if not data.get("organization"):
+            raise requests.exceptions.HTTPError(f"GraphQL error: organization '{org_name}' not found")
+        repositories = data["organization"]["repositories"]
+        yield [node for node in repositories["nodes"] if node]
+        if not repositories["pageInfo"]["hasNextPage"]:
+            break
+        cursor = repositories["pageInfo"]["endCursor"]
+
+
+def fetch_repo_ids_graphql(org_name, access_token, graphql_url=GITHUB_GRAPHQL_URL, session=None):
+    """
+    Lists the id and name of every repository of an organization (100 per GraphQL page).
+    Returns:
+        dict: Repository id (str) -> repository name.
+    """
+    session = session or create_session(1)
+    repo_names = {}
+    for nodes in iter_graphql_repositories(org_name, access_token, REPOSITORY_IDS_QUERY, graphql_url, session):
+        for node in nodes:
+            repo_names[str(node["databaseId"])] = node["name"]
+    return repo_names
+
+
+def fetch_repo_pages_graphql(org_name, access_token, graphql_url=GITHUB_GRAPHQL_URL, session=None):
+    """
+    Yields the repositories of an organization from the GraphQL API, 100 per cursor page.
+    Parameters:
+        org_name (str): GitHub organization name.
+        access_token (str): The GitHub access token.
+        graphql_url (str): GraphQL endpoint (overridable for GitHub Enterprise or a local stub).
+        session (requests.Session): Optional session to reuse.
+    Yields:
+        list: REST-shaped repository dictionaries of each page (see graphql_repo_to_rest).
+    """
+    session = session or create_session(1)
+    for nodes in iter_graphql_repositories(org_name, access_token, REPOSITORIES_QUERY, graphql_url, session):
+        page = [graphql_repo_to_rest(node) for node in nodes]
+        if page:
+            yield page
@@ -0,0 +1,113 @@
+import base64
+import os
+import subprocess
+
+from src.TreeDeleter import deleter
+
+# Written in the mirror next to the sparse-checkout patterns, so a change of IGNORED_DIR/IGNORED_FILES triggers a full checkout
+SPARSE_PATTERNS_FILE = os.path.join('info', 'sparse-checkout')
+
+
+class GitCommandError(Exception):
+    """
+    Raised when a git command exits with an error; the message is the error output of git on one line.
+    """
+
+
+def run_git(arguments, token=None, timeout=None):
+    """
+    Runs git with the given arguments and returns its output.
+    The token is sent in an HTTP header for this command only, so it is never stored in the mirror or its URL.
+    """
+    command = ['git']
+    if token:
+        credentials = base64.b64encode(f"x-access-token:{token}".encode('utf-8')).decode('ascii')
+        command += ['-c', f"http.extraHeader=Authorization: Basic {credentials}"]
+    result = subprocess.run(command + arguments, capture_output=True, text=True, timeout=timeout,
+                            env=dict(os.environ, GIT_TERMINAL_PROMPT='0'))
+    if result.returncode != 0:
+        # One line, so the message fits in Download_Status and the status logs
+        raise GitCommandError(" ".join(result.stderr.split()) or f"git {arguments[0]} exited with code {result.returncode}")
+    return result.stdout.strip()
+
+
+def sparse_patterns(ignored_dirs, ignored_files=None):
+    """
+    Returns the sparse-checkout patterns that check out everything except the directories named in
+    IGNORED_DIR ("test,node_modules,...") and the files named in IGNORED_FILES ("Makefile,.yaml,...", entries
+    starting with '.' being extensions), at any depth. IGNORED_PATHS is a regular expression, which
+    sparse-checkout patterns cannot express, so it is not applied.
+    """
+    patterns = ['/*']
+    for name in (ignored_dirs or '').split(','):
+        name = name.strip().strip('/')
+        if name and f"!{name}/" not in patterns:
+            patterns.append(f"!{name}/")
+    for name in (ignored_files or '').split(','):
+        name = name.strip()
+        pattern = f"!*{name}" if name.startswith('.') else f"!{name}"
+        if name and '/' not in name and pattern not in patterns:
+            patterns.append(pattern)
+    return patterns
+
+
+def fetch_shallow(mirror_path, clone_url, branch, token=None, timeout=None):
+    """
+    Fetches the last commit of branch (the remote HEAD when branch is empty) into the bare mirror at
+    mirror_path, creating the mirror on the first run. Later runs only transfer the objects that changed.
+    Returns:
+        str: The SHA of the fetched commit.
+    """
+    if not os.path.exists(os.path.join(mirror_path, 'HEAD')):
+        run_git(['init', '--bare', '--quiet', mirror_path])
+    refspec = f"+refs/heads/{branch}:refs/heads/{branch}" if branch else 'HEAD'
+    run_git(['--git-dir', mirror_path, 'fetch', '--quiet', '--depth=1', '--no-tags', clone_url, refspec], token, timeout)
+    return run_git(['--git-dir', mirror_path, 'rev-parse', 'FETCH_HEAD'])
+
+
+def checkout(mirror_path, work_tree, commit_sha, ignored_dirs=None, ignored_files=None):
+    """
+    Checks commit_sha of the mirror out into work_tree (unzip_dir/<repo>), the folder the unzip step would
+    have produced. The index of the work tree lives in the mirror, so a later checkout only rewrites the
+    files that changed and removes the files deleted upstream.
+    git writes a changed file as a new file, so the copies the mapping step links from work_tree keep theirs.
+    Parameters:
+        ignored_dirs (str): IGNORED_DIR; when given, those directories are left out by a sparse checkout.
+        ignored_files (str): IGNORED_FILES; when given, those files are left out by a sparse checkout.
+    Returns:
+        bool: False when work_tree was already at commit_sha, True otherwise.
+    """
+    git = ['--git-dir', mirror_path, '--work-tree', work_tree]
+    patterns_path = os.path.join(mirror_path, SPARSE_PATTERNS_FILE)
+    patterns = "\n".join(sparse_patterns(ignored_dirs, ignored_files)) + "\n" if ignored_dirs or ignored_files else None
+    previous_patterns = None
+    if os.path.exists(patterns_path):
+        with open(patterns_path, 'r', encoding='utf-8') as patterns_file:
+            previous_patterns = patterns_file.read()
+
+    index_path = os.path.join(mirror_path, 'index')
+    incremental = os.path.exists(index_path) and os.path.isdir(work_tree) and os.listdir(work_tree) and patterns == previous_patterns
+    if incremental:
+        try:
+            if run_git(['--git-dir', mirror_path, 'rev-parse', '--verify', '--quiet', 'HEAD']) == commit_sha:
+                return False
+        except GitCommandError:
+            pass
+    else:
+        # A tree extracted from a ZIP archive, moved away, or checked out with other patterns: start from scratch
+        deleter.delete(work_tree)
+        if os.path.exists(index_path):
+            os.remove(index_path)
+
+    os.makedirs(work_tree, exist_ok=True)
+    if patterns:
+        os.makedirs(os.path.dirname(patterns_path), exist_ok=True)
+        with open(patterns_path, 'w', encoding='utf-8') as patterns_file:
+            patterns_file.write(patterns)
+        run_git(['--git-dir', mirror_path, 'config', 'core.sparseCheckout', 'true'])
+    else:
+        if os.path.exists(patterns_path):
+            os.remove(patterns_path)
+        run_git(['--git-dir', mirror_path, 'config', 'core.sparseCheckout', 'false'])
+    run_git(git + ['checkout', '--quiet', '--force', '--detach', commit_sha])
+    return True
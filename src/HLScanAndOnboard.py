@@ -6,6 +6,12 @@ import logging
 import csv
 from datetime import datetime
 import math
+import sys
+
+if not __package__:
+    # Run as a script (python src/HLScanAndOnboard.py): make the src package importable
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from src.RepoLedger import RepoLedger
 
 # Mapping dictionary for return codes and their corresponding messages
 return_code_messages = {
@@ -129,7 +135,7 @@ def calculate_execution_time(log_file_path):
         logging.error(f"Error reading log file {log_file_path}: {str(e)}")
         return None
 
-def process_application(app_name, app_id, log_file, output_txt_file, output_csv_file, SOURCES, HIGHLIGHT_EXE, ANALYZER_DIR, PERL, URL, TOKEN, COMPANY_ID, IGNORED_DIR, IGNORED_PATHS, IGNORED_FILES, RESULTS, Keyword_Scan):
+def process_application(app_name, app_id, log_file, output_txt_file, output_csv_file, SOURCES, HIGHLIGHT_EXE, ANALYZER_DIR, PERL, URL, TOKEN, COMPANY_ID, IGNORED_DIR, IGNORED_PATHS, IGNORED_FILES, RESULTS, Keyword_Scan, ledger=None):
     try:
         if os.path.exists(log_file):
             os.remove(log_file)
@@ -197,7 +203,11 @@ def process_application(app_name, app_id, log_file, output_txt_file, output_csv_
         writer = csv.writer(txtfile)
         writer.writerow([app_name, status, reason, log_file, start_time, end_time, execution_time])
 
-def process_batch(batch, thread_id, output_txt_file, output_csv_file, RESULTS, SOURCES, HIGHLIGHT_EXE, ANALYZER_DIR, PERL, URL, TOKEN, COMPANY_ID, IGNORED_DIR, IGNORED_PATHS, IGNORED_FILES, Keyword_Scan):
+    # Record the outcome against every repository placed in this application
+    if ledger:
+        ledger.update_hl_status(app_name, f"{status} - {reason}")
+
+def process_batch(batch, thread_id, output_txt_file, output_csv_file, RESULTS, SOURCES, HIGHLIGHT_EXE, ANALYZER_DIR, PERL, URL, TOKEN, COMPANY_ID, IGNORED_DIR, IGNORED_PATHS, IGNORED_FILES, Keyword_Scan, ledger=None):
     thread_log_file = f"thread_{thread_id}_{datetime.now().strftime('%Y-%m-%d_%H-%M-%S')}.log"
     logging.basicConfig(filename=thread_log_file, level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
     logging.info(f'Thread {thread_id} started.')
@@ -208,7 +218,7 @@ def process_batch(batch, thread_id, output_txt_file, output_csv_file, RESULTS, S
     for app_name, app_id in batch:
         #log_file = os.path.join(LOG_FOLDER, f'HLAutomation_{app_name}.log')
         log_file = os.path.join(RESULTS, rf'{app_name}\HLAutomation.log')
-        process_application(app_name, app_id, log_file, output_txt_file, output_csv_file, SOURCES, HIGHLIGHT_EXE, ANALYZER_DIR, PERL, URL, TOKEN, COMPANY_ID, IGNORED_DIR, IGNORED_PATHS, IGNORED_FILES, RESULTS, Keyword_Scan)
+        process_application(app_name, app_id, log_file, output_txt_file, output_csv_file, SOURCES, HIGHLIGHT_EXE, ANALYZER_DIR, PERL, URL, TOKEN, COMPANY_ID, IGNORED_DIR, IGNORED_PATHS, IGNORED_FILES, RESULTS, Keyword_Scan, ledger)
 
     end_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
     logging.info(f'Thread {thread_id} end time: {end_time}')
@@ -321,10 +331,17 @@ def main():
         for i, batch in enumerate(batches):
             print(f"Batch-{i+1}: Size-{len(batch)}\n{batch}\n") 
 
+        # Repository ledger written by CASTHL_Automation.py, when present
+        ledger = None
+        OUTPUT_DIR = properties.get('output_dir')
+        ORG_NAME = properties.get('github_org_name')
+        if OUTPUT_DIR and ORG_NAME and os.path.exists(os.path.join(OUTPUT_DIR, f"{ORG_NAME}_Repositories.db")):
+            ledger = RepoLedger(os.path.join(OUTPUT_DIR, f"{ORG_NAME}_Repositories.db"))
+
         # Process batches using multi-threading
         threads = []
         for i, batch in enumerate(batches, start=1):
-            thread = threading.Thread(target=process_batch, args=(batch, i, output_txt_file, output_csv_file, RESULTS, SOURCES, HIGHLIGHT_EXE, ANALYZER_DIR, PERL, URL, TOKEN, COMPANY_ID, IGNORED_DIR, IGNORED_PATHS, IGNORED_FILES, Keyword_Scan))
+            thread = threading.Thread(target=process_batch, args=(batch, i, output_txt_file, output_csv_file, RESULTS, SOURCES, HIGHLIGHT_EXE, ANALYZER_DIR, PERL, URL, TOKEN, COMPANY_ID, IGNORED_DIR, IGNORED_PATHS, IGNORED_FILES, Keyword_Scan, ledger))
             threads.append(thread)
 
         # Start threads
@@ -339,6 +356,9 @@ def main():
         end_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
         logging.info(f'End Time: {end_time}')
 
+        if ledger:
+            ledger.export_csv(os.path.join(OUTPUT_DIR, f"{ORG_NAME}_Repositories_Summary.csv"))
+
     except Exception as e:
         logging.error(f'{e}')
 
@@ -0,0 +1,59 @@
+import re
+
+
+class IgnoreRules:
+    """
+    The IGNORED_DIR, IGNORED_PATHS and IGNORED_FILES settings passed to the Highlight command line,
+    compiled once so archive members can be tested against them while extracting.
+
+    - IGNORED_DIR: folder names; a folder with one of these names is ignored with everything under it.
+    - IGNORED_PATHS: regular expression matched against the whole path of a folder or file, written
+      with forward slashes and a leading '/' (/src/test_utils/a.py).
+    - IGNORED_FILES: file names (Makefile, .gitignore) and extensions (.yaml).
+    Names are compared case-sensitively, as listed.
+    """
+
+    def __init__(self, ignored_dir='', ignored_paths='', ignored_files=''):
+        self.dir_names = {name.strip() for name in (ignored_dir or '').split(',') if name.strip()}
+        self.path_pattern = None
+        if ignored_paths and ignored_paths.strip():
+            try:
+                self.path_pattern = re.compile(ignored_paths.strip())
+            except re.error as e:
+                print(f"IGNORED_PATHS is not a valid regular expression, it is not applied at extraction: {e}")
+        file_entries = [name.strip() for name in (ignored_files or '').split(',') if name.strip()]
+        self.file_names = set(file_entries)
+        self.file_extensions = tuple(name for name in file_entries if name.startswith('.'))
+        self.dir_verdicts = {}
+
+    def describe(self):
+        # Recorded in extraction manifests; a tree extracted with other rules is extracted again
+        return {'dirs': sorted(self.dir_names), 'paths': self.path_pattern.pattern if self.path_pattern else None,
+                'files': sorted(self.file_names)}
+
+    def __bool__(self):
+        return bool(self.dir_names or self.path_pattern or self.file_names)
+
+    def ignores_dir(self, dir_path):
+        """
+        Tells whether a folder (relative path, '/'-separated, no trailing '/') is ignored, itself or through a parent.
+        """
+        if not dir_path:
+            return False
+        verdict = self.dir_verdicts.get(dir_path)
+        if verdict is None:
+            parent, _, name = dir_path.rpartition('/')
+            verdict = (self.ignores_dir(parent) or name in self.dir_names
+                       or bool(self.path_pattern and self.path_pattern.fullmatch('/' + dir_path)))
+            self.dir_verdicts[dir_path] = verdict
+        return verdict
+
+    def is_ignored(self, relative_name):
+        """
+        Tells whether an archive member (relative path, '/'-separated; folders end with '/') is ignored.
+        """
+        if relative_name.endswith('/'):
+            return self.ignores_dir(relative_name.rstrip('/'))
+        parent, _, name = relative_name.rpartition('/')
+        return (self.ignores_dir(parent) or name in self.file_names or name.endswith(self.file_extensions)
+                or bool(self.path_pattern and self.path_pattern.fullmatch('/' + relative_name)))
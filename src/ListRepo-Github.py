@@ -4,8 +4,14 @@ import os
 import shutil
 import datetime
 import json
+import sys
 
-def list_organization_repos(org_name, access_token, output_type):
+if not __package__:
+    # Run as a script (python src/ListRepo-Github.py): make the src package importable
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from src import GitHubApi
+
+def list_organization_repos(org_name, access_token, output_type, cache=None):
     url = f"https://api.github.com/orgs/{org_name}/repos"
     headers = {
         'Authorization': f'token {access_token}'
@@ -18,7 +24,7 @@ def list_organization_repos(org_name, access_token, output_type):
 
     # Fetch repositories with pagination
     while True:
-        response = requests.get(url, headers=headers, params=params)
+        response = GitHubApi.send_request(None, 'GET', url, headers=headers, params=params)
         if response.status_code == 200:
             repos_page = response.json()
             repos.extend(repos_page)
@@ -33,7 +39,7 @@ def list_organization_repos(org_name, access_token, output_type):
     output = []
     for repo in repos:
         repo_name = repo.get('name')
-        repo_size = get_repo_size(org_name, repo_name, access_token) if output_type == 2 else None
+        repo_size = get_repo_size(org_name, repo_name, access_token, cache) if output_type == 2 else None
         repo_size = f"{repo_size} KB" if repo_size else None
         if output_type == 1:
             output.append({'Repo_name': repo_name})
@@ -42,12 +48,12 @@ def list_organization_repos(org_name, access_token, output_type):
 
     return output
 
-def get_repo_size(org_name, repo_name, access_token):
+def get_repo_size(org_name, repo_name, access_token, cache=None):
     url = f"https://api.github.com/repos/{org_name}/{repo_name}"
     headers = {
         'Authorization': f'token {access_token}'
     }
-    response = requests.get(url, headers=headers)
+    response = cache.get(url, headers) if cache else GitHubApi.send_request(None, 'GET', url, headers=headers)
     if response.status_code == 200:
         repo_data = response.json()
         size = repo_data.get('size', 'N/A')
@@ -74,7 +80,7 @@ def checkout_master_branch(org_name, repo_name, access_token, destination_path):
     }
     try:
         start_time = datetime.datetime.now()
-        response = requests.get(url, headers=headers, stream=True)
+        response = GitHubApi.send_request(None, 'GET', url, headers=headers, stream=True)
         end_time = datetime.datetime.now()
         
         if response.status_code == 200:
@@ -91,7 +97,7 @@ def checkout_master_branch(org_name, repo_name, access_token, destination_path):
         print(f"Failed to download {repo_name}. Error: {e}")
         print(f"Moving to the next repository.")
       
-def get_all_repo_metadata(org_name, access_token):
+def get_all_repo_metadata(org_name, access_token, cache=None):
     start_time = datetime.datetime.now()
     log_messages = []
 
@@ -108,7 +114,7 @@ def get_all_repo_metadata(org_name, access_token):
         page_number = 1
         while True:
             repo_url = f"https://api.github.com/orgs/{org_name}/repos?per_page=100&page={page_number}"
-            response = requests.get(repo_url, headers=headers)
+            response = cache.get(repo_url, headers) if cache else GitHubApi.send_request(None, 'GET', repo_url, headers=headers)
             response.raise_for_status()  # Raise an exception for 4xx or 5xx status codes
 
             repos = response.json()
@@ -137,13 +143,14 @@ def get_all_repo_metadata(org_name, access_token):
         for message in log_messages:
             log_file.write(message + "\n")
 
-def get_single_repo_metadata(org_name, repo_name):
+def get_single_repo_metadata(org_name, repo_name, cache=None):
     start_time = datetime.datetime.now()
     log_messages = []
 
     try:
-        # Fetch repository metadata from GitHub API
-        repo_response = requests.get(f"https://api.github.com/repos/{org_name}/{repo_name}")
+        # Fetch repository metadata from GitHub API (conditional request when a cache is given)
+        repo_url = f"https://api.github.com/repos/{org_name}/{repo_name}"
+        repo_response = cache.get(repo_url) if cache else GitHubApi.send_request(None, 'GET', repo_url)
         repo_response.raise_for_status()  # Raise an exception for 4xx or 5xx status codes
 
         repo_metadata = repo_response.json()
@@ -173,6 +180,8 @@ def main():
     ORG_NAME = input("Enter the name of the GitHub organization: ")
     ACCESS_TOKEN = input("Enter GitHub access token: ")
     GITAPI_URL = "https://api.github.com/orgs/CAST-Extend/repos"
+    CACHE_DIR = input("Enter a folder to cache GitHub responses in (leave empty for no cache): ").strip()
+    cache = GitHubApi.HttpCache(CACHE_DIR) if CACHE_DIR else None
     
     while True:
         print("Select options:")
@@ -191,7 +200,7 @@ def main():
 
     output_type = int(choice)
     if output_type in [1, 2]:
-        output = list_organization_repos(ORG_NAME, ACCESS_TOKEN, output_type)
+        output = list_organization_repos(ORG_NAME, ACCESS_TOKEN, output_type, cache)
         if output:
             if output_type == 2:
                 output_filename = "Repo-output.csv"
@@ -214,10 +223,10 @@ def main():
         for repo in list_organization_repos(ORG_NAME, ACCESS_TOKEN, 1):
             checkout_master_branch(ORG_NAME, repo['Repo_name'], ACCESS_TOKEN, destination_path)
     elif output_type == 4:
-         get_all_repo_metadata(ORG_NAME, ACCESS_TOKEN)
+         get_all_repo_metadata(ORG_NAME, ACCESS_TOKEN, cache)
     elif output_type == 5:
         repo_name = input("Enter the name of the repository: ")
-        get_single_repo_metadata(ORG_NAME, repo_name)
+        get_single_repo_metadata(ORG_NAME, repo_name, cache)
     else:
         print("Invalid choice.")
 
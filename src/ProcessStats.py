@@ -0,0 +1,48 @@
+import os
+import sys
+
+
+def peak_rss_bytes():
+    """
+    Returns the peak resident set size (peak working set on Windows) of the current process.
+    Returns:
+        int: Peak RSS in bytes, or None when it cannot be read on this platform.
+    """
+    try:
+        if os.name == 'nt':
+            import ctypes
+            from ctypes import wintypes
+
+            class PROCESS_MEMORY_COUNTERS(ctypes.Structure):
+                _fields_ = [('cb', wintypes.DWORD),
+                            ('PageFaultCount', wintypes.DWORD),
+                            ('PeakWorkingSetSize', ctypes.c_size_t),
+                            ('WorkingSetSize', ctypes.c_size_t),
+                            ('QuotaPeakPagedPoolUsage', ctypes.c_size_t),
+                            ('QuotaPagedPoolUsage', ctypes.c_size_t),
+                            ('QuotaPeakNonPagedPoolUsage', ctypes.c_size_t),
+                            ('QuotaNonPagedPoolUsage', ctypes.c_size_t),
+                            ('PagefileUsage', ctypes.c_size_t),
+                            ('PeakPagefileUsage', ctypes.c_size_t)]
+
+            counters = PROCESS_MEMORY_COUNTERS()
+            counters.cb = ctypes.sizeof(PROCESS_MEMORY_COUNTERS)
+            get_current_process = ctypes.windll.kernel32.GetCurrentProcess
+            get_current_process.restype = wintypes.HANDLE
+            get_process_memory_info = ctypes.windll.psapi.GetProcessMemoryInfo
+            get_process_memory_info.argtypes = [wintypes.HANDLE, ctypes.POINTER(PROCESS_MEMORY_COUNTERS), wintypes.DWORD]
+            if not get_process_memory_info(get_current_process(), ctypes.byref(counters), counters.cb):
+                return None
+            return counters.PeakWorkingSetSize
+
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # ru_maxrss is in bytes on macOS and in kilobytes on Linux
+        return peak if sys.platform == 'darwin' else peak * 1024
+    except Exception as e:
+        print(f"Error while executing peak_rss_bytes() function: {e}")
+        return None
+
+
+def format_megabytes(num_bytes):
+    return "n/a" if num_bytes is None else f"{num_bytes / (1024 * 1024):.1f} MB"
@@ -0,0 +1,268 @@
+import contextlib
+import email.utils
+import hashlib
+import json
+import os
+import threading
+import time
+
+# A lock file older than this is left by a run that died while holding it
+STALE_LOCK_SECONDS = 30
+
+
+def parse_retry_after(value, now):
+    """
+    Returns the epoch time given by a Retry-After header (seconds or HTTP date), or None.
+    """
+    if not value:
+        return None
+    try:
+        return now + float(value)
+    except ValueError:
+        pass
+    try:
+        return email.utils.parsedate_to_datetime(value).timestamp()
+    except (TypeError, ValueError):
+        return None
+
+
+def parse_tokens(value):
+    """
+    Splits the github_token setting (one token, or several separated by commas) into a list.
+    """
+    return [token.strip() for token in (value or '').replace(';', ',').split(',') if token.strip()]
+
+
+def token_key(token):
+    # Tokens are identified by a digest in the state file and by their last characters in reports
+    return hashlib.sha1(token.encode('utf-8')).hexdigest()[:12] if token else 'anonymous'
+
+
+class RateLimitGovernor:
+    """
+    Paces the GitHub requests of every thread of the process, and of every run sharing state_path.
+
+    Quotas are tracked per token. Before each request acquire() picks the token of the pool with the most
+    remaining quota (skipping revoked tokens and tokens waiting for their window to reset), then waits while
+    a Retry-After pause of that token is in force, while its remaining quota is down to reserve (until its
+    window resets, so the quota is never exhausted), and for a token of the bucket refilled at
+    requests_per_second (burst at most; no pacing when requests_per_second is 0). After each response
+    observe() reads X-RateLimit-Remaining/Reset and Retry-After. The time spent waiting and the usage of
+    each token are reported by summary().
+    """
+
+    def __init__(self, requests_per_second=0, burst=10, reserve=50, state_path=None):
+        self.lock = threading.Lock()
+        self.throttle_seconds = 0.0
+        self.throttle_waits = 0
+        self.rate_limited_responses = 0
+        self.token_pool = []
+        self.usage = {}
+        self.state = {'tokens': float(burst), 'updated': time.time(), 'quotas': {}}
+        self.configure(requests_per_second, burst, reserve, state_path)
+
+    def configure(self, requests_per_second=0, burst=10, reserve=50, state_path=None, tokens=None):
+        """
+        Applies the settings; tokens (list) is the pool requests pick from, None keeps the token each caller gives.
+        """
+        with self.lock:
+            self.requests_per_second = requests_per_second or 0
+            self.burst = max(1, burst)
+            self.reserve = max(0, reserve)
+            self.state_path = state_path or None
+            self.state['tokens'] = min(self.state['tokens'], float(self.burst))
+            self.token_pool = list(tokens or [])
+
+    @contextlib.contextmanager
+    def shared_state(self):
+        # With a state file, the file is the state: it is read and written back under a lock file
+        if not self.state_path:
+            yield
+            return
+        lock_path = self.state_path + '.lock'
+        while True:
+            try:
+                lock_fd = os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+                break
+            except FileExistsError:
+                try:
+                    if time.time() - os.path.getmtime(lock_path) > STALE_LOCK_SECONDS:
+                        os.remove(lock_path)
+                        continue
+                except OSError:
+                    pass
+                time.sleep(0.01)
+        try:
+            try:
+                with open(self.state_path, 'r') as state_file:
+                    self.state.update(json.load(state_file))
+            except (OSError, ValueError):
+                pass
+            yield
+            temp_path = f"{self.state_path}.{os.getpid()}.tmp"
+            with open(temp_path, 'w') as state_file:
+                json.dump(self.state, state_file)
+            os.replace(temp_path, self.state_path)
+        finally:
+            os.close(lock_fd)
+            os.remove(lock_path)
+
+    def quota(self, token, now):
+        quota = self.state['quotas'].setdefault(token_key(token), {'remaining': None, 'reset': None, 'pause_until': 0.0, 'revoked': False})
+        if quota['reset'] and quota['reset'] <= now:
+            # A new window started; the quota is unknown until the next response
+            quota['remaining'] = None
+            quota['reset'] = None
+        return quota
+
+    def available_at(self, quota, now):
+        # When the token can be used again (now when it has quota left)
+        available_at = quota['pause_until']
+        if quota['remaining'] is not None and quota['remaining'] <= self.reserve:
+            available_at = max(available_at, quota['reset'] + 1)
+        return max(available_at, now)
+
+    def choose_token(self, now):
+        """
+        Returns the token of the pool with the most remaining quota among those usable now,
+        else the one usable first. Revoked tokens are only returned when no other token is left.
+        """
+        candidates = [token for token in self.token_pool if not self.quota(token, now)['revoked']] or self.token_pool
+        usable = [token for token in candidates if self.available_at(self.quota(token, now), now) <= now]
+        if usable:
+            remaining = lambda token: self.quota(token, now)['remaining']
+            return max(usable, key=lambda token: float('inf') if remaining(token) is None else remaining(token))
+        return min(candidates, key=lambda token: self.available_at(self.quota(token, now), now))
+
+    def reserve_request(self, token, now):
+        """
+        Takes the right to send one request with token. Returns 0, or the seconds to wait before asking again.
+        """
+        quota = self.quota(token, now)
+        wait = self.available_at(quota, now) - now
+        if wait > 0:
+            return wait
+        state = self.state
+        if self.requests_per_second:
+            state['tokens'] = min(float(self.burst), state['tokens'] + (now - state['updated']) * self.requests_per_second)
+            state['updated'] = now
+            if state['tokens'] < 1:
+                return (1 - state['tokens']) / self.requests_per_second
+            state['tokens'] -= 1
+        if quota['remaining'] is not None:
+            quota['remaining'] -= 1
+        return 0
+
+    def acquire(self, token=None, anonymous=False):
+        """
+        Blocks until a request may be sent.
+        Parameters:
+            token (str): Token of the caller, used when no token pool is configured.
+            anonymous (bool): The request is sent without a token; it is counted against the anonymous quota
+                of its own instead of a token of the pool.
+        Returns:
+            str: The token to send the request with.
+        """
+        waited = 0.0
+        while True:
+            with self.lock, self.shared_state():
+                now = time.time()
+                if anonymous:
+                    token = None
+                elif self.token_pool:
+                    token = self.choose_token(now)
+                wait = self.reserve_request(token, now)
+                if wait <= 0:
+                    usage = self.usage.setdefault(token_key(token), {'label': f"...{token[-4:]}" if token else 'anonymous',
+                                                                     'requests': 0, 'rate_limited': 0})
+                    usage['requests'] += 1
+            if wait <= 0:
+                break
+            time.sleep(wait)
+            waited += wait
+        if waited:
+            with self.lock:
+                self.throttle_seconds += waited
+                self.throttle_waits += 1
+        return token
+
+    def authorize(self, headers):
+        """
+        Waits for the right to send a request and puts the token to use in the Authorization header
+        (keeping its scheme, 'token' or 'Bearer'). A request without an Authorization header stays anonymous
+        and uses the anonymous quota, tracked apart from the tokens of the pool.
+        Returns:
+            tuple: (request headers, token used).
+        """
+        headers = dict(headers or {})
+        authorization = headers.get('Authorization')
+        scheme, _, token = authorization.partition(' ') if authorization else ('', '', '')
+        token = self.acquire(token or None, anonymous=not authorization)
+        if authorization and token:
+            headers['Authorization'] = f"{scheme} {token}"
+        return headers, token
+
+    def observe(self, status_code, headers, token=None):
+        """
+        Reads the rate-limit headers of a response sent with token.
+        Returns:
+            bool: True when the request should be sent again: it was refused by a primary or secondary
+            rate limit, or its token was revoked and the pool has other tokens.
+        """
+        now = time.time()
+        remaining = headers.get('X-RateLimit-Remaining')
+        reset = headers.get('X-RateLimit-Reset')
+        resend = False
+        with self.lock, self.shared_state():
+            quota = self.quota(token, now)
+            if remaining is not None and reset is not None:
+                remaining, reset = int(remaining), float(reset)
+                if quota['remaining'] is None or quota['reset'] != reset:
+                    quota['remaining'] = remaining
+                else:
+                    # Requests still in flight were counted when they were sent
+                    quota['remaining'] = min(quota['remaining'], remaining)
+                quota['reset'] = reset
+            if status_code == 401 and token in self.token_pool:
+                quota['revoked'] = True
+                resend = any(not self.quota(other, now)['revoked'] for other in self.token_pool)
+            if status_code in (403, 429):
+                pause_until = parse_retry_after(headers.get('Retry-After'), now)
+                if pause_until is None and remaining == 0 and reset:
+                    pause_until = reset + 1
+                if pause_until is None and status_code == 429:
+                    pause_until = now + 60
+                if pause_until is not None:
+                    resend = True
+                    quota['pause_until'] = max(quota['pause_until'], pause_until)
+                    self.rate_limited_responses += 1
+                    usage = self.usage.get(token_key(token))
+                    if usage:
+                        usage['rate_limited'] += 1
+        return resend
+
+    def observe_response(self, response, token=None):
+        # The redirect answered by api.github.com carries the rate-limit headers of an archive download
+        resend = False
+        for hop in list(getattr(response, 'history', None) or []) + [response]:
+            resend = self.observe(hop.status_code, hop.headers, token) or resend
+        return resend
+
+    def summary(self):
+        lines = [f"GitHub rate limit: {self.throttle_seconds:.1f} s throttled in {self.throttle_waits} wait(s), "
+                 f"{self.rate_limited_responses} rate-limited response(s)."]
+        now = time.time()
+        with self.lock:
+            for key, usage in self.usage.items():
+                quota = self.state['quotas'].get(key, {})
+                line = f"  Token {usage['label']}: {usage['requests']} request(s), {usage['rate_limited']} rate-limited"
+                if quota.get('revoked'):
+                    line += ", revoked or invalid (401)"
+                elif quota.get('remaining') is not None and quota.get('reset'):
+                    line += f", {quota['remaining']} remaining until {time.strftime('%H:%M:%S', time.localtime(quota['reset']))}"
+                lines.append(line)
+        return "\n".join(lines)
+
+
+# Shared by every GitHub request of the process; main_operations() applies the [GitHub] rate_limit_* settings
+governor = RateLimitGovernor()
@@ -0,0 +1,256 @@
+import json
+import math
+import os
+import shutil
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from src.RateLimitGovernor import governor
+
+# Errors after which the download is retried; the partial file is kept so the retry resumes
+RETRYABLE_EXCEPTIONS = (requests.exceptions.ConnectionError, requests.exceptions.Timeout, requests.exceptions.ChunkedEncodingError)
+
+# Rate-limited answers are waited out and sent again at most this many times per download
+MAX_RATE_LIMITED_ATTEMPTS = 5
+
+
+class TransientDownloadError(Exception):
+    """
+    Raised for a 5xx answer or an archive that ended early; the download is retried with backoff.
+    """
+
+
+class RateLimitedError(TransientDownloadError):
+    """
+    Raised when GitHub refused the request because of a rate limit; the governor holds the next request
+    until the limit is over, and the retry does not count against the retries of the download.
+    """
+
+
+class ArchiveChangedError(TransientDownloadError):
+    """
+    Raised when a range request is answered with the whole archive because it changed since the download started.
+    """
+
+
+def state_path(part_path):
+    return part_path + '.json'
+
+
+def segment_path(part_path, index):
+    return f"{part_path}.seg{index}"
+
+
+def read_partial_state(part_path):
+    """
+    Returns what is known about a partial download (url, etag, total size, segment count), or {}.
+    """
+    try:
+        with open(state_path(part_path), 'r') as state_file:
+            return json.load(state_file)
+    except (OSError, ValueError):
+        return {}
+
+
+def write_partial_state(part_path, state):
+    with open(state_path(part_path), 'w') as state_file:
+        json.dump(state, state_file)
+
+
+def has_partial_download(repository_path):
+    return os.path.exists(state_path(repository_path + '.part'))
+
+
+def remove_partial_download(part_path):
+    state = read_partial_state(part_path)
+    paths = [part_path, state_path(part_path)] + [segment_path(part_path, index) for index in range(state.get('segments') or 0)]
+    for path in paths:
+        if os.path.exists(path):
+            os.remove(path)
+
+
+def parse_content_range(value):
+    # "bytes 100-199/1000" -> 1000; None when the total is unknown ("*")
+    try:
+        total = value.split('/')[1].strip()
+        return int(total) if total != '*' else None
+    except (AttributeError, IndexError, ValueError):
+        return None
+
+
+def check_transient_status(response, token):
+    if governor.observe_response(response, token):
+        raise RateLimitedError(f"{response.status_code} {response.reason}")
+    if response.status_code >= 500:
+        raise TransientDownloadError(f"{response.status_code} {response.reason}")
+
+
+def stream_to_file(response, path, mode, chunk_size, write_buffer_size):
+    with open(path, mode, buffering=write_buffer_size) as f:
+        for chunk in response.iter_content(chunk_size=chunk_size):
+            f.write(chunk)
+
+
+def download_segment(repository_url, headers, etag, path, start, end, chunk_size, write_buffer_size, timeout):
+    """
+    Downloads bytes start..end (inclusive) of the archive into path, continuing after the bytes already in path.
+    """
+    done = os.path.getsize(path) if os.path.exists(path) else 0
+    if start + done > end:
+        return
+    request_headers = dict(headers, Range=f"bytes={start + done}-{end}")
+    if etag:
+        request_headers['If-Range'] = etag
+    request_headers, token = governor.authorize(request_headers)
+    with requests.get(repository_url, headers=request_headers, stream=True, timeout=timeout) as response:
+        check_transient_status(response, token)
+        if response.status_code != 206:
+            raise ArchiveChangedError(f"segment request answered {response.status_code} {response.reason}")
+        stream_to_file(response, path, 'ab', chunk_size, write_buffer_size)
+    if os.path.getsize(path) != end - start + 1:
+        raise TransientDownloadError(f"segment {start}-{end} ended early")
+
+
+def download_segmented(repository_url, headers, part_path, state, chunk_size, write_buffer_size, timeout):
+    """
+    Downloads the archive as state['segments'] parallel byte ranges, then joins them into part_path.
+    Each segment resumes from its own file, so an interrupted segmented download continues where it stopped.
+    """
+    total = state['total']
+    segments = state['segments']
+    segment_size = math.ceil(total / segments)
+    ranges = [(segment_path(part_path, index), index * segment_size, min(total, (index + 1) * segment_size) - 1)
+              for index in range(segments)]
+    try:
+        with ThreadPoolExecutor(max_workers=segments) as executor:
+            futures = [executor.submit(download_segment, repository_url, headers, state.get('etag'), path, start, end,
+                                       chunk_size, write_buffer_size, timeout)
+                       for path, start, end in ranges]
+            for future in futures:
+                future.result()
+    except ArchiveChangedError:
+        # The segments already on disk belong to an older archive; the retry starts over
+        remove_partial_download(part_path)
+        raise
+
+    with open(part_path, 'wb', buffering=write_buffer_size) as part_file:
+        for path, start, end in ranges:
+            with open(path, 'rb') as segment_file:
+                shutil.copyfileobj(segment_file, part_file, write_buffer_size)
+    for path, start, end in ranges:
+        os.remove(path)
+
+
+def download_attempt(repository_url, headers, part_path, chunk_size, write_buffer_size, resume, segments, segment_min_bytes, timeout):
+    """
+    One attempt at completing part_path.
+    Returns:
+        str: None when part_path holds the complete archive, otherwise the reason of a failure that is not retried.
+    """
+    state = read_partial_state(part_path) if resume else {}
+    if state.get('url') != repository_url:
+        remove_partial_download(part_path)
+        state = {}
+    if state.get('segments'):
+        download_segmented(repository_url, headers, part_path, state, chunk_size, write_buffer_size, timeout)
+        return None
+
+    offset = os.path.getsize(part_path) if state and os.path.exists(part_path) else 0
+    request_headers = dict(headers)
+    if offset:
+        request_headers['Range'] = f"bytes={offset}-"
+        if state.get('etag'):
+            request_headers['If-Range'] = state['etag']
+
+    request_headers, token = governor.authorize(request_headers)
+    with requests.get(repository_url, headers=request_headers, stream=True, timeout=timeout) as response:
+        check_transient_status(response, token)
+        if response.status_code == 416:
+            remove_partial_download(part_path)
+            raise TransientDownloadError(f"{response.status_code} {response.reason}")
+        if response.status_code not in (200, 206):
+            remove_partial_download(part_path)
+            return f"{response.status_code} {response.reason}"
+
+        if response.status_code == 206:
+            total = parse_content_range(response.headers.get('Content-Range'))
+        else:
+            content_length = response.headers.get('Content-Length')
+            total = int(content_length) if content_length and content_length.isdigit() else None
+        state = {'url': repository_url, 'etag': response.headers.get('ETag'), 'total': total}
+
+        accepts_ranges = response.headers.get('Accept-Ranges', '').lower() == 'bytes'
+        if response.status_code == 200 and accepts_ranges and total and segments > 1 and total >= segment_min_bytes:
+            state['segments'] = segments
+            write_partial_state(part_path, state)
+            response.close()
+            download_segmented(repository_url, headers, part_path, state, chunk_size, write_buffer_size, timeout)
+            return None
+
+        # 206 continues the partial file; 200 means the server sent the whole archive again
+        write_partial_state(part_path, state)
+        stream_to_file(response, part_path, 'ab' if response.status_code == 206 else 'wb', chunk_size, write_buffer_size)
+
+    if total and os.path.getsize(part_path) != total:
+        raise TransientDownloadError(f"connection closed after {os.path.getsize(part_path)} of {total} bytes")
+    return None
+
+
+def download_archive(repository_url, repository_path, token, chunk_size=1024 * 1024, write_buffer_size=1024 * 1024, resume=True,
+                     segments=1, segment_min_bytes=256 * 1024 * 1024, retries=3, backoff_seconds=2, timeout=60):
+    """
+    Downloads an archive to repository_path through repository_path + '.part'.
+
+    A partial download left by an earlier attempt or run is continued with a Range request (If-Range on its
+    ETag, so a changed archive is downloaded again from the start). When the server advertises
+    Accept-Ranges and the archive is at least segment_min_bytes, it is downloaded as parallel byte-range
+    segments. 5xx answers and connection errors are retried up to retries times, waiting backoff_seconds,
+    then twice as long after each failure. Every request goes through the rate-limit governor; answers
+    refused by a rate limit are sent again once the limit is over without using a retry.
+    Parameters:
+        repository_url (str): The archive URL.
+        repository_path (str): The path of the complete archive.
+        token (str): The GitHub access token.
+        chunk_size (int): Bytes read from the response at a time.
+        write_buffer_size (int): Buffer size of the output file, in bytes.
+        resume (bool): Keep partial downloads and continue them.
+        segments (int): Number of parallel byte ranges for large archives (1 disables segmenting).
+        segment_min_bytes (int): Smallest archive downloaded in segments.
+        retries (int): Number of retries after a transient failure.
+        backoff_seconds (float): Wait before the first retry.
+        timeout (float): Connect and read timeout of each request, in seconds.
+    Returns:
+        tuple: (True, None) on success, (False, reason) otherwise.
+    """
+    part_path = repository_path + '.part'
+    headers = {'Authorization': f'token {token}'}
+    reason = None
+    attempt = 0
+    rate_limited = 0
+    while attempt <= retries:
+        try:
+            reason = download_attempt(repository_url, headers, part_path, chunk_size, write_buffer_size, resume, segments,
+                                      segment_min_bytes, timeout)
+            if reason is not None:
+                return False, reason
+            os.replace(part_path, repository_path)
+            remove_partial_download(part_path)
+            return True, None
+        except RateLimitedError as e:
+            # The governor waits for the rate limit to be over before the next request
+            reason = str(e)
+            rate_limited += 1
+            if rate_limited > MAX_RATE_LIMITED_ATTEMPTS:
+                break
+        except (TransientDownloadError,) + RETRYABLE_EXCEPTIONS as e:
+            reason = str(e)
+            if attempt < retries:
+                wait = backoff_seconds * (2 ** attempt)
+                print(f"Download of {repository_url} failed ({reason}), retrying in {wait} seconds.")
+                time.sleep(wait)
+            attempt += 1
+    if not resume:
+        remove_partial_download(part_path)
+    return False, reason
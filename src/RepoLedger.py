@@ -0,0 +1,299 @@
+import csv
+import datetime
+import os
+import sqlite3
+import threading
+
+# Columns of {org}_Repositories_Summary.csv, in the order they are exported
+SUMMARY_HEADERS = ['id', 'name', 'default_branch', 'size', 'created_at', 'updated_at', 'pushed_at', 'clone_url', 'archive_url', 'batch_number',
+                   'repo_archive_download_api', 'Download', 'Download_Status']
+
+# Per-step state tracked by the ledger in addition to the summary columns
+STATUS_HEADERS = ['Extraction_Status', 'Target_Application', 'HL_Status', 'Download_Seconds']
+
+LEDGER_HEADERS = SUMMARY_HEADERS + STATUS_HEADERS
+
+# Columns written by a metadata refresh; the status columns are left to the steps that own them
+METADATA_HEADERS = SUMMARY_HEADERS[1:]
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS repositories (
+    id INTEGER PRIMARY KEY,
+    position INTEGER,
+    name TEXT NOT NULL,
+    default_branch TEXT,
+    size INTEGER,
+    created_at TEXT,
+    updated_at TEXT,
+    pushed_at TEXT,
+    clone_url TEXT,
+    archive_url TEXT,
+    batch_number INTEGER,
+    repo_archive_download_api TEXT,
+    Download TEXT DEFAULT 'N',
+    Download_Status TEXT DEFAULT '',
+    Extraction_Status TEXT DEFAULT '',
+    Target_Application TEXT DEFAULT '',
+    HL_Status TEXT DEFAULT '',
+    Download_Seconds REAL
+);
+CREATE INDEX IF NOT EXISTS idx_repositories_name ON repositories(name);
+CREATE INDEX IF NOT EXISTS idx_repositories_download ON repositories(Download, batch_number);
+CREATE INDEX IF NOT EXISTS idx_repositories_position ON repositories(position);
+"""
+
+# Columns added after the first release of the ledger, created on open when missing
+ADDED_COLUMNS = {
+    'Download_Seconds': 'REAL'
+}
+
+
+def normalize_timestamp(value):
+    """
+    Stores timestamps as GitHub formats them (2024-01-31T12:00:00Z) so they compare as text,
+    whatever format an imported CSV used (pandas writes 2024-01-31 12:00:00+00:00).
+    """
+    if value is None or str(value).strip() in ('', 'nan', 'NaT'):
+        return None
+    text = str(value).strip()
+    try:
+        parsed = datetime.datetime.fromisoformat(text.replace('Z', '+00:00'))
+    except ValueError:
+        return text
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=datetime.timezone.utc)
+    return parsed.astimezone(datetime.timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
+
+
+class RepoLedger:
+    """
+    SQLite store of every repository of the organization, keyed by repository id.
+
+    It is the system of record for the metadata, batch, download, extraction, target application and
+    Highlight status of each repository. Steps update single rows and run filtered queries; the
+    {org}_Repositories_Summary.csv file is an export of this table for humans.
+    Each thread gets its own connection; the database runs in WAL mode so readers never block the writer.
+    """
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self.local = threading.local()
+        self.connection.executescript(SCHEMA)
+        existing_columns = {row['name'] for row in self.connection.execute("PRAGMA table_info(repositories)")}
+        for column, column_type in ADDED_COLUMNS.items():
+            if column not in existing_columns:
+                self.connection.execute(f"ALTER TABLE repositories ADD COLUMN {column} {column_type}")
+
+    @property
+    def connection(self):
+        connection = getattr(self.local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.db_path, timeout=60)
+            connection.row_factory = sqlite3.Row
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self.local.connection = connection
+        return connection
+
+    def close(self):
+        connection = getattr(self.local, "connection", None)
+        if connection is not None:
+            connection.close()
+            self.local.connection = None
+
+    def count(self):
+        return self.connection.execute("SELECT COUNT(*) FROM repositories").fetchone()[0]
+
+    def max_position(self):
+        return self.connection.execute("SELECT COALESCE(MAX(position), 0) FROM repositories").fetchone()[0]
+
+    def row_values(self, row_data, position):
+        values = {key: row_data.get(key) for key in SUMMARY_HEADERS}
+        values['pushed_at'] = normalize_timestamp(values['pushed_at'])
+        values['created_at'] = normalize_timestamp(values['created_at'])
+        values['updated_at'] = normalize_timestamp(values['updated_at'])
+        values['position'] = position
+        return values
+
+    def upsert_repositories(self, rows, keep_batch_number=False):
+        """
+        Inserts or updates the metadata columns of the given summary rows.
+        Parameters:
+            rows (iterable): (position, row dict keyed by SUMMARY_HEADERS) pairs.
+            keep_batch_number (bool): Keep the batch number and position of repositories already in the ledger.
+        Returns:
+            int: Number of rows written.
+        """
+        columns = ['id', 'position'] + METADATA_HEADERS
+        kept = ('batch_number', 'position') if keep_batch_number else ()
+        updates = ", ".join(f"{column}=excluded.{column}" for column in columns[1:] if column not in kept)
+        statement = (f"INSERT INTO repositories ({', '.join(columns)}) VALUES ({', '.join(':' + column for column in columns)}) "
+                     f"ON CONFLICT(id) DO UPDATE SET {updates}")
+        count = 0
+        with self.connection:
+            for position, row_data in rows:
+                self.connection.execute(statement, self.row_values(row_data, position))
+                count += 1
+        return count
+
+    def sync_listing(self, rows):
+        """
+        Replaces the ledger content with a full organization listing.
+        Repositories missing from the listing are deleted; the status columns of the others are kept.
+        Parameters:
+            rows (iterable): Summary rows (dicts keyed by SUMMARY_HEADERS) in listing order.
+        Returns:
+            int: Number of repositories listed.
+        """
+        connection = self.connection
+        connection.execute("CREATE TEMP TABLE IF NOT EXISTS listed_ids (id INTEGER PRIMARY KEY)")
+        connection.execute("DELETE FROM listed_ids")
+
+        def listed_rows():
+            for position, row_data in enumerate(rows, start=1):
+                connection.execute("INSERT OR IGNORE INTO listed_ids (id) VALUES (?)", (row_data['id'],))
+                yield position, row_data
+
+        count = self.upsert_repositories(listed_rows())
+        with connection:
+            connection.execute("DELETE FROM repositories WHERE id NOT IN (SELECT id FROM listed_ids)")
+            connection.execute("DELETE FROM listed_ids")
+        return count
+
+    def import_csv(self, csv_file_path):
+        """
+        Loads an existing {org}_Repositories_Summary.csv (migration from the CSV-only layout).
+        """
+        with open(csv_file_path, 'r', newline='', encoding='latin-1') as csv_file:
+            reader = csv.DictReader(csv_file)
+            rows = list(enumerate(reader, start=1))
+        self.upsert_repositories(rows)
+        with self.connection:
+            for position, row_data in rows:
+                self.connection.execute("UPDATE repositories SET Download_Status=? WHERE id=?", (row_data.get('Download_Status') or '', row_data['id']))
+        return len(rows)
+
+    def import_selection(self, csv_file_path):
+        """
+        Reads the Download and batch_number columns of the exported summary CSV back into the ledger, so
+        repositories can still be selected for download by editing that file. Rows are matched by id; other
+        columns and values that are not Y/N or a number are ignored.
+        Returns:
+            int: Number of repositories whose Download flag or batch number changed.
+        """
+        current = {row['id']: (row['Download'], row['batch_number'])
+                   for row in self.connection.execute("SELECT id, Download, batch_number FROM repositories")}
+        updates = []
+        # Saved again by a spreadsheet program, the file may start with a BOM or use another code page
+        with open(csv_file_path, 'r', newline='', encoding='utf-8-sig', errors='replace') as csv_file:
+            for row_data in csv.DictReader(csv_file):
+                try:
+                    repo_id = int(float(row_data['id']))
+                except (KeyError, TypeError, ValueError):
+                    continue
+                if repo_id not in current:
+                    continue
+                download, batch_number = current[repo_id]
+                edited_download = (row_data.get('Download') or '').strip().upper()
+                if edited_download in ('Y', 'N'):
+                    download = edited_download
+                try:
+                    batch_number = int(float(row_data.get('batch_number') or ''))
+                except ValueError:
+                    pass
+                if (download, batch_number) != current[repo_id]:
+                    updates.append((download, batch_number, repo_id))
+        with self.connection:
+            self.connection.executemany("UPDATE repositories SET Download=?, batch_number=? WHERE id=?", updates)
+        return len(updates)
+
+    def ids_and_names(self):
+        return {str(row['id']): row['name'] for row in self.connection.execute("SELECT id, name FROM repositories")}
+
+    def delete_repositories(self, repo_ids):
+        with self.connection:
+            self.connection.executemany("DELETE FROM repositories WHERE id=?", [(repo_id,) for repo_id in repo_ids])
+
+    def rename_repository(self, repo_id, org_name, old_name, new_name):
+        # Renamed repositories keep their id; only the name and the URLs derived from it change
+        with self.connection:
+            self.connection.execute(
+                "UPDATE repositories SET name=?, "
+                "clone_url=REPLACE(clone_url, ?, ?), archive_url=REPLACE(archive_url, ?, ?), "
+                "repo_archive_download_api=REPLACE(repo_archive_download_api, ?, ?) WHERE id=?",
+                (new_name,
+                 f"/{org_name}/{old_name}.git", f"/{org_name}/{new_name}.git",
+                 f"/{org_name}/{old_name}/", f"/{org_name}/{new_name}/",
+                 f"/{org_name}/{old_name}/", f"/{org_name}/{new_name}/",
+                 repo_id))
+
+    def refresh_download_flags(self, refresh_cutoff):
+        """
+        Marks Download='Y' for repositories pushed after refresh_cutoff and clears the download status of all.
+        """
+        cutoff = refresh_cutoff.astimezone(datetime.timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
+        with self.connection:
+            self.connection.execute(
+                "UPDATE repositories SET Download = CASE WHEN pushed_at > ? THEN 'Y' ELSE 'N' END, Download_Status = ''",
+                (cutoff,))
+
+    def apply_download_results(self, results):
+        """
+        Writes download results (dicts with 'id', 'Download_Status' and 'Download_Seconds') in one transaction.
+        The recorded download time is only replaced when the result carries one.
+        """
+        with self.connection:
+            self.connection.executemany(
+                "UPDATE repositories SET Download_Status=?, Download_Seconds=COALESCE(?, Download_Seconds) WHERE id=?",
+                [(result['Download_Status'], result.get('Download_Seconds'), result['id']) for result in results])
+
+    def assign_batches(self, assignments):
+        """
+        Sets the batch number of the given repositories (dict repository id -> batch number).
+        """
+        with self.connection:
+            self.connection.executemany("UPDATE repositories SET batch_number=? WHERE id=?",
+                                        [(batch_number, repo_id) for repo_id, batch_number in assignments.items()])
+
+    def update_extraction_status(self, repo_name, extraction_status):
+        with self.connection:
+            self.connection.execute("UPDATE repositories SET Extraction_Status=? WHERE name=?", (extraction_status, repo_name))
+
+    def add_target_application(self, repo_name, app_name):
+        row = self.connection.execute("SELECT Target_Application FROM repositories WHERE name=?", (repo_name,)).fetchone()
+        if row is None:
+            return
+        applications = [app for app in (row['Target_Application'] or '').split(';') if app]
+        if app_name not in applications:
+            applications.append(app_name)
+            with self.connection:
+                self.connection.execute("UPDATE repositories SET Target_Application=? WHERE name=?", (';'.join(applications), repo_name))
+
+    def update_hl_status(self, app_name, hl_status):
+        # A repository can feed several applications; match the application within the ';' separated list
+        with self.connection:
+            self.connection.execute(
+                "UPDATE repositories SET HL_Status=? WHERE ';' || Target_Application || ';' LIKE ?",
+                (hl_status, f"%;{app_name};%"))
+
+    def get_download_candidates(self):
+        """
+        Returns the repositories marked Download='Y', ordered by batch number and listing position.
+        """
+        return self.connection.execute(
+            "SELECT * FROM repositories WHERE Download='Y' ORDER BY batch_number, position").fetchall()
+
+    def iter_rows(self):
+        return self.connection.execute(f"SELECT {', '.join(LEDGER_HEADERS)} FROM repositories ORDER BY position")
+
+    def export_csv(self, csv_file_path):
+        """
+        Writes the ledger to a CSV file (the summary columns first, then the status columns).
+        """
+        temp_csv_file_path = csv_file_path + ".tmp"
+        with open(temp_csv_file_path, 'w', newline='', encoding='utf-8') as csv_file:
+            writer = csv.writer(csv_file)
+            writer.writerow(LEDGER_HEADERS)
+            for row in self.iter_rows():
+                writer.writerow(['' if value is None else value for value in row])
+        os.replace(temp_csv_file_path, csv_file_path)
@@ -0,0 +1,137 @@
+import datetime
+import queue
+import threading
+import time
+
+# Put on a stage queue once per worker to stop it
+STOP = object()
+
+
+class PipelineStage:
+    """
+    One stage of a RepoPipeline: a bounded input queue and the worker threads that take items from it.
+    handler(item) returns the item to hand to the next stage, or None to drop it.
+    """
+
+    def __init__(self, name, handler, workers=1, queue_size=4):
+        self.name = name
+        self.handler = handler
+        self.workers = max(1, workers)
+        self.input = queue.Queue(maxsize=max(1, queue_size))
+        self.lock = threading.Lock()
+        self.busy = 0
+        self.items = 0
+        self.errors = 0
+        self.busy_seconds = 0.0
+        self.blocked_seconds = 0.0
+        self.depth_total = 0
+        self.full_samples = 0
+        self.samples = 0
+
+    def sample(self):
+        depth = self.input.qsize()
+        with self.lock:
+            self.samples += 1
+            self.depth_total += depth
+            if depth >= self.input.maxsize:
+                self.full_samples += 1
+            return f"{self.name}: {self.busy}/{self.workers} busy, {depth}/{self.input.maxsize} queued"
+
+    def summary(self, elapsed_seconds):
+        utilization = self.busy_seconds / (self.workers * elapsed_seconds) if elapsed_seconds else 0
+        mean_depth = self.depth_total / self.samples if self.samples else 0
+        full = self.full_samples / self.samples if self.samples else 0
+        return (f"{self.name}: {self.items} items, {self.errors} errors, {self.workers} workers {utilization:.0%} busy, "
+                f"queue {mean_depth:.1f}/{self.input.maxsize} on average and full {full:.0%} of the time, "
+                f"{self.blocked_seconds:.1f} s waiting for the next stage")
+
+
+class RepoPipeline:
+    """
+    Runs items through stages connected by bounded queues, each stage with its own worker threads, so an
+    item moves to the next stage as soon as it is ready instead of waiting for all the others. A full
+    queue makes the stage before it wait, which bounds the work in flight.
+
+    Every telemetry_seconds the busy workers and the queue depth of each stage are written to the telemetry
+    log. The stage whose queue stays full while its workers stay busy is the bottleneck; run() names it.
+    """
+
+    def __init__(self, stages, telemetry_log_path=None, telemetry_seconds=10):
+        self.stages = stages
+        self.telemetry_log_path = telemetry_log_path
+        self.telemetry_seconds = telemetry_seconds
+        self.finished = threading.Event()
+
+    def work(self, position):
+        stage = self.stages[position]
+        next_stage = self.stages[position + 1] if position + 1 < len(self.stages) else None
+        while True:
+            item = stage.input.get()
+            if item is STOP:
+                return
+            with stage.lock:
+                stage.busy += 1
+            start = time.monotonic()
+            try:
+                item = stage.handler(item)
+            except Exception as e:
+                print(f"Error in the {stage.name} stage of the pipeline: {e}")
+                item = None
+                with stage.lock:
+                    stage.errors += 1
+            with stage.lock:
+                stage.busy -= 1
+                stage.items += 1
+                stage.busy_seconds += time.monotonic() - start
+            if item is not None and next_stage:
+                start = time.monotonic()
+                next_stage.input.put(item)
+                with stage.lock:
+                    stage.blocked_seconds += time.monotonic() - start
+
+    def write_telemetry(self, telemetry_log):
+        while not self.finished.wait(self.telemetry_seconds):
+            timestamp = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            telemetry_log.write(f"{timestamp} | " + " | ".join(stage.sample() for stage in self.stages) + "\n")
+            telemetry_log.flush()
+
+    def run(self, items):
+        """
+        Feeds items into the first stage and waits until every stage has handled all of them.
+        Returns:
+            str: Summary of each stage and the bottleneck.
+        """
+        start = time.monotonic()
+        telemetry_log = open(self.telemetry_log_path, "a", encoding="utf-8") if self.telemetry_log_path else None
+        telemetry_thread = None
+        if telemetry_log:
+            telemetry_thread = threading.Thread(target=self.write_telemetry, args=(telemetry_log,), daemon=True)
+            telemetry_thread.start()
+        threads = []
+        for position, stage in enumerate(self.stages):
+            stage_threads = [threading.Thread(target=self.work, args=(position,), daemon=True) for _ in range(stage.workers)]
+            for thread in stage_threads:
+                thread.start()
+            threads.append(stage_threads)
+        try:
+            for item in items:
+                self.stages[0].input.put(item)
+        finally:
+            # A stage is stopped once the stage before it has handed over its last item
+            for stage, stage_threads in zip(self.stages, threads):
+                for _ in stage_threads:
+                    stage.input.put(STOP)
+                for thread in stage_threads:
+                    thread.join()
+            self.finished.set()
+            if telemetry_thread:
+                telemetry_thread.join()
+        elapsed_seconds = time.monotonic() - start
+        bottleneck = max(self.stages, key=lambda stage: stage.busy_seconds / stage.workers)
+        summary = "\n".join([f"Pipeline finished in {datetime.timedelta(seconds=round(elapsed_seconds))}."]
+                            + [stage.summary(elapsed_seconds) for stage in self.stages]
+                            + [f"Bottleneck: {bottleneck.name} (its workers were busy the longest; add workers there first)."])
+        if telemetry_log:
+            telemetry_log.write(summary + "\n")
+            telemetry_log.close()
+        return summary
@@ -0,0 +1,192 @@
+import os
+import tarfile
+import time
+
+import requests
+import urllib3
+
+from src import RepoDownloader
+from src.RateLimitGovernor import governor
+from src.TreeDeleter import deleter
+
+# tarfile reads the raw response, so errors of the stream come from urllib3 and are not wrapped by requests
+STREAM_EXCEPTIONS = RepoDownloader.RETRYABLE_EXCEPTIONS + (urllib3.exceptions.HTTPError,)
+
+
+class ExtractionBudgetError(Exception):
+    """
+    Raised when a member of the stream is over the extraction budget; the message is the reason. Not retried.
+    """
+
+
+class CountingReader:
+    """
+    File-like wrapper of the response stream that counts the compressed bytes read by tarfile.
+    """
+
+    def __init__(self, raw):
+        self.raw = raw
+        self.bytes_read = 0
+
+    def read(self, size=-1):
+        data = self.raw.read(size)
+        self.bytes_read += len(data)
+        return data
+
+
+def tarball_url(repository_archive_url):
+    # .../zipball/{ref} -> .../tarball/{ref}
+    prefix, separator, ref = repository_archive_url.rpartition('/zipball/')
+    return f"{prefix}/tarball/{ref}" if separator else repository_archive_url
+
+
+def strip_top_folder(member):
+    """
+    Renames a member of a GitHub tarball without its <owner>-<repo>-<sha>/ top folder.
+    Returns:
+        TarInfo: The renamed member, or None for the top folder itself.
+    """
+    name = member.name.removeprefix('./').split('/', 1)
+    if len(name) < 2 or not name[1]:
+        return None
+    member.name = name[1]
+    if member.islnk():
+        # Hard links name their target by its path in the archive
+        member.linkname = member.linkname.removeprefix('./').split('/', 1)[-1]
+    return member
+
+
+def check_budget(budget, progress, fileobj, member_bytes=None):
+    # The data of the members before this one has been read through by now
+    progress['compressed_bytes'] = fileobj.bytes_read
+    rejection = budget.check_stream(progress, member_bytes)
+    if rejection:
+        raise ExtractionBudgetError(rejection)
+
+
+def extract_stream(fileobj, extract_path, ignore_rules=None, budget=None):
+    """
+    Extracts a gzipped tar stream into extract_path as it is read, without the top folder.
+    The 'data' filter rejects absolute paths, paths leaving extract_path, links pointing outside it and
+    device files.
+    Parameters:
+        fileobj (CountingReader): The compressed stream.
+        ignore_rules (IgnoreRules): Members matching these rules are not written, nor hard links to them.
+        budget (ExtractionBudget): Checked from the header of each member before it is written, and for the
+            compression ratio once more at the end; the bytes taken from the run budget are given back when
+            the extraction fails.
+    Returns:
+        dict: members and bytes extracted, skipped_members and skipped_bytes left out by the ignore rules.
+    Raises:
+        ExtractionBudgetError: When a member is over the budget.
+    """
+    stats = {'members': 0, 'bytes': 0, 'skipped_members': 0, 'skipped_bytes': 0}
+    progress = {'entries': 0, 'bytes': 0, 'read_bytes': 0, 'compressed_bytes': 0}
+    try:
+        with tarfile.open(fileobj=fileobj, mode='r|gz') as tar:
+            for member in tar:
+                member_size = member.size
+                member = strip_top_folder(member)
+                if member is None:
+                    pass
+                elif ignore_rules and (ignore_rules.is_ignored(member.name + '/' if member.isdir() else member.name)
+                                       or (member.islnk() and ignore_rules.is_ignored(member.linkname))):
+                    stats['skipped_members'] += 1
+                    stats['skipped_bytes'] += member.size
+                else:
+                    if budget:
+                        check_budget(budget, progress, fileobj, member.size)
+                        progress['entries'] += 1
+                        progress['bytes'] += member.size
+                    tar.extract(member, extract_path, filter='data')
+                    stats['members'] += 1
+                    stats['bytes'] += member.size
+                progress['read_bytes'] += member_size
+        if budget:
+            # A single highly compressed member only shows once the stream is read
+            check_budget(budget, progress, fileobj)
+    except BaseException:
+        # The partial tree is deleted, so what it took from the run budget is free again
+        if budget:
+            budget.release(progress['bytes'])
+        raise
+    return stats
+
+
+def stream_attempt(url, token, extract_path, timeout, ignore_rules=None, budget=None):
+    """
+    One attempt at streaming the tarball into extract_path.
+    Returns:
+        tuple: (None, stats of extract_stream plus bytes_read, the compressed bytes read) on success,
+        (reason, None) for a failure that is not retried.
+    """
+    request_headers, token = governor.authorize({'Authorization': f'token {token}'})
+    with requests.get(url, headers=request_headers, stream=True, timeout=timeout) as response:
+        RepoDownloader.check_transient_status(response, token)
+        if response.status_code != 200:
+            return f"{response.status_code} {response.reason}", None
+        response.raw.decode_content = True
+        reader = CountingReader(response.raw)
+        try:
+            stats = extract_stream(reader, extract_path, ignore_rules, budget)
+        except (tarfile.ReadError, EOFError) as e:
+            # A connection closed in the middle of the stream shows up as a truncated archive
+            raise RepoDownloader.TransientDownloadError(f"stream ended early after {reader.bytes_read} bytes ({e})")
+    stats['bytes_read'] = reader.bytes_read
+    return None, stats
+
+
+def stream_tarball(repository_archive_url, extract_path, token, retries=3, backoff_seconds=2, timeout=60, ignore_rules=None,
+                   budget=None):
+    """
+    Downloads the tarball of a repository and extracts it into extract_path in one pass, so no archive is
+    written to disk and no unzip step is needed. The tree is extracted into extract_path + '.partial' and
+    replaces extract_path only once complete; a failed attempt starts over, since a stream cannot resume.
+    5xx answers, truncated streams and connection errors are retried as in RepoDownloader.download_archive.
+    Parameters:
+        repository_archive_url (str): The zipball or tarball API URL of the repository.
+        extract_path (str): unzip_dir/<repo>.
+        token (str): The GitHub access token.
+        ignore_rules (IgnoreRules): Members matching IGNORED_DIR/IGNORED_PATHS/IGNORED_FILES are not written.
+        budget (ExtractionBudget): The [Unzip] extraction limits; a stream over them is abandoned and not retried.
+    Returns:
+        tuple: (True, stats: bytes_read streamed, members and bytes extracted, skipped_members and
+        skipped_bytes) on success, (False, reason) otherwise.
+    """
+    url = tarball_url(repository_archive_url)
+    partial_path = extract_path + '.partial'
+    reason = None
+    attempt = 0
+    rate_limited = 0
+    while attempt <= retries:
+        deleter.delete(partial_path)
+        os.makedirs(partial_path)
+        try:
+            reason, stats = stream_attempt(url, token, partial_path, timeout, ignore_rules, budget)
+            if reason is not None:
+                break
+            # The previous tree is moved to the trash, so the new one replaces it at once
+            deleter.delete(extract_path)
+            os.replace(partial_path, extract_path)
+            return True, stats
+        except RepoDownloader.RateLimitedError as e:
+            reason = str(e)
+            rate_limited += 1
+            if rate_limited > RepoDownloader.MAX_RATE_LIMITED_ATTEMPTS:
+                break
+        except (RepoDownloader.TransientDownloadError,) + STREAM_EXCEPTIONS as e:
+            reason = str(e)
+            if attempt < retries:
+                wait = backoff_seconds * (2 ** attempt)
+                print(f"Download of {url} failed ({reason}), retrying in {wait} seconds.")
+                time.sleep(wait)
+            attempt += 1
+        except ExtractionBudgetError as e:
+            reason = str(e)
+            break
+        except tarfile.TarError as e:
+            # Rejected by the data filter: the archive is not extracted at all
+            reason = f"unsafe archive member: {e}"
+            break
+    deleter.delete(partial_path)
+    return False, reason
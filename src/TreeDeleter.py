@@ -0,0 +1,171 @@
+import os
+import stat
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor, wait as wait_for
+
+# Threads removing subtrees of the trash; deletion is bound by file-system calls, not by the CPU
+DELETE_WORKERS = 8
+
+
+def trash_dir_for(root_dir):
+    """
+    Returns the trash directory of root_dir: a sibling folder (D:\\CAST\\src -> D:\\CAST\\.src_trash), so it is
+    on the same volume, where a rename is instant, and outside the trees the other steps walk.
+    """
+    root_dir = os.path.abspath(root_dir).rstrip('\\/')
+    return os.path.join(os.path.dirname(root_dir), f".{os.path.basename(root_dir)}_trash")
+
+
+def remove_entry(path, is_dir):
+    try:
+        os.rmdir(path) if is_dir else os.unlink(path)
+    except PermissionError:
+        # Read-only files (git objects on Windows) cannot be deleted until they are made writable
+        os.chmod(path, stat.S_IWRITE | stat.S_IREAD | (stat.S_IEXEC if is_dir else 0))
+        os.rmdir(path) if is_dir else os.unlink(path)
+
+
+def remove_tree(path):
+    """
+    Removes a directory tree with os.scandir, without following links.
+    Returns:
+        tuple: (bytes freed, entries removed).
+    """
+    freed_bytes = 0
+    entries = 0
+    with os.scandir(path) as scan:
+        for entry in scan:
+            if entry.is_dir(follow_symlinks=False):
+                subtree_bytes, subtree_entries = remove_tree(entry.path)
+                freed_bytes += subtree_bytes
+                entries += subtree_entries
+            else:
+                freed_bytes += entry.stat(follow_symlinks=False).st_size
+                remove_entry(entry.path, False)
+                entries += 1
+    remove_entry(path, True)
+    return freed_bytes, entries + 1
+
+
+class TreeDeleter:
+    """
+    Deletes directory trees without making the caller wait.
+
+    delete() renames the tree into the trash directory of its root folder and returns at once; the trash
+    entries are then removed in the background, their top-level subtrees in parallel. Trash left by a run
+    that was stopped is removed when the trash directory is used again. summary() reports the trees,
+    entries and bytes freed.
+    """
+
+    def __init__(self, workers=DELETE_WORKERS):
+        self.lock = threading.Lock()
+        self.workers = workers
+        self.subtree_pool = None
+        self.trash_pool = None
+        self.pending = []
+        self.swept_trash_dirs = set()
+        self.trees = 0
+        self.entries = 0
+        self.freed_bytes = 0
+        self.errors = 0
+
+    def start(self):
+        if self.trash_pool is None:
+            self.subtree_pool = ThreadPoolExecutor(max_workers=self.workers)
+            # Splits each trash entry into subtree tasks and waits for them, so it has its own thread
+            self.trash_pool = ThreadPoolExecutor(max_workers=1)
+
+    def empty_trash_entry(self, trash_entry):
+        freed_bytes = 0
+        entries = 0
+        try:
+            futures = []
+            with os.scandir(trash_entry) as scan:
+                for entry in scan:
+                    if entry.is_dir(follow_symlinks=False):
+                        futures.append(self.subtree_pool.submit(remove_tree, entry.path))
+                    else:
+                        freed_bytes += entry.stat(follow_symlinks=False).st_size
+                        remove_entry(entry.path, False)
+                        entries += 1
+            wait_for(futures)
+            for future in futures:
+                subtree_bytes, subtree_entries = future.result()
+                freed_bytes += subtree_bytes
+                entries += subtree_entries
+            remove_entry(trash_entry, True)
+            entries += 1
+        except OSError as e:
+            print(f"Error while deleting '{trash_entry}': {e}")
+            with self.lock:
+                self.errors += 1
+        with self.lock:
+            self.trees += 1
+            self.entries += entries
+            self.freed_bytes += freed_bytes
+
+    def schedule(self, trash_entry):
+        self.start()
+        with self.lock:
+            self.pending.append(self.trash_pool.submit(self.empty_trash_entry, trash_entry))
+
+    def delete(self, path, root_dir=None):
+        """
+        Moves path out of the way at once and deletes it in the background.
+        Parameters:
+            path (str): The directory to delete.
+            root_dir (str): The configured folder path belongs to (src_dir, unzip_dir, ...); its trash
+                directory is used. Defaults to the parent folder of path.
+        """
+        if not os.path.lexists(path):
+            return
+        if not os.path.isdir(path) or os.path.islink(path):
+            os.unlink(path)
+            return
+        trash_dir = trash_dir_for(root_dir or os.path.dirname(os.path.abspath(path)))
+        os.makedirs(trash_dir, exist_ok=True)
+        leftovers = []
+        with self.lock:
+            if trash_dir not in self.swept_trash_dirs:
+                # Listed under the lock, before any tree of this run is renamed into the trash, so an entry of
+                # another thread is never scheduled both here and by its caller
+                leftovers = os.listdir(trash_dir)
+                self.swept_trash_dirs.add(trash_dir)
+        for leftover in leftovers:
+            self.schedule(os.path.join(trash_dir, leftover))
+        name = os.path.basename(path.rstrip('\\/'))
+        trash_entry = os.path.join(trash_dir, f"{name}-{uuid.uuid4().hex[:12]}")
+        try:
+            os.rename(path, trash_entry)
+        except OSError:
+            # Not on the volume of the trash directory (or locked): delete it in place
+            remove_tree(path)
+            return
+        self.schedule(trash_entry)
+
+    def wait(self):
+        """
+        Waits for the deletions in progress, then returns summary().
+        """
+        while True:
+            with self.lock:
+                pending, self.pending = self.pending, []
+            if not pending:
+                return self.summary()
+            wait_for(pending)
+
+    def summary(self):
+        with self.lock:
+            in_progress = sum(1 for future in self.pending if not future.done())
+            line = (f"Deleted {self.trees} directory tree(s) in the background: {self.entries} entries, "
+                    f"{self.freed_bytes / (1024 * 1024):.1f} MB freed")
+            if in_progress:
+                line += f", {in_progress} still in progress"
+            if self.errors:
+                line += f", {self.errors} failed"
+            return line + "."
+
+
+# Shared by every step of the process
+deleter = TreeDeleter()
@@ -1,87 +1,359 @@
 import os
 import zipfile
 import datetime
+import time
 import configparser
-from multiprocessing import Pool, Lock
+import threading
+from concurrent.futures import ProcessPoolExecutor, as_completed
 import shutil
+from src.TreeDeleter import deleter
+from src import ExtractionManifest
+from src.ExtractionBudget import RATIO_CHECK_MIN_BYTES
 
-# Define a lock for synchronizing access to the log file
-log_lock = Lock()
+# Members up to this size are written in one call; larger ones are copied in chunks of this size
+EXTRACT_BUFFER_SIZE = 1024 * 1024
 
-def extract_and_move_contents(zip_ref, extract_path):
+# Characters Windows does not allow in file names; zipfile.extract replaces them the same way
+WINDOWS_ILLEGAL_CHARACTERS = str.maketrans({character: '_' for character in ':<>|"?*'})
+
+def archive_top_folder(zip_ref):
+    """
+    Returns the <owner>-<repo>-<sha>/ folder GitHub wraps every member of a repository archive in,
+    or '' when the members do not share one top folder.
+    """
+    names = zip_ref.namelist()
+    if not names or '/' not in names[0]:
+        return ''
+    top_folder = names[0].split('/', 1)[0] + '/'
+    return top_folder if all(name.startswith(top_folder) for name in names) else ''
+
+def member_target_path(extract_path, relative_name):
+    """
+    Returns where a member goes under extract_path, or raises ValueError when its path is absolute or
+    climbs out of extract_path.
+    """
+    parts = [part for part in relative_name.replace('\\', '/').split('/') if part not in ('', '.')]
+    if relative_name.startswith(('/', '\\')) or '..' in parts or (parts and ':' in parts[0] and os.sep == '\\'):
+        raise ValueError(f"Unsafe path in archive: {relative_name}")
+    if os.sep == '\\':
+        # Windows drops trailing dots and spaces of names; illegal characters are replaced
+        parts = [part.translate(WINDOWS_ILLEGAL_CHARACTERS).rstrip(' .') or '_' for part in parts]
+    return os.path.join(extract_path, *parts)
+
+def extract_without_top_folder(zip_ref, extract_path, ignore_rules=None, previous_members=None):
+    """
+    Extracts the archive straight into extract_path, dropping the top folder from each member path as it
+    is read, so nothing is extracted twice or moved afterwards. File modes (archives made on Unix) and
+    modification times are kept.
+    Parameters:
+        ignore_rules (IgnoreRules): Members matching these rules are not written.
+        previous_members (dict): Files of the tree already in extract_path (relative name -> [CRC, size]), from
+            its extraction manifest. Files with the same CRC and size are left as they are, files missing from
+            the archive are removed, so only the differences are written.
+    Returns:
+        dict: files and bytes written, unchanged_files kept, removed_files, skipped_members and skipped_bytes
+        left out by the ignore rules, and members (relative name -> [CRC, size]) for the manifest.
+    """
+    top_folder = archive_top_folder(zip_ref)
+    created_dirs = set()
+    dir_times = []
+    members = {}
+    stats = {'files': 0, 'bytes': 0, 'unchanged_files': 0, 'removed_files': 0, 'skipped_members': 0, 'skipped_bytes': 0}
+    for info in zip_ref.infolist():
+        relative_name = info.filename[len(top_folder):]
+        if not relative_name:
+            continue
+        if ignore_rules and ignore_rules.is_ignored(relative_name):
+            stats['skipped_members'] += 1
+            stats['skipped_bytes'] += info.file_size
+            continue
+        target_path = member_target_path(extract_path, relative_name)
+        if not info.is_dir():
+            members[relative_name] = [info.CRC, info.file_size]
+            if previous_members and previous_members.get(relative_name) == members[relative_name] and os.path.isfile(target_path):
+                stats['unchanged_files'] += 1
+                continue
+        mtime = time.mktime(info.date_time + (0, 0, -1))
+        if info.is_dir():
+            if target_path not in created_dirs:
+                os.makedirs(target_path, exist_ok=True)
+                created_dirs.add(target_path)
+            dir_times.append((target_path, mtime))
+            continue
+        parent_dir = os.path.dirname(target_path)
+        if parent_dir not in created_dirs:
+            os.makedirs(parent_dir, exist_ok=True)
+            created_dirs.add(parent_dir)
+        # The mode of archives made on Unix is given at creation (the umask applies, as with unzip)
+        mode = (info.external_attr >> 16) & 0o777 if info.create_system == 3 else 0
+        if previous_members and os.path.lexists(target_path):
+            # A new file rather than the old one rewritten: the old one may be linked into application folders
+            os.unlink(target_path)
+        target_fd = os.open(target_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC | getattr(os, 'O_BINARY', 0), mode or 0o666)
+        with zip_ref.open(info) as source, open(target_fd, 'wb') as target:
+            if info.file_size <= EXTRACT_BUFFER_SIZE:
+                target.write(source.read())
+            else:
+                shutil.copyfileobj(source, target, EXTRACT_BUFFER_SIZE)
+        os.utime(target_path, (mtime, mtime))
+        stats['files'] += 1
+        stats['bytes'] += info.file_size
+    for relative_name in set(previous_members or {}) - set(members):
+        # Deleted from the repository since the last extraction
+        target_path = member_target_path(extract_path, relative_name)
+        if os.path.isfile(target_path):
+            os.remove(target_path)
+            stats['removed_files'] += 1
+        parent_dir = os.path.dirname(target_path)
+        while parent_dir != extract_path and parent_dir.startswith(extract_path) and os.path.isdir(parent_dir) and not os.listdir(parent_dir):
+            os.rmdir(parent_dir)
+            parent_dir = os.path.dirname(parent_dir)
+    # Writing files changes the times of their folders, so folders get theirs last, deepest first
+    for dir_path, mtime in reversed(dir_times):
+        os.utime(dir_path, (mtime, mtime))
+    stats['members'] = members
+    return stats
+
+def plan_extraction(repo_path, ignore_rules=None, previous_members=None):
+    """
+    Reads what extracting an archive would write from its central directory alone, before anything is written.
+    Returns:
+        dict: entries and bytes (uncompressed) of the members kept by the ignore rules, write_bytes left once the
+        files unchanged since previous_members are taken out, and worst_ratio and worst_member, the highest
+        compression ratio of a member of at least RATIO_CHECK_MIN_BYTES.
+    """
+    plan = {'entries': 0, 'bytes': 0, 'write_bytes': 0, 'worst_ratio': 0, 'worst_member': None}
+    with zipfile.ZipFile(repo_path, 'r') as zip_ref:
+        top_folder = archive_top_folder(zip_ref)
+        for info in zip_ref.infolist():
+            relative_name = info.filename[len(top_folder):]
+            if not relative_name or (ignore_rules and ignore_rules.is_ignored(relative_name)):
+                continue
+            plan['entries'] += 1
+            plan['bytes'] += info.file_size
+            if not (previous_members and previous_members.get(relative_name) == [info.CRC, info.file_size]):
+                plan['write_bytes'] += info.file_size
+            if info.file_size >= RATIO_CHECK_MIN_BYTES:
+                ratio = info.file_size / max(info.compress_size, 1)
+                if ratio > plan['worst_ratio']:
+                    plan['worst_ratio'] = ratio
+                    plan['worst_member'] = relative_name
+    return plan
+
+def find_repository_zips(root_folder):
+    """
+    Returns (zip path, repository name) of the <root_folder>/<repo>/<repo>.zip archives, largest first,
+    so the long extractions start early when they run in parallel.
+    """
+    repository_zips = []
+    for root, dirs, files in os.walk(root_folder):
+        # Check if the current depth is at level 2
+        if root.count(os.sep) == root_folder.count(os.sep) + 1:
+            for file in files:
+                if file.endswith(".zip"):
+                    repository_zips.append((os.path.join(root, file), os.path.splitext(file)[0]))
+    repository_zips.sort(key=lambda repository_zip: os.path.getsize(repository_zip[0]), reverse=True)
+    return repository_zips
+
+def extract_repository(repo_path, repo_name, repo_extract_path, ignore_rules=None, repo_manifest_path=None, previous_manifest=None):
+    """
+    Extracts one repository archive; runs in the parent process or in a worker of the unzip pool.
+    With previous_manifest (the manifest of the tree already in repo_extract_path), an archive with the same
+    central directory is not extracted again and a changed one only gets its differences written.
+    The manifest of the new tree is written to repo_manifest_path.
+    Returns:
+        dict: repo_name, zip path, start_time, end_time, error (None on success) and the extraction
+        stats, sent back to the parent, which writes the logs and the ledger.
+    """
+    start_time = datetime.datetime.now()
+    error = None
+    stats = {}
     try:
-        # Extract all contents of the zip file to a temporary directory
-        temp_extract_path = os.path.join(extract_path, "__temp__")
-        zip_ref.extractall(temp_extract_path)
-
-        # Move contents of the inner folder to the outer directory
-        inner_folder = os.listdir(temp_extract_path)[0].rstrip()
-        inner_folder_path = os.path.join(temp_extract_path, inner_folder)
-        for item in os.listdir(inner_folder_path):
-            item_path = os.path.join(inner_folder_path, item.rstrip())
-            shutil.move(item_path, extract_path)
-
-        # Delete the inner folder
-        shutil.rmtree(inner_folder_path)
-
-        # Remove the temporary directory
-        os.rmdir(temp_extract_path)
+        if not zipfile.is_zipfile(repo_path):
+            raise ValueError(f"Not a valid zip file: {repo_path}")
+        os.makedirs(repo_extract_path, exist_ok=True)
+        with zipfile.ZipFile(repo_path, 'r') as zip_ref:
+            central_directory_sha1 = ExtractionManifest.central_directory_hash(zip_ref)
+            options = ExtractionManifest.extraction_options(ignore_rules)
+            if previous_manifest and previous_manifest.get('central_directory_sha1') == central_directory_sha1:
+                # Downloaded again, but the same content: only the recorded size and time change
+                stats = {'unchanged_archive': True}
+                members = previous_manifest.get('members', {})
+            else:
+                if repo_manifest_path:
+                    # A tree left half-updated by an interruption must not look current
+                    ExtractionManifest.remove_manifest(repo_manifest_path)
+                stats = extract_without_top_folder(zip_ref, repo_extract_path, ignore_rules,
+                                                   previous_manifest.get('members') if previous_manifest else None)
+                stats['incremental'] = previous_manifest is not None
+                members = stats.pop('members')
+            if repo_manifest_path:
+                ExtractionManifest.write_manifest(repo_manifest_path, repo_path, central_directory_sha1, options, members)
     except Exception as e:
-        print(f"Error while executing extract_and_move_contents() function: {e}")
+        error = str(e)
+    return {'repo_name': repo_name, 'repo_path': repo_path, 'start_time': start_time, 'end_time': datetime.datetime.now(), 'error': error,
+            'stats': stats}
+
+class UnzipRun:
+    """
+    Logs, ledger updates and totals of one run of the unzip step, shared by unzip_code() and the pipeline
+    mode, which hands it one archive at a time. Methods may be called from several threads.
+    Parameters: see unzip_code().
+    """
+
+    def __init__(self, extract_path, execution_log_path, time_to_unzip_log_path, ledger=None, ignore_rules=None, incremental=False, budget=None):
+        self.extract_path = extract_path
+        self.ledger = ledger
+        self.ignore_rules = ignore_rules
+        self.incremental = incremental
+        self.budget = budget
+        self.options = ExtractionManifest.extraction_options(ignore_rules)
+        self.execution_log_path = execution_log_path
+        self.execution_log = open(execution_log_path, "a", encoding="utf-8")
+        self.time_to_unzip_log = open(time_to_unzip_log_path, "a", encoding="utf-8")
+        self.lock = threading.Lock()
+        self.success_count = 0
+        self.failure_count = 0
+        self.unchanged_count = 0
+        self.skipped_members = 0
+        self.skipped_bytes = 0
+        # Bytes each planned archive took from the run budget (zip path -> bytes), given back if its extraction fails
+        self.budget_bytes = {}
 
-def unzip_code(root_folder, extract_path, execution_log_path, time_to_unzip_log_path):
-    success_count = 0
-    failure_count = 0
-    
+    def record_result(self, result):
+        with self.lock:
+            repo_name = result['repo_name']
+            timestamp = datetime.datetime.now().strftime("%Y-%m-%d_%H-%M-%S.%f")
+            execution_message = f"{timestamp} | {repo_name} | "
+            budget_bytes = self.budget_bytes.pop(result['repo_path'], 0)
+            if result['error']:
+                if budget_bytes:
+                    self.budget.release(budget_bytes)
+                self.execution_log.write(f"{execution_message}Failed: {result['error']}\n")
+                print(f"Extraction failed for {result['repo_path']}: {result['error']}\n")
+                self.failure_count += 1
+                if self.ledger:
+                    self.ledger.update_extraction_status(repo_name, f"Failed - {result['error']}")
+            elif result['stats'].get('unchanged_archive'):
+                self.execution_log.write(f"{execution_message}Skipped: unchanged since last extraction\n")
+                print(f"Skipping {result['repo_path']}: unchanged since last extraction\n")
+                self.unchanged_count += 1
+                if self.ledger:
+                    self.ledger.update_extraction_status(repo_name, "Success")
+            else:
+                total_time = result['end_time'] - result['start_time']
+                stats = result['stats']
+                seconds = total_time.total_seconds()
+                megabytes = stats['bytes'] / (1024 * 1024)
+                skipped = f" | {stats['files']} entries, {megabytes:.1f} MB, {seconds:.2f} s, {megabytes / seconds if seconds else 0:.1f} MB/s"
+                if stats.get('incremental'):
+                    skipped += f" | incremental: {stats['files']} files written, {stats['unchanged_files']} unchanged, {stats['removed_files']} removed"
+                if self.ignore_rules:
+                    skipped += f" | {stats['skipped_members']} members, {stats['skipped_bytes'] / (1024 * 1024):.1f} MB skipped by ignore rules"
+                    self.skipped_members += stats['skipped_members']
+                    self.skipped_bytes += stats['skipped_bytes']
+                self.execution_log.write(f"{execution_message}Successful\n")
+                self.time_to_unzip_log.write(f"{repo_name} | {result['start_time']} | {result['end_time']} | {total_time}{skipped}\n")
+                print(f"Extraction completed for {result['repo_path']}\n")
+                self.success_count += 1
+                if self.ledger:
+                    self.ledger.update_extraction_status(repo_name, "Success")
+
+    def plan(self, repo_path, repo_name):
+        """
+        Decides what to do with one archive: records it at once when it is unchanged or over the budget,
+        otherwise clears the way for its extraction.
+        Returns:
+            tuple: The arguments of extract_repository(), or None when there is nothing to extract.
+        """
+        # Create a directory with the name of the zip file
+        repo_extract_path = os.path.join(self.extract_path, repo_name)
+        repo_manifest_path = ExtractionManifest.manifest_path(self.extract_path, repo_name) if self.incremental else None
+        tree_present = os.path.exists(repo_extract_path) and os.listdir(repo_extract_path)
+        previous_manifest = ExtractionManifest.read_manifest(repo_manifest_path) if self.incremental and tree_present else None
+        if previous_manifest and previous_manifest.get('options') == self.options:
+            if ExtractionManifest.archive_unchanged(previous_manifest, repo_path):
+                now = datetime.datetime.now()
+                self.record_result({'repo_name': repo_name, 'repo_path': repo_path, 'start_time': now, 'end_time': now, 'error': None,
+                                    'stats': {'unchanged_archive': True}})
+                return None
+        else:
+            previous_manifest = None
+            if tree_present:
+                # Renamed into the trash at once and deleted in the background
+                deleter.delete(repo_extract_path, self.extract_path)
+            if repo_manifest_path:
+                ExtractionManifest.remove_manifest(repo_manifest_path)
+        if self.budget:
+            start_time = datetime.datetime.now()
+            rejection = None
+            try:
+                plan = plan_extraction(repo_path, self.ignore_rules, previous_manifest.get('members') if previous_manifest else None)
+                rejection = self.budget.check(plan)
+                if not rejection:
+                    with self.lock:
+                        self.budget_bytes[repo_path] = plan['write_bytes']
+            except Exception:
+                # Not a readable archive: extract_repository reports it
+                pass
+            if rejection:
+                self.record_result({'repo_name': repo_name, 'repo_path': repo_path, 'start_time': start_time, 'end_time': datetime.datetime.now(),
+                                    'error': rejection, 'stats': {}})
+                return None
+        print(f"Extracting {repo_path} to {self.extract_path}")
+        return (repo_path, repo_name, repo_extract_path, self.ignore_rules, repo_manifest_path, previous_manifest)
+
+    def close(self):
+        """
+        Closes the logs and appends the summary to the execution log.
+        """
+        self.execution_log.close()
+        self.time_to_unzip_log.close()
+        timestamp = datetime.datetime.now().strftime("%Y-%m-%d_%H-%M-%S.%f")
+        with open(self.execution_log_path, "a", encoding="utf-8") as execution_log:
+            execution_log.write(f"{timestamp} | Summary: Processed {self.success_count} zip files successfully, {self.failure_count} zip files failed.\n")
+            if self.unchanged_count:
+                execution_log.write(f"{timestamp} | Incremental: {self.unchanged_count} zip files unchanged since last extraction were skipped.\n")
+            if self.ignore_rules:
+                execution_log.write(f"{timestamp} | Ignore rules: skipped {self.skipped_members} members, {self.skipped_bytes / (1024 * 1024):.1f} MB.\n")
+            if self.budget:
+                execution_log.write(f"{timestamp} | {self.budget.summary()}\n")
+
+
+def unzip_code(root_folder, extract_path, execution_log_path, time_to_unzip_log_path, ledger=None, unzip_workers=1, ignore_rules=None, incremental=False,
+               budget=None):
+    """
+    Extracts every <root_folder>/<repo>/<repo>.zip into <extract_path>/<repo>.
+    Parameters:
+        unzip_workers (int): Archives extracted at the same time, one worker process each; 1 extracts them
+            one by one in this process, 0 uses one process per CPU core.
+        ignore_rules (IgnoreRules): Members matching IGNORED_DIR/IGNORED_PATHS/IGNORED_FILES are not written;
+            the members and bytes skipped are logged per repository.
+        incremental (bool): Keep a manifest next to each tree (<repo>.unzip_manifest.json); archives whose
+            manifest matches are skipped and changed archives only get their differences written.
+        budget (ExtractionBudget): Per-repository and per-run limits, checked against the central directory of
+            each archive before it is extracted; an archive over a limit fails without anything being written.
+    """
+    run = None
     try:
-        with open(execution_log_path, "a", encoding="utf-8") as execution_log, \
-                open(time_to_unzip_log_path, "a", encoding="utf-8") as time_to_unzip_log:
-
-            for root, dirs, files in os.walk(root_folder):
-                # Check if the current depth is at level 2
-                if root.count(os.sep) == root_folder.count(os.sep) + 1:
-                    for file in files:
-                        if file.endswith(".zip"):
-                            repo_path = os.path.join(root, file)
-                            repo_name = os.path.splitext(file)[0]
-                            timestamp = datetime.datetime.now().strftime("%Y-%m-%d_%H-%M-%S.%f")
-                            execution_message = f"{timestamp} | {repo_name} | "
-
-                            print(f"Extracting {repo_path} to {extract_path}")
-                            if not zipfile.is_zipfile(repo_path):
-                                failure_count += 1
-                                raise ValueError(f"Not a valid zip file: {repo_path}")
-
-                            # Create a directory with the name of the zip file
-                            repo_extract_path = os.path.join(extract_path, repo_name)
-                            if os.path.exists(repo_extract_path) and os.listdir(repo_extract_path):
-                                dir_to_delete = repo_extract_path
-                                command = f'rmdir /s /q "{dir_to_delete}"'
-                                os.system(command)
-                                # print(f"Warning: {repo_extract_path} already exists with contents. Skipping extraction for {repo_path}")
-                                # continue  # Skip extraction if directory exists with contents
-                            os.makedirs(repo_extract_path, exist_ok=True)
-
-                            start_time = datetime.datetime.now()
-                            try:
-                                with zipfile.ZipFile(repo_path, 'r') as zip_ref:
-                                    # Extract and move contents
-                                    extract_and_move_contents(zip_ref, repo_extract_path)
-
-                            except Exception as e:                               
-                                timestamp = datetime.datetime.now().strftime("%Y-%m-%d_%H-%M-%S.%f")
-                                execution_log.write(f"{execution_message}Failed: {e}\n")
-                                print(f"Extraction failed for {repo_path}: {e}\n")
-                                failure_count += 1
-
-                            else:
-                                end_time = datetime.datetime.now()
-                                total_time = end_time - start_time
-
-                                execution_log.write(f"{execution_message}Successful\n")
-                                time_to_unzip_log.write(f"{repo_name} | {start_time} | {end_time} | {total_time}\n")
-                                print(f"Extraction completed for {repo_path}\n")
-                                success_count += 1
+        run = UnzipRun(extract_path, execution_log_path, time_to_unzip_log_path, ledger, ignore_rules, incremental, budget)
+        tasks = []
+        for repo_path, repo_name in find_repository_zips(root_folder):
+            task = run.plan(repo_path, repo_name)
+            if task:
+                tasks.append(task)
+
+        unzip_workers = unzip_workers or os.cpu_count() or 1
+        if unzip_workers == 1 or len(tasks) < 2:
+            for task in tasks:
+                run.record_result(extract_repository(*task))
+        else:
+            print(f"Extracting {len(tasks)} archives with {unzip_workers} worker processes.\n")
+            # Workers only extract; results come back to this process, which writes the logs and the ledger
+            with ProcessPoolExecutor(max_workers=unzip_workers) as executor:
+                futures = [executor.submit(extract_repository, *task) for task in tasks]
+                for future in as_completed(futures):
+                    run.record_result(future.result())
 
     except Exception as e:
         print(f"Error while executing unzip_code() function: {e}")
@@ -92,9 +364,8 @@ def unzip_code(root_folder, extract_path, execution_log_path, time_to_unzip_log_
         #failure_count += 1
 
     finally:
-        timestamp = datetime.datetime.now().strftime("%Y-%m-%d_%H-%M-%S.%f")
-        with open(execution_log_path, "a", encoding="utf-8") as execution_log:
-            execution_log.write(f"{timestamp} | Summary: Processed {success_count} zip files successfully, {failure_count} zip files failed.\n")
+        if run:
+            run.close()
 
 
 def create_and_run_batches(config):
@@ -109,18 +380,7 @@ def create_and_run_batches(config):
         execution_log_path = os.path.join(logs_folder, f"execution_log_{timestamp}.txt")
         time_to_unzip_log_path = os.path.join(logs_folder, f"time_to_unzip_log_{timestamp}.txt")
 
-        pool_args = []
-        for root, dirs, files in os.walk(repos_folder):
-            for file in files:
-                if file.endswith(".zip"):
-                    repo_name = os.path.splitext(file)[0]
-                    repo_path = os.path.join(root, file)
-                    extract_path = os.path.join(extract_folder, repo_name)
-                    os.makedirs(extract_path, exist_ok=True)
-                    pool_args.append((repo_path, extract_path, repo_name, execution_log_path, time_to_unzip_log_path, 0))
-
-        with Pool() as pool:
-            pool.map(unzip_code, pool_args)
+        unzip_code(repos_folder, extract_folder, execution_log_path, time_to_unzip_log_path, unzip_workers=0)
     except Exception as e:
         print(f"Error while executing create_and_run_batches() function: {e}")
 
@@ -0,0 +1,34 @@
+import os
+import sys
+import threading
+from http.server import ThreadingHTTPServer
+
+import pytest
+
+# The modules are imported as src.<Module>, as CASTHL_Automation does
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+class StubServer(ThreadingHTTPServer):
+    def handle_error(self, request, client_address):
+        # Clients closing kept-alive connections at the end of a test are not errors of the stub
+        pass
+
+
+@pytest.fixture
+def serve():
+    """
+    Starts a local HTTP server for a BaseHTTPRequestHandler class and returns its base URL.
+    """
+    servers = []
+
+    def start(handler_class):
+        server = StubServer(('127.0.0.1', 0), handler_class)
+        threading.Thread(target=server.serve_forever, args=(0.05,), daemon=True).start()
+        servers.append(server)
+        return f"http://127.0.0.1:{server.server_port}"
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
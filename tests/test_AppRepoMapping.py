@@ -0,0 +1,64 @@
+import logging
+import os
+import time
+import zipfile
+
+import pytest
+
+from src import AppRepoMapping, UnzipFile
+
+pd = pytest.importorskip('pandas')
+pytest.importorskip('openpyxl')
+
+
+def read(path):
+    with open(path) as f:
+        return f.read()
+
+
+def write_archive(src_dir, files):
+    os.makedirs(os.path.join(src_dir, 'repo'), exist_ok=True)
+    with zipfile.ZipFile(os.path.join(src_dir, 'repo', 'repo.zip'), 'w') as zip_ref:
+        for name, text in files.items():
+            zip_ref.writestr(f"org-repo-abc123/{name}", text)
+
+
+def test_unzip_place_unzip_cycle_is_incremental(tmp_path):
+    """
+    Option 7, option 8 with incremental unzip, then option 7 on a changed archive: the tree stays in unzip_dir,
+    so the unchanged archive is skipped and the changed one only rewrites its differences.
+    """
+    src_dir, unzip_dir, apps_dir = str(tmp_path / 'src'), str(tmp_path / 'unzip'), str(tmp_path / 'apps')
+    os.makedirs(unzip_dir)
+    mapping_sheet = str(tmp_path / 'App-Repo-Mapping.xlsx')
+    pd.DataFrame({'Repository': ['repo', 'repo'], 'Application': ['A', 'B'], 'Action': ['replaced', 'replaced']}).to_excel(mapping_sheet, index=False)
+    logger = logging.getLogger('test_AppRepoMapping')
+
+    def unzip(run):
+        UnzipFile.unzip_code(src_dir, unzip_dir, str(tmp_path / f"execution{run}.log"), str(tmp_path / f"time{run}.log"), incremental=True)
+        return read(str(tmp_path / f"execution{run}.log"))
+
+    def place():
+        AppRepoMapping.create_application_folders(mapping_sheet, unzip_dir, apps_dir, logger, logger, keep_extracted=True)
+
+    write_archive(src_dir, {'a.txt': 'v1', 'b.txt': 'keep', 'c.txt': 'gone'})
+    unzip(1)
+    place()
+    assert sorted(os.listdir(os.path.join(unzip_dir, 'repo'))) == ['a.txt', 'b.txt', 'c.txt']
+    assert read(os.path.join(apps_dir, 'B', 'repo', 'a.txt')) == 'v1'
+
+    assert 'repo | Skipped: unchanged since last extraction' in unzip(2)
+
+    # Archives record times to the second
+    time.sleep(1.1)
+    write_archive(src_dir, {'a.txt': 'v2', 'b.txt': 'keep'})
+    unzip(3)
+    assert 'incremental: 1 files written, 1 unchanged, 1 removed' in read(str(tmp_path / 'time3.log'))
+    assert sorted(os.listdir(os.path.join(unzip_dir, 'repo'))) == ['a.txt', 'b.txt']
+    assert read(os.path.join(unzip_dir, 'repo', 'a.txt')) == 'v2'
+    # The application folders link the files; the rewritten file did not change their copy
+    assert read(os.path.join(apps_dir, 'A', 'repo', 'a.txt')) == 'v1'
+
+    place()
+    assert read(os.path.join(apps_dir, 'A', 'repo', 'a.txt')) == 'v2'
+    assert sorted(os.listdir(os.path.join(apps_dir, 'B', 'repo'))) == ['a.txt', 'b.txt']
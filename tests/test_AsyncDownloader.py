@@ -0,0 +1,187 @@
+import os
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler
+
+import pytest
+
+from src import AsyncDownloader, RepoDownloader
+
+pytest.importorskip('aiohttp')
+
+ARCHIVE = bytes(range(256)) * 40
+ETAG = '"v1"'
+
+
+class AsyncStub(BaseHTTPRequestHandler):
+    """
+    Serves ARCHIVE under /repos/<org>/<repo>/zipball/<ref>, with Range support; the first `failures` requests
+    of each path are answered 503. /redirect/<port>/<path> redirects to <path> on localhost:<port>. Each
+    request waits `delay` seconds while counted as open, so the most requests open at once can be checked.
+    """
+    protocol_version = 'HTTP/1.1'
+    failures = 0
+    delay = 0
+    lock = threading.Lock()
+    requests_seen = []
+    open_requests = 0
+    max_open_requests = 0
+
+    def log_message(self, *args):
+        pass
+
+    def answer(self, status, body=b'', headers=None):
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        cls = type(self)
+        with cls.lock:
+            cls.requests_seen.append((self.path, dict(self.headers)))
+            failed = sum(1 for path, _ in cls.requests_seen if path == self.path) <= cls.failures
+            cls.open_requests += 1
+            cls.max_open_requests = max(cls.max_open_requests, cls.open_requests)
+        try:
+            time.sleep(cls.delay)
+            redirect = re.fullmatch(r'/redirect/(\d+)(/.*)', self.path)
+            if redirect:
+                self.answer(302, headers={'Location': f"http://localhost:{redirect.group(1)}{redirect.group(2)}"})
+            elif self.path.startswith('/missing'):
+                self.answer(404)
+            elif failed:
+                self.answer(503)
+            else:
+                match = re.fullmatch(r'bytes=(\d+)-', self.headers.get('Range', ''))
+                if match:
+                    start = int(match.group(1))
+                    self.answer(206, ARCHIVE[start:], {'Content-Range': f"bytes {start}-{len(ARCHIVE) - 1}/{len(ARCHIVE)}", 'ETag': ETAG})
+                else:
+                    self.answer(200, ARCHIVE, {'ETag': ETAG})
+        finally:
+            with cls.lock:
+                cls.open_requests -= 1
+
+
+@pytest.fixture
+def stub(serve):
+    AsyncStub.failures = 0
+    AsyncStub.delay = 0
+    AsyncStub.requests_seen = []
+    AsyncStub.open_requests = 0
+    AsyncStub.max_open_requests = 0
+    return serve(AsyncStub)
+
+
+def job(path, url, results):
+    return {'path': str(path), 'prepare': lambda: url,
+            'finish': lambda download_flag, reason, start_time: results.append((os.path.basename(str(path)), download_flag, reason))}
+
+
+def read(path):
+    with open(str(path), 'rb') as f:
+        return f.read()
+
+
+def test_parse_host_limits():
+    assert AsyncDownloader.parse_host_limits('api.github.com:20, Codeload.GitHub.com:100,bad') == {'api.github.com': 20, 'codeload.github.com': 100}
+    assert AsyncDownloader.parse_host_limits('') == {}
+
+
+def test_download_resumes_partial_download(stub, tmp_path):
+    url = f"{stub}/repos/org/repo/zipball/main"
+    part_path = str(tmp_path / 'repo.zip.part')
+    with open(part_path, 'wb') as part_file:
+        part_file.write(ARCHIVE[:1000])
+    RepoDownloader.write_partial_state(part_path, {'url': url, 'etag': ETAG, 'total': len(ARCHIVE)})
+    results = []
+
+    AsyncDownloader.download_all([job(tmp_path / 'repo.zip', url, results)], 'tok', backoff_seconds=0)
+
+    assert results == [('repo.zip', True, None)]
+    assert AsyncStub.requests_seen[0][1]['Range'] == 'bytes=1000-'
+    assert AsyncStub.requests_seen[0][1]['If-Range'] == ETAG
+    assert read(tmp_path / 'repo.zip') == ARCHIVE
+    assert os.listdir(tmp_path) == ['repo.zip']
+
+
+def test_server_errors_are_retried(stub, tmp_path):
+    AsyncStub.failures = 2
+    results = []
+
+    AsyncDownloader.download_all([job(tmp_path / 'repo.zip', f"{stub}/repos/org/repo/zipball/main", results)], 'tok', retries=2, backoff_seconds=0)
+
+    assert results == [('repo.zip', True, None)]
+    assert len(AsyncStub.requests_seen) == 3
+    assert read(tmp_path / 'repo.zip') == ARCHIVE
+
+
+def test_retries_run_out(stub, tmp_path):
+    AsyncStub.failures = 5
+    results = []
+
+    AsyncDownloader.download_all([job(tmp_path / 'repo.zip', f"{stub}/repos/org/repo/zipball/main", results)], 'tok', retries=1, backoff_seconds=0)
+
+    assert results == [('repo.zip', False, '503 Service Unavailable')]
+    assert len(AsyncStub.requests_seen) == 2
+
+
+def test_client_errors_are_not_retried(stub, tmp_path):
+    results = []
+
+    AsyncDownloader.download_all([job(tmp_path / 'repo.zip', f"{stub}/missing", results)], 'tok', backoff_seconds=0)
+
+    assert results == [('repo.zip', False, '404 Not Found')]
+    assert len(AsyncStub.requests_seen) == 1
+    assert os.listdir(tmp_path) == []
+
+
+def test_open_requests_are_limited_per_host(stub, tmp_path):
+    AsyncStub.delay = 0.2
+    results = []
+    jobs = [job(tmp_path / f"repo{number}.zip", f"{stub}/repos/org/repo{number}/zipball/main", results) for number in range(4)]
+
+    AsyncDownloader.download_all(jobs, 'tok', host_limits={'127.0.0.1': 1}, default_host_limit=50)
+
+    assert sorted(results) == [(f"repo{number}.zip", True, None) for number in range(4)]
+    assert AsyncStub.max_open_requests == 1
+
+
+def test_other_hosts_get_the_default_limit(stub, tmp_path):
+    AsyncStub.delay = 0.2
+    results = []
+    jobs = [job(tmp_path / f"repo{number}.zip", f"{stub}/repos/org/repo{number}/zipball/main", results) for number in range(4)]
+
+    AsyncDownloader.download_all(jobs, 'tok', host_limits={'api.github.com': 1}, default_host_limit=2)
+
+    assert len(results) == 4
+    assert AsyncStub.max_open_requests == 2
+
+
+def test_token_is_not_sent_to_the_redirect_host(stub, tmp_path):
+    port = stub.rsplit(':', 1)[1]
+    results = []
+
+    AsyncDownloader.download_all([job(tmp_path / 'repo.zip', f"{stub}/redirect/{port}/repos/org/repo/zipball/main", results)], 'tok')
+
+    assert results == [('repo.zip', True, None)]
+    (api_path, api_headers), (archive_path, archive_headers) = AsyncStub.requests_seen
+    assert api_headers['Authorization'] == 'token tok'
+    assert archive_path == '/repos/org/repo/zipball/main' and 'Authorization' not in archive_headers
+
+
+def test_prepare_decides_what_is_downloaded(stub, tmp_path):
+    results = []
+    pinned = job(tmp_path / 'pinned.zip', f"{stub}/repos/org/pinned/zipball/abc123", results)
+    skipped = job(tmp_path / 'skipped.zip', None, results)
+
+    AsyncDownloader.download_all([pinned, skipped], 'tok')
+
+    # The URL returned by prepare is the one downloaded; None skips the download without calling finish
+    assert results == [('pinned.zip', True, None)]
+    assert [path for path, _ in AsyncStub.requests_seen] == ['/repos/org/pinned/zipball/abc123']
+    assert os.listdir(tmp_path) == ['pinned.zip']
@@ -0,0 +1,58 @@
+import io
+import os
+import zipfile
+from http.server import BaseHTTPRequestHandler
+
+import pytest
+
+from src import CASTHL_Automation, DownloadCache
+from src.DownloadJournal import DownloadJournal
+
+
+def zip_archive():
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w') as zip_ref:
+        zip_ref.writestr('org-new-abc123/README.md', 'new')
+    return buffer.getvalue()
+
+
+class ZipballStub(BaseHTTPRequestHandler):
+    archive = zip_archive()
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header('Content-Length', str(len(self.archive)))
+        self.end_headers()
+        self.wfile.write(self.archive)
+
+
+@pytest.fixture
+def run(serve, tmp_path):
+    base_url = serve(ZipballStub)
+    repository = {'id': 7, 'name': 'new', 'size': 0, 'batch_number': 1, 'Download_Status': '',
+                  'repo_archive_download_api': f"{base_url}/repos/org/new/zipball/main"}
+    log_files = {1: (str(tmp_path / 'RepoDownloadTime.txt'), str(tmp_path / 'RepoDownloadStatusLog.txt'))}
+    journal = DownloadJournal(str(tmp_path / 'journal.jsonl'))
+    journal.open()
+    yield repository, log_files, journal, str(tmp_path / 'src')
+    journal.close()
+
+
+def test_repository_of_size_0_is_downloaded_without_download_cache(run):
+    repository, log_files, journal, src_dir = run
+    CASTHL_Automation.download_repository(repository, src_dir, 'tok', log_files, journal, {'retries': 0})
+
+    assert os.path.exists(os.path.join(src_dir, 'new', 'new.zip'))
+    assert journal.latest_results()[7]['Download_Status'] == 'Success'
+
+
+def test_repository_of_size_0_is_skipped_with_download_cache(run):
+    repository, log_files, journal, src_dir = run
+    download_cache = DownloadCache.DownloadCache(os.path.join(src_dir, '.download_cache'))
+    CASTHL_Automation.download_repository(repository, src_dir, 'tok', log_files, journal, {'retries': 0}, download_cache)
+
+    assert not os.path.exists(os.path.join(src_dir, 'new'))
+    assert journal.latest_results()[7]['Download_Status'] == 'Skipped - empty repository (size 0)'
@@ -0,0 +1,76 @@
+import json
+from http.server import BaseHTTPRequestHandler
+
+import pytest
+import requests
+
+from src import GitHubApi
+
+
+def test_parse_link_header():
+    link_header = ('<https://api.github.com/organizations/1/repos?page=2>; rel="next", '
+                   '<https://api.github.com/organizations/1/repos?page=34>; rel="last"')
+    assert GitHubApi.parse_link_header(link_header) == {
+        'next': 'https://api.github.com/organizations/1/repos?page=2',
+        'last': 'https://api.github.com/organizations/1/repos?page=34'
+    }
+
+
+def test_parse_link_header_without_links():
+    assert GitHubApi.parse_link_header(None) == {}
+    assert GitHubApi.parse_link_header('') == {}
+    assert GitHubApi.parse_link_header('not a link, <https://x>; rel=next') == {}
+
+
+def repository_node(number):
+    return {'databaseId': number, 'name': f"repo{number}", 'nameWithOwner': f"org/repo{number}", 'diskUsage': number * 10,
+            'createdAt': '2020-01-01T00:00:00Z', 'updatedAt': '2021-01-01T00:00:00Z', 'pushedAt': '2022-01-01T00:00:00Z',
+            'url': f"https://github.com/org/repo{number}", 'defaultBranchRef': {'name': 'main', 'target': {'oid': f"sha{number}"}}}
+
+
+class GraphQLStub(BaseHTTPRequestHandler):
+    """
+    Answers REPOSITORIES_QUERY with three pages of repositories, the last one empty, chained by their cursors.
+    """
+    pages = {None: ([repository_node(1), repository_node(2)], 'c1'), 'c1': ([repository_node(3), None], 'c2'), 'c2': ([], None)}
+    requests_seen = []
+
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        self.requests_seen.append((self.headers['Authorization'], body['variables']))
+        if body['variables']['org'] != 'org':
+            data = {'organization': None}
+        else:
+            nodes, end_cursor = self.pages[body['variables']['cursor']]
+            data = {'organization': {'repositories': {'pageInfo': {'hasNextPage': end_cursor is not None, 'endCursor': end_cursor},
+                                                      'nodes': nodes}}}
+        payload = json.dumps({'data': data}).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+
+def test_fetch_repo_pages_graphql_follows_cursors(serve):
+    GraphQLStub.requests_seen = []
+    base_url = serve(GraphQLStub)
+    pages = list(GitHubApi.fetch_repo_pages_graphql('org', 'tok', graphql_url=f"{base_url}/graphql", session=requests.Session()))
+
+    assert [[repository['name'] for repository in page] for page in pages] == [['repo1', 'repo2'], ['repo3']]
+    assert [variables['cursor'] for _, variables in GraphQLStub.requests_seen] == [None, 'c1', 'c2']
+    assert all(authorization == 'Bearer tok' for authorization, _ in GraphQLStub.requests_seen)
+    assert pages[0][0] == {
+        'id': 1, 'name': 'repo1', 'default_branch': 'main', 'size': 10, 'created_at': '2020-01-01T00:00:00Z',
+        'updated_at': '2021-01-01T00:00:00Z', 'pushed_at': '2022-01-01T00:00:00Z', 'clone_url': 'https://github.com/org/repo1.git',
+        'archive_url': 'https://api.github.com/repos/org/repo1/{archive_format}{/ref}', 'head_sha': 'sha1'
+    }
+
+
+def test_fetch_repo_pages_graphql_unknown_organization(serve):
+    base_url = serve(GraphQLStub)
+    with pytest.raises(requests.exceptions.HTTPError, match="organization 'missing' not found"):
+        list(GitHubApi.fetch_repo_pages_graphql('missing', 'tok', graphql_url=f"{base_url}/graphql", session=requests.Session()))
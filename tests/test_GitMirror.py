@@ -0,0 +1,112 @@
+import os
+import shutil
+import subprocess
+
+import pytest
+
+from src import GitMirror
+
+pytestmark = pytest.mark.skipif(shutil.which('git') is None, reason="git is not on the PATH")
+
+
+def git(repository, *arguments):
+    subprocess.run(['git', '-C', str(repository), '-c', 'user.name=test', '-c', 'user.email=test@example.com'] + list(arguments),
+                   check=True, capture_output=True)
+
+
+def write(path, text):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w') as f:
+        f.write(text)
+
+
+def read(path):
+    with open(path) as f:
+        return f.read()
+
+
+def tree(work_tree):
+    return sorted(os.path.relpath(os.path.join(root, name), work_tree).replace(os.sep, '/')
+                  for root, _, names in os.walk(work_tree) for name in names)
+
+
+@pytest.fixture
+def upstream(tmp_path):
+    """
+    A bare repository with one commit on main, served to the mirror by its path.
+    """
+    source = tmp_path / 'source'
+    write(str(source / 'src' / 'app.py'), 'v1')
+    write(str(source / 'src' / 'old.py'), 'old')
+    write(str(source / 'node_modules' / 'lib.js'), 'lib')
+    write(str(source / 'Makefile'), 'all:')
+    write(str(source / 'config.yaml'), 'a: 1')
+    git(source, 'init', '--quiet', '--initial-branch=main')
+    git(source, 'add', '-A')
+    git(source, 'commit', '--quiet', '-m', 'v1')
+    bare = tmp_path / 'upstream.git'
+    subprocess.run(['git', 'clone', '--quiet', '--bare', str(source), str(bare)], check=True, capture_output=True)
+    return source, str(bare)
+
+
+def push_change(source):
+    write(str(source / 'src' / 'app.py'), 'v2')
+    os.remove(str(source / 'src' / 'old.py'))
+    git(source, 'add', '-A')
+    git(source, 'commit', '--quiet', '-m', 'v2')
+    git(source, 'push', '--quiet', '../upstream.git', 'main')
+
+
+def test_fetch_shallow_and_checkout(upstream, tmp_path):
+    source, clone_url = upstream
+    mirror_path, work_tree = str(tmp_path / 'mirror.git'), str(tmp_path / 'unzip' / 'repo')
+
+    sha = GitMirror.fetch_shallow(mirror_path, clone_url, 'main')
+    assert GitMirror.run_git(['--git-dir', mirror_path, 'rev-parse', 'refs/heads/main']) == sha
+    assert GitMirror.checkout(mirror_path, work_tree, sha) is True
+    assert tree(work_tree) == ['Makefile', 'config.yaml', 'node_modules/lib.js', 'src/app.py', 'src/old.py']
+    assert not os.path.exists(os.path.join(work_tree, '.git'))
+    # Already at the fetched commit
+    assert GitMirror.fetch_shallow(mirror_path, clone_url, 'main') == sha
+    assert GitMirror.checkout(mirror_path, work_tree, sha) is False
+
+
+def test_checkout_is_incremental(upstream, tmp_path):
+    source, clone_url = upstream
+    mirror_path, work_tree = str(tmp_path / 'mirror.git'), str(tmp_path / 'unzip' / 'repo')
+    GitMirror.checkout(mirror_path, work_tree, GitMirror.fetch_shallow(mirror_path, clone_url, 'main'))
+    # A copy linked into an application folder, as the mapping step makes them
+    linked_copy = str(tmp_path / 'app' / 'app.py')
+    os.makedirs(os.path.dirname(linked_copy))
+    os.link(os.path.join(work_tree, 'src', 'app.py'), linked_copy)
+    unchanged_inode = os.stat(os.path.join(work_tree, 'Makefile')).st_ino
+
+    push_change(source)
+    sha = GitMirror.fetch_shallow(mirror_path, clone_url, 'main')
+    assert GitMirror.checkout(mirror_path, work_tree, sha) is True
+    assert read(os.path.join(work_tree, 'src', 'app.py')) == 'v2'
+    assert not os.path.exists(os.path.join(work_tree, 'src', 'old.py'))
+    assert os.stat(os.path.join(work_tree, 'Makefile')).st_ino == unchanged_inode
+    assert read(linked_copy) == 'v1'
+
+
+def test_sparse_checkout_leaves_out_ignored_dirs_and_files(upstream, tmp_path):
+    _, clone_url = upstream
+    mirror_path, work_tree = str(tmp_path / 'mirror.git'), str(tmp_path / 'unzip' / 'repo')
+    sha = GitMirror.fetch_shallow(mirror_path, clone_url, 'main')
+
+    assert GitMirror.checkout(mirror_path, work_tree, sha, 'test, node_modules', '.yaml, Makefile') is True
+    assert tree(work_tree) == ['src/app.py', 'src/old.py']
+    # Other patterns: the tree is checked out again in full
+    assert GitMirror.checkout(mirror_path, work_tree, sha) is True
+    assert tree(work_tree) == ['Makefile', 'config.yaml', 'node_modules/lib.js', 'src/app.py', 'src/old.py']
+
+
+def test_sparse_patterns():
+    assert GitMirror.sparse_patterns('test, node_modules/,test', '.yaml, Makefile, a/b') == ['/*', '!test/', '!node_modules/', '!*.yaml', '!Makefile']
+
+
+def test_fetch_of_missing_branch_raises_git_error(upstream, tmp_path):
+    _, clone_url = upstream
+    with pytest.raises(GitMirror.GitCommandError):
+        GitMirror.fetch_shallow(str(tmp_path / 'mirror.git'), clone_url, 'missing')
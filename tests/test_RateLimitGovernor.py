@@ -0,0 +1,36 @@
+import time
+
+from src.RateLimitGovernor import RateLimitGovernor, token_key
+
+
+def pool_governor():
+    governor = RateLimitGovernor(reserve=0)
+    governor.configure(reserve=0, tokens=['token-a', 'token-b'])
+    return governor
+
+
+def test_token_with_most_remaining_quota_is_used():
+    governor = pool_governor()
+    reset = str(time.time() + 3600)
+    governor.observe(200, {'X-RateLimit-Remaining': '10', 'X-RateLimit-Reset': reset}, 'token-a')
+    governor.observe(200, {'X-RateLimit-Remaining': '4000', 'X-RateLimit-Reset': reset}, 'token-b')
+
+    headers, token = governor.authorize({'Authorization': 'Bearer caller-token'})
+    assert token == 'token-b'
+    assert headers == {'Authorization': 'Bearer token-b'}
+
+
+def test_request_without_authorization_stays_anonymous():
+    governor = pool_governor()
+    reset = time.time() + 3600
+    governor.observe(200, {'X-RateLimit-Remaining': '4000', 'X-RateLimit-Reset': str(reset)}, 'token-a')
+
+    headers, token = governor.authorize({'Accept': 'application/json'})
+    assert (headers, token) == ({'Accept': 'application/json'}, None)
+    governor.observe(200, {'X-RateLimit-Remaining': '59', 'X-RateLimit-Reset': str(reset)}, token)
+
+    # The anonymous limit is booked apart; the pool token keeps its quota and is not charged for the request
+    assert governor.state['quotas'][token_key('token-a')]['remaining'] == 4000
+    assert governor.state['quotas'][token_key(None)]['remaining'] == 59
+    assert token_key('token-a') not in governor.usage
+    assert governor.usage[token_key(None)]['requests'] == 1
@@ -0,0 +1,142 @@
+import os
+import re
+from http.server import BaseHTTPRequestHandler
+
+import pytest
+
+from src import RepoDownloader
+
+ARCHIVE = bytes(range(256)) * 40
+ETAG = '"v1"'
+
+
+class ArchiveStub(BaseHTTPRequestHandler):
+    """
+    Serves ARCHIVE. mode 'ranges' answers Range requests with 206; mode 'full' ignores them and answers 200
+    with the whole archive, as a server does when the archive changed since the If-Range ETag.
+    """
+    protocol_version = 'HTTP/1.1'
+    mode = 'ranges'
+    accept_ranges = True
+    requests_seen = []
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        self.requests_seen.append(dict(self.headers))
+        match = re.fullmatch(r'bytes=(\d+)-(\d*)', self.headers.get('Range', ''))
+        if match and self.mode == 'ranges':
+            start = int(match.group(1))
+            end = int(match.group(2)) if match.group(2) else len(ARCHIVE) - 1
+            body = ARCHIVE[start:end + 1]
+            self.send_response(206)
+            self.send_header('Content-Range', f"bytes {start}-{end}/{len(ARCHIVE)}")
+        else:
+            body = ARCHIVE
+            self.send_response(200)
+        if self.accept_ranges:
+            self.send_header('Accept-Ranges', 'bytes')
+        self.send_header('ETag', ETAG)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+@pytest.fixture
+def archive_server(serve):
+    ArchiveStub.mode = 'ranges'
+    ArchiveStub.accept_ranges = True
+    ArchiveStub.requests_seen = []
+    return serve(ArchiveStub) + '/repos/org/repo/zipball/main'
+
+
+def leave_partial_download(part_path, url, done_bytes, **state):
+    with open(part_path, 'wb') as part_file:
+        part_file.write(ARCHIVE[:done_bytes])
+    RepoDownloader.write_partial_state(part_path, dict({'url': url, 'etag': ETAG, 'total': len(ARCHIVE)}, **state))
+
+
+def attempt(url, part_path, segments=1):
+    return RepoDownloader.download_attempt(url, {'Authorization': 'token tok'}, part_path, 1024, 1024, True, segments, 0, 10)
+
+
+def test_download_attempt_resumes_partial_download(archive_server, tmp_path):
+    part_path = str(tmp_path / 'repo.zip.part')
+    leave_partial_download(part_path, archive_server, 1000)
+
+    assert attempt(archive_server, part_path) is None
+    assert ArchiveStub.requests_seen[0]['Range'] == 'bytes=1000-'
+    assert ArchiveStub.requests_seen[0]['If-Range'] == ETAG
+    with open(part_path, 'rb') as part_file:
+        assert part_file.read() == ARCHIVE
+
+
+def test_download_attempt_starts_over_when_range_answered_200(archive_server, tmp_path):
+    ArchiveStub.mode = 'full'
+    part_path = str(tmp_path / 'repo.zip.part')
+    leave_partial_download(part_path, archive_server, 1000)
+
+    assert attempt(archive_server, part_path) is None
+    assert ArchiveStub.requests_seen[0]['Range'] == 'bytes=1000-'
+    # The whole archive replaces the partial file instead of being appended to it
+    with open(part_path, 'rb') as part_file:
+        assert part_file.read() == ARCHIVE
+
+
+def test_download_attempt_discards_partial_download_of_another_url(archive_server, tmp_path):
+    part_path = str(tmp_path / 'repo.zip.part')
+    leave_partial_download(part_path, archive_server + '?old', 1000)
+
+    assert attempt(archive_server, part_path) is None
+    assert 'Range' not in ArchiveStub.requests_seen[0]
+    with open(part_path, 'rb') as part_file:
+        assert part_file.read() == ARCHIVE
+
+
+def test_download_attempt_in_segments(archive_server, tmp_path):
+    part_path = str(tmp_path / 'repo.zip.part')
+
+    assert attempt(archive_server, part_path, segments=3) is None
+    assert sorted(request.get('Range') for request in ArchiveStub.requests_seen[1:]) == ['bytes=0-3413', 'bytes=3414-6827', 'bytes=6828-10239']
+    with open(part_path, 'rb') as part_file:
+        assert part_file.read() == ARCHIVE
+    assert not any(name.startswith('repo.zip.part.seg') for name in os.listdir(tmp_path))
+
+
+def test_segments_of_changed_archive_raise_archive_changed(archive_server, tmp_path):
+    ArchiveStub.mode = 'full'
+    part_path = str(tmp_path / 'repo.zip.part')
+    leave_partial_download(part_path, archive_server, 0, segments=2)
+
+    with pytest.raises(RepoDownloader.ArchiveChangedError):
+        attempt(archive_server, part_path, segments=2)
+    # The segments of the older archive are gone, so the retry starts over
+    assert os.listdir(tmp_path) == []
+
+
+def test_download_archive_starts_over_after_archive_changed(archive_server, tmp_path):
+    ArchiveStub.mode = 'full'
+    ArchiveStub.accept_ranges = False
+    repository_path = str(tmp_path / 'repo.zip')
+    leave_partial_download(repository_path + '.part', archive_server, 0, segments=2)
+
+    assert RepoDownloader.download_archive(archive_server, repository_path, 'tok', segments=2, backoff_seconds=0) == (True, None)
+    with open(repository_path, 'rb') as archive_file:
+        assert archive_file.read() == ARCHIVE
+    assert os.listdir(tmp_path) == ['repo.zip']
+
+
+def test_download_archive_does_not_retry_client_errors(serve, tmp_path):
+    class NotFound(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def do_GET(self):
+            self.send_response(404)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+
+    repository_path = str(tmp_path / 'repo.zip')
+    assert RepoDownloader.download_archive(serve(NotFound) + '/x', repository_path, 'tok', backoff_seconds=0) == (False, '404 Not Found')
+    assert os.listdir(tmp_path) == []
@@ -0,0 +1,34 @@
+import csv
+
+from src.RepoLedger import RepoLedger
+
+
+def listing(count):
+    return [{'id': number, 'name': f"repo{number}", 'default_branch': 'main', 'size': 10, 'created_at': '', 'updated_at': '',
+             'pushed_at': '2023-01-01T00:00:00Z', 'clone_url': '', 'archive_url': '', 'batch_number': 1,
+             'repo_archive_download_api': f"https://api.github.com/repos/org/repo{number}/zipball/main", 'Download': 'N',
+             'Download_Status': ''} for number in range(1, count + 1)]
+
+
+def test_selection_edited_in_the_exported_csv_is_read_back(tmp_path):
+    ledger = RepoLedger(str(tmp_path / 'org_Repositories.db'))
+    ledger.sync_listing(listing(4))
+    csv_file_path = str(tmp_path / 'org_Repositories_Summary.csv')
+    ledger.export_csv(csv_file_path)
+
+    with open(csv_file_path, newline='', encoding='utf-8') as csv_file:
+        rows = list(csv.DictReader(csv_file))
+    rows[0]['Download'] = 'y'
+    rows[1]['Download'], rows[1]['batch_number'] = 'Y', '3'
+    rows[2]['Download'], rows[2]['name'] = 'maybe', 'renamed'
+    rows[3]['batch_number'] = ''
+    # Saved again by a spreadsheet program, with a BOM
+    with open(csv_file_path, 'w', newline='', encoding='utf-8-sig') as csv_file:
+        writer = csv.DictWriter(csv_file, fieldnames=list(rows[0]))
+        writer.writeheader()
+        writer.writerows(rows)
+
+    assert ledger.import_selection(csv_file_path) == 2
+    assert [(row['name'], row['batch_number']) for row in ledger.get_download_candidates()] == [('repo1', 1), ('repo2', 3)]
+    assert [row['name'] for row in ledger.iter_rows()] == ['repo1', 'repo2', 'repo3', 'repo4']
+    assert ledger.import_selection(csv_file_path) == 0
@@ -0,0 +1,51 @@
+import os
+import threading
+
+from src import TreeDeleter
+
+
+def make_tree(path, files=3):
+    os.makedirs(os.path.join(path, 'sub'))
+    for number in range(files):
+        with open(os.path.join(path, 'sub', f"{number}.txt"), 'w') as f:
+            f.write('x' * 100)
+
+
+def test_delete_sweeps_leftovers_and_deletes_in_background(tmp_path):
+    root_dir = str(tmp_path / 'unzip')
+    trash_dir = TreeDeleter.trash_dir_for(root_dir)
+    make_tree(os.path.join(trash_dir, 'left-by-a-stopped-run'))
+    make_tree(os.path.join(root_dir, 'repo'))
+    deleter = TreeDeleter.TreeDeleter()
+
+    deleter.delete(os.path.join(root_dir, 'repo'), root_dir)
+    assert not os.path.exists(os.path.join(root_dir, 'repo'))
+    deleter.wait()
+
+    assert os.listdir(trash_dir) == []
+    assert (deleter.trees, deleter.entries, deleter.freed_bytes, deleter.errors) == (2, 10, 600, 0)
+
+
+def test_tree_renamed_while_leftovers_are_listed_is_deleted_once(tmp_path, monkeypatch):
+    root_dir = str(tmp_path / 'unzip')
+    trash_dir = TreeDeleter.trash_dir_for(root_dir)
+    make_tree(os.path.join(root_dir, 'first'))
+    make_tree(os.path.join(root_dir, 'second'))
+    deleter = TreeDeleter.TreeDeleter()
+    listdir = os.listdir
+    other_thread = threading.Thread(target=deleter.delete, args=(os.path.join(root_dir, 'second'), root_dir))
+
+    def listdir_while_another_thread_deletes(path):
+        if path == trash_dir and other_thread.ident is None:
+            # Another thread deletes a tree while the leftovers are being listed; it must wait for the listing
+            other_thread.start()
+            other_thread.join(0.5)
+        return listdir(path)
+
+    monkeypatch.setattr(os, 'listdir', listdir_while_another_thread_deletes)
+    deleter.delete(os.path.join(root_dir, 'first'), root_dir)
+    other_thread.join()
+    deleter.wait()
+
+    assert (deleter.trees, deleter.errors) == (2, 0)
+    assert listdir(trash_dir) == []
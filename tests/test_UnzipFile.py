@@ -0,0 +1,55 @@
+import os
+import zipfile
+
+import pytest
+
+from src import UnzipFile
+from src.ExtractionBudget import ExtractionBudget
+
+
+@pytest.mark.parametrize('relative_name', ['../escape.txt', 'src/../../escape.txt', '/etc/passwd', '\\windows\\system.ini',
+                                           'src\\..\\..\\escape.txt', 'a/./../../escape.txt'])
+def test_member_target_path_rejects_traversal(tmp_path, relative_name):
+    with pytest.raises(ValueError, match='Unsafe path in archive'):
+        UnzipFile.member_target_path(str(tmp_path), relative_name)
+
+
+@pytest.mark.parametrize('relative_name, parts', [('src/app.py', ['src', 'app.py']), ('./src//app.py', ['src', 'app.py']),
+                                                  ('src\\app.py', ['src', 'app.py']), ('src/..app.py', ['src', '..app.py']),
+                                                  ('docs/', ['docs'])])
+def test_member_target_path_stays_under_extract_path(tmp_path, relative_name, parts):
+    assert UnzipFile.member_target_path(str(tmp_path), relative_name) == os.path.join(str(tmp_path), *parts)
+
+
+def test_extraction_stops_at_member_leaving_extract_path(tmp_path):
+    archive_path = str(tmp_path / 'repo.zip')
+    with zipfile.ZipFile(archive_path, 'w') as zip_ref:
+        zip_ref.writestr('org-repo-abc123/src/app.py', 'print(1)')
+        zip_ref.writestr('org-repo-abc123/../../escape.txt', 'x')
+    extract_path = str(tmp_path / 'unzip' / 'repo')
+    os.makedirs(extract_path)
+
+    with zipfile.ZipFile(archive_path) as zip_ref, pytest.raises(ValueError, match='Unsafe path in archive'):
+        UnzipFile.extract_without_top_folder(zip_ref, extract_path)
+    assert not os.path.exists(str(tmp_path / 'escape.txt'))
+    assert not os.path.exists(str(tmp_path / 'unzip' / 'escape.txt'))
+
+
+def test_failed_extraction_gives_back_its_run_budget(tmp_path):
+    for repo_name, names in (('bad', ['src/data.bin', '../escape.txt']), ('good', ['src/data.bin'])):
+        os.makedirs(str(tmp_path / 'src' / repo_name))
+        with zipfile.ZipFile(str(tmp_path / 'src' / repo_name / f"{repo_name}.zip"), 'w') as zip_ref:
+            for name in names:
+                zip_ref.writestr(f"org-{repo_name}-abc123/{name}", b'x' * 600 * 1024 if name == 'src/data.bin' else b'x')
+    budget = ExtractionBudget(max_run_mb=1)
+    run = UnzipFile.UnzipRun(str(tmp_path / 'unzip'), str(tmp_path / 'execution.log'), str(tmp_path / 'time.log'), budget=budget)
+    for repo_name in ('bad', 'good'):
+        repo_path = str(tmp_path / 'src' / repo_name / f"{repo_name}.zip")
+        task = run.plan(repo_path, repo_name)
+        assert task is not None
+        run.record_result(UnzipFile.extract_repository(*task))
+    run.close()
+
+    assert (run.success_count, run.failure_count) == (1, 1)
+    # Without the bytes of the failed archive given back, the second one would be over the run budget
+    assert budget.run_bytes == 600 * 1024